@@ -0,0 +1,106 @@
+# engine_benchmark.py
+"""Compare the ffmpeg-per-clip engine with the in-process PyAV engine
+
+    python benchmarks/engine_benchmark.py talk.mp4 --clip-duration 1 --skip-duration 0
+    python benchmarks/engine_benchmark.py talk.mp4 --engines pyav-copy pyav-encode
+
+Each engine cuts the same plan of input into a temporary folder with the
+same encoder and worker count; the JSON report has the wall time, clips
+per second and milliseconds per clip of every engine. Short clips make the
+per-clip fixed costs (process spawn, library loading, probing, decoder
+set-up) dominate, which is what the in-process engine removes. pyav-copy
+does not encode at all, so compare it with the others only for remuxing
+workloads.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "src"))
+
+from cutting_video import cut_video  # noqa: E402
+from retry_policy import RetryPolicy  # noqa: E402
+
+ENGINES = ("ffmpeg", "pyav-encode", "pyav-copy")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="Input video")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=ENGINES)
+    parser.add_argument("--clip-duration", type=float, default=1)
+    parser.add_argument("--skip-duration", type=float, default=0)
+    parser.add_argument("--encoder", default="libx264")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="Runs per engine; the best is reported"
+    )
+    return parser
+
+
+def make_engine(name):
+    if name == "ffmpeg":
+        return None
+    from pyav_engine import PyAVEngine
+
+    return PyAVEngine(name.split("-", 1)[1])
+
+
+def run_engine(args, name):
+    engine = make_engine(name)
+    best = None
+    for _ in range(args.repeat):
+        output_folder = tempfile.mkdtemp(prefix=f"cutter-{name}-")
+        clips = []
+        started = time.perf_counter()
+        try:
+            success = cut_video(
+                args.input,
+                output_folder,
+                max_workers=args.workers,
+                clip_duration=args.clip_duration,
+                skip_duration=args.skip_duration,
+                encoder=args.encoder,
+                cleanup=False,
+                retry_policy=RetryPolicy(max_attempts=1),
+                clip_callback=lambda window, *result: clips.append(result),
+                engine=engine,
+            )
+            wall = time.perf_counter() - started
+        finally:
+            shutil.rmtree(output_folder, ignore_errors=True)
+        if best is None or wall < best[0]:
+            best = (wall, success, clips)
+
+    wall, success, clips = best
+    count = max(1, len(clips))
+    return {
+        "engine": name,
+        "succeeded": success,
+        "clips": len(clips),
+        "wall_s": round(wall, 3),
+        "clips_per_s": round(len(clips) / wall, 2) if wall else None,
+        "ms_per_clip": round(wall / count * 1000, 2),
+        "mb_written": round(sum(result[-1] for result in clips) / 1024**2, 1),
+    }
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = [run_engine(args, name) for name in args.engines]
+    baseline = next((r for r in results if r["engine"] == "ffmpeg"), None)
+    if baseline is not None:
+        for result in results:
+            result["speedup"] = round(baseline["wall_s"] / result["wall_s"], 2)
+    json.dump(results, sys.stdout, indent=1)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
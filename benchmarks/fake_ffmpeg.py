@@ -0,0 +1,145 @@
+# fake_ffmpeg.py
+"""Stand-in for ffmpeg and ffprobe that encodes nothing
+
+Point the cutter at it to measure the Python layer without real encoding:
+
+    VIDEO_CUTTER_FFMPEG="python -S benchmarks/fake_ffmpeg.py"
+    VIDEO_CUTTER_FFPROBE="python -S benchmarks/fake_ffmpeg.py"
+
+Called with -show_streams it answers like ffprobe with a synthetic video.
+Otherwise it behaves like one ffmpeg encode: it waits, optionally writes
+progress lines to stderr, then writes the output file (the last argument)
+or fails. Behaviour is set through environment variables:
+
+    FAKE_FFMPEG_LATENCY        seconds per encode (default 0)
+    FAKE_FFMPEG_LANE_LATENCY   per-encoder latency overrides, keyed by
+                               encoder or encoder/preset, e.g.
+                               "h264_nvenc=0.02,libx264/veryfast=0.08"
+    FAKE_FFMPEG_JITTER         +- fraction of the latency (default 0)
+    FAKE_FFMPEG_FAILURE_RATE   share of encodes that fail (default 0)
+    FAKE_FFMPEG_FAILURE_TEXT   stderr of a failed encode
+    FAKE_FFMPEG_PROGRESS       seconds between progress lines (default off)
+    FAKE_FFMPEG_OUTPUT_BYTES   size of the written clip (default 1024)
+    FAKE_FFMPEG_READ_INPUT     if set, read the share of the input file that
+                               the clip's -ss/-t cover (by the probed
+                               duration) in 32 KiB reads before encoding
+    FAKE_FFPROBE_DURATION      probed duration in seconds (default 60)
+    FAKE_FFPROBE_FRAME_RATE    probed frame rate (default 30/1)
+"""
+import json
+import os
+import random
+import sys
+import time
+
+READ_SIZE = 32 * 1024
+
+
+def env_float(name, default):
+    return float(os.environ.get(name, default))
+
+
+def option(args, name):
+    """Value following name in args, or None"""
+    try:
+        return args[args.index(name) + 1]
+    except (ValueError, IndexError):
+        return None
+
+
+def encode_latency(args):
+    latency = env_float("FAKE_FFMPEG_LATENCY", 0)
+    overrides = {}
+    for item in os.environ.get("FAKE_FFMPEG_LANE_LATENCY", "").split(","):
+        key, _, value = item.partition("=")
+        if value:
+            overrides[key.strip()] = float(value)
+    encoder = option(args, "-c:v")
+    preset = option(args, "-preset")
+    for key in (f"{encoder}/{preset}", encoder):
+        if key in overrides:
+            return overrides[key]
+    return latency
+
+
+def read_input(args):
+    """Read the clip's part of the input like ffmpeg's demuxer would"""
+    input_path = option(args, "-i")
+    duration = env_float("FAKE_FFPROBE_DURATION", 60)
+    start = float(option(args, "-ss") or 0)
+    length = float(option(args, "-t") or duration)
+    size = os.path.getsize(input_path)
+    offset = int(size * min(start / duration, 1))
+    remaining = int(size * min(length / duration, 1))
+    with open(input_path, "rb", buffering=0) as input_file:
+        input_file.seek(offset)
+        while remaining > 0:
+            data = input_file.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+
+
+def probe():
+    duration = os.environ.get("FAKE_FFPROBE_DURATION", "60")
+    frame_rate = os.environ.get("FAKE_FFPROBE_FRAME_RATE", "30/1")
+    streams = [
+        {
+            "index": 0,
+            "codec_type": "video",
+            "codec_name": "h264",
+            "width": 1920,
+            "height": 1080,
+            "r_frame_rate": frame_rate,
+            "avg_frame_rate": frame_rate,
+            "duration": duration,
+        },
+        {"index": 1, "codec_type": "audio", "codec_name": "aac"},
+    ]
+    json.dump({"streams": streams, "format": {"duration": duration}}, sys.stdout)
+    return 0
+
+
+def encode(args):
+    if os.environ.get("FAKE_FFMPEG_READ_INPUT"):
+        read_input(args)
+    latency = encode_latency(args)
+    jitter = env_float("FAKE_FFMPEG_JITTER", 0)
+    progress_interval = env_float("FAKE_FFMPEG_PROGRESS", 0)
+    latency *= 1 + random.uniform(-jitter, jitter)
+
+    deadline = time.monotonic() + latency
+    frame = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if progress_interval:
+            time.sleep(min(progress_interval, remaining))
+            frame += 1
+            sys.stderr.write(f"frame={frame:5d} fps=0.0 q=-1.0 size=N/A speed=N/A\n")
+            sys.stderr.flush()
+        else:
+            time.sleep(remaining)
+
+    if random.random() < env_float("FAKE_FFMPEG_FAILURE_RATE", 0):
+        sys.stderr.write(
+            os.environ.get("FAKE_FFMPEG_FAILURE_TEXT", "Conversion failed!") + "\n"
+        )
+        return 1
+
+    output_path = args[-1]
+    if output_path != "-":
+        with open(output_path, "wb") as output_file:
+            output_file.write(b"\0" * int(env_float("FAKE_FFMPEG_OUTPUT_BYTES", 1024)))
+    return 0
+
+
+def main(args):
+    if "-show_streams" in args:
+        return probe()
+    return encode(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,230 @@
+# orchestration_benchmark.py
+"""Measure the Python orchestration cost of cut_video with a fake ffmpeg
+
+    python benchmarks/orchestration_benchmark.py --clips 10000 --workers 8
+    python benchmarks/orchestration_benchmark.py --clips 100000 --latency 0.01
+    python benchmarks/orchestration_benchmark.py --clips 500 \
+        --lane libx264:2:veryfast --lane libx264:4:medium \
+        --lane-latency libx264/veryfast=0.02,libx264/medium=0.1
+
+Every clip is "encoded" by benchmarks/fake_ffmpeg.py, so the time not spent
+inside ffmpeg is scheduling, spawning and bookkeeping in the cutter. The
+JSON report includes:
+
+    overhead_per_clip_ms  worker time per clip outside the ffmpeg process
+    spawn_per_clip_ms     ffmpeg wall time beyond the configured latency
+                          (process creation plus the fake's own start-up)
+    gap_p50_ms/gap_p99_ms idle time of a worker between two encodes
+    rss_peak_mb           peak resident memory of the cutter process
+    fairness              Jain's index of busy time across workers (1 = even)
+    lanes                 with --lane, clips and learnt cost per encoder lane
+    max_reorder           largest distance between a clip's index and its
+                          completion rank
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import psutil
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "src"))
+
+import cutting_video  # noqa: E402
+from encoder_lanes import LaneScheduler, parse_lane  # noqa: E402
+from ffmpeg_binaries import FFMPEG_ENV, FFPROBE_ENV  # noqa: E402
+from progress_tracker import ProgressTracker  # noqa: E402
+from retry_policy import RetryPolicy  # noqa: E402
+
+RSS_SAMPLE_INTERVAL = 0.05
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clips", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds per fake encode"
+    )
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--progress", type=float, default=0.0, help="Fake progress line interval"
+    )
+    parser.add_argument("--max-attempts", type=int, default=1)
+    parser.add_argument(
+        "--lane",
+        action="append",
+        default=[],
+        help="Encoder lane encoder[:slots[:preset]]; repeat for several lanes",
+    )
+    parser.add_argument(
+        "--lane-latency",
+        default="",
+        help="Fake latency per lane, e.g. libx264/veryfast=0.02,h264_nvenc=0.01",
+    )
+    parser.add_argument(
+        "--output", help="Clip folder (default: a temporary folder, removed after)"
+    )
+    return parser
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def jain_index(values):
+    if not values or not any(values):
+        return 1.0
+    return sum(values) ** 2 / (len(values) * sum(value * value for value in values))
+
+
+class RssSampler(threading.Thread):
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.process = psutil.Process()
+        self.peak = self.process.memory_info().rss
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(RSS_SAMPLE_INTERVAL):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def configure_fake(args):
+    fake = os.path.join(HERE, "fake_ffmpeg.py")
+    command = f'"{sys.executable}" -S "{fake}"'
+    os.environ[FFMPEG_ENV] = command
+    os.environ[FFPROBE_ENV] = command
+    os.environ["FAKE_FFMPEG_LATENCY"] = str(args.latency)
+    os.environ["FAKE_FFMPEG_JITTER"] = str(args.jitter)
+    os.environ["FAKE_FFMPEG_FAILURE_RATE"] = str(args.failure_rate)
+    os.environ["FAKE_FFMPEG_PROGRESS"] = str(args.progress)
+    os.environ["FAKE_FFMPEG_LANE_LATENCY"] = args.lane_latency
+    # One-second clips back to back: the plan has exactly args.clips clips
+    os.environ["FAKE_FFPROBE_DURATION"] = str(args.clips)
+
+
+def run_benchmark(args):
+    configure_fake(args)
+    output_folder = args.output or tempfile.mkdtemp(prefix="cutter-bench-")
+
+    runs = []  # (thread name, start, end) of every ffmpeg process
+    completions = []  # window index in completion order
+    record_lock = threading.Lock()
+    run_ffmpeg = cutting_video.run_ffmpeg
+
+    def timed_run_ffmpeg(cmd, *run_args, **run_kwargs):
+        start = time.perf_counter()
+        try:
+            return run_ffmpeg(cmd, *run_args, **run_kwargs)
+        finally:
+            end = time.perf_counter()
+            with record_lock:
+                runs.append((threading.current_thread().name, start, end))
+
+    def clip_callback(window, output_path, success, error, bytes_written):
+        with record_lock:
+            completions.append(window.index)
+
+    lanes = None
+    if args.lane:
+        lanes = LaneScheduler([parse_lane(spec) for spec in args.lane])
+        args.workers = lanes.slots
+
+    cutting_video.run_ffmpeg = timed_run_ffmpeg
+    sampler = RssSampler()
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        success = cutting_video.cut_video(
+            "fake_input.mp4",
+            output_folder,
+            max_workers=args.workers,
+            clip_duration=1,
+            skip_duration=0,
+            encoder="libx264",
+            progress_tracker=ProgressTracker(),
+            cleanup=False,
+            nice=0,
+            ionice=None,
+            retry_policy=RetryPolicy(max_attempts=args.max_attempts, backoff_base=0),
+            clip_callback=clip_callback,
+            lanes=lanes,
+        )
+    finally:
+        wall = time.perf_counter() - started
+        sampler.stop()
+        cutting_video.run_ffmpeg = run_ffmpeg
+        if not args.output:
+            shutil.rmtree(output_folder, ignore_errors=True)
+
+    result = report(args, wall, runs, completions, sampler.peak, success)
+    if lanes is not None:
+        result["lanes"] = lanes.summary()
+    return result
+
+
+def report(args, wall, runs, completions, rss_peak, success):
+    ffmpeg_total = sum(end - start for _, start, end in runs)
+    clips = max(1, len(completions))
+
+    by_worker = {}
+    for name, start, end in runs:
+        by_worker.setdefault(name, []).append((start, end))
+    gaps = []
+    busy = []
+    for spans in by_worker.values():
+        spans.sort()
+        busy.append(sum(end - start for start, end in spans))
+        gaps.extend(
+            next_start - end for (_, end), (next_start, _) in zip(spans, spans[1:])
+        )
+
+    reorder = [abs(rank - index) for rank, index in enumerate(completions, start=1)]
+    return {
+        "clips": len(completions),
+        "succeeded": success,
+        "workers": args.workers,
+        "latency_s": args.latency,
+        "ffmpeg_runs": len(runs),
+        "wall_s": round(wall, 3),
+        "ideal_s": round(len(runs) * args.latency / args.workers, 3),
+        "ffmpeg_s_total": round(ffmpeg_total, 3),
+        "overhead_per_clip_ms": round(
+            (wall * args.workers - ffmpeg_total) / clips * 1000, 3
+        ),
+        "spawn_per_clip_ms": round(
+            (ffmpeg_total - len(runs) * args.latency) / max(1, len(runs)) * 1000,
+            3,
+        ),
+        "gap_p50_ms": round(percentile(gaps, 0.5) * 1000, 3),
+        "gap_p99_ms": round(percentile(gaps, 0.99) * 1000, 3),
+        "rss_peak_mb": round(rss_peak / 1024**2, 1),
+        "fairness": round(jain_index(busy), 4),
+        "per_worker_runs": sorted(len(spans) for spans in by_worker.values()),
+        "max_reorder": max(reorder, default=0),
+    }
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    json.dump(run_benchmark(args), sys.stdout, indent=1)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+# read_ahead_benchmark.py
+"""Measure plan-driven read-ahead on slow input storage
+
+    python benchmarks/read_ahead_benchmark.py /mnt/slow/input.bin --create-mb 300
+    python benchmarks/read_ahead_benchmark.py /mnt/nas/talk.mp4 --real-ffmpeg
+
+The same job is cut once per --depth (0 = no read-ahead) after evicting
+the input from the page cache. By default every clip is "encoded" by
+benchmarks/fake_ffmpeg.py, which reads the clip's share of the input in
+32 KiB reads and then sleeps --latency seconds, so only the input storage
+is measured; --real-ffmpeg runs the real ffmpeg on a real video instead.
+
+The input has to live on slow storage for the numbers to mean anything: a
+network mount, a hard disk, or a throttled loop device, e.g. as root with
+cgroup v1:
+
+    truncate -s 400M /tmp/slow.img && mkfs.ext4 -q /tmp/slow.img
+    mount -o loop /tmp/slow.img /mnt/slow        # say /dev/loop0, 7:0
+    mkdir /sys/fs/cgroup/blkio/slow
+    echo "7:0 150" > /sys/fs/cgroup/blkio/slow/blkio.throttle.read_iops_device
+    echo "7:0 50000000" > /sys/fs/cgroup/blkio/slow/blkio.throttle.read_bps_device
+    echo $$ > /sys/fs/cgroup/blkio/slow/tasks   # then run the benchmark
+
+(with cgroup v2, write "7:0 riops=150 rbps=50000000" to io.max). The JSON
+report has the wall time, clips per second and input throughput per depth,
+plus the read requests the input's disk served where /proc/diskstats has
+them: read-ahead should need far fewer, larger requests.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import psutil
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "src"))
+
+from cutting_video import cut_video  # noqa: E402
+from ffmpeg_binaries import FFMPEG_ENV, FFPROBE_ENV  # noqa: E402
+from retry_policy import RetryPolicy  # noqa: E402
+
+CREATE_CHUNK = 1024**2
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="Input file on the storage to measure")
+    parser.add_argument(
+        "--create-mb",
+        type=int,
+        help="Create the input with this many MB of random data if it is missing",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=600,
+        help="Seconds of video the fake input stands for",
+    )
+    parser.add_argument("--clip-duration", type=float, default=3)
+    parser.add_argument("--skip-duration", type=float, default=0)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Seconds per fake encode"
+    )
+    parser.add_argument(
+        "--depth",
+        type=int,
+        nargs="+",
+        default=[0, 4],
+        help="Read-ahead depths in clips to compare (0 = off)",
+    )
+    parser.add_argument(
+        "--real-ffmpeg", action="store_true", help="Run the real ffmpeg"
+    )
+    parser.add_argument("--encoder", default="libx264")
+    return parser
+
+
+def configure_fake(args):
+    fake = os.path.join(HERE, "fake_ffmpeg.py")
+    command = f'"{sys.executable}" -S "{fake}"'
+    os.environ[FFMPEG_ENV] = command
+    os.environ[FFPROBE_ENV] = command
+    os.environ["FAKE_FFMPEG_READ_INPUT"] = "1"
+    os.environ["FAKE_FFMPEG_LATENCY"] = str(args.latency)
+    os.environ["FAKE_FFPROBE_DURATION"] = str(args.duration)
+
+
+def create_input(path, size_mb):
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    with open(path, "wb") as input_file:
+        for _ in range(size_mb):
+            input_file.write(os.urandom(CREATE_CHUNK))
+        input_file.flush()
+        os.fsync(input_file.fileno())
+
+
+def evict(path):
+    """Drop the file's clean pages from the page cache"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def disk_name(path):
+    """/proc/diskstats name of the block device holding path, or None"""
+    device = os.stat(path).st_dev
+    link = f"/sys/dev/block/{os.major(device)}:{os.minor(device)}"
+    if not os.path.exists(link):
+        return None
+    return os.path.basename(os.path.realpath(link))
+
+
+def disk_reads(disk):
+    if disk is None:
+        return None
+    counters = psutil.disk_io_counters(perdisk=True).get(disk)
+    return None if counters is None else (counters.read_count, counters.read_bytes)
+
+
+def run_depth(args, depth, disk):
+    evict(args.input)
+    output_folder = tempfile.mkdtemp(prefix=f"cutter-read-ahead-{depth}-")
+    clips = []
+    reads_before = disk_reads(disk)
+    started = time.perf_counter()
+    try:
+        success = cut_video(
+            args.input,
+            output_folder,
+            max_workers=args.workers,
+            clip_duration=args.clip_duration,
+            skip_duration=args.skip_duration,
+            encoder=args.encoder,
+            cleanup=False,
+            retry_policy=RetryPolicy(max_attempts=1),
+            clip_callback=lambda window, *result: clips.append(result),
+            clip_index=False,
+            read_ahead=depth,
+        )
+        wall = time.perf_counter() - started
+    finally:
+        shutil.rmtree(output_folder, ignore_errors=True)
+    reads_after = disk_reads(disk)
+
+    input_mb = os.path.getsize(args.input) / 1024**2
+    result = {
+        "depth": depth,
+        "succeeded": success,
+        "clips": len(clips),
+        "wall_s": round(wall, 3),
+        "clips_per_s": round(len(clips) / wall, 2) if wall else None,
+        "input_mb_per_s": round(input_mb / wall, 1) if wall else None,
+    }
+    if reads_before is not None and reads_after is not None:
+        requests = reads_after[0] - reads_before[0]
+        read_mb = (reads_after[1] - reads_before[1]) / 1024**2
+        result["disk_read_requests"] = requests
+        result["disk_read_mb"] = round(read_mb, 1)
+        if requests:
+            result["kb_per_request"] = round(read_mb * 1024 / requests, 1)
+    return result
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not os.path.exists(args.input):
+        if not args.create_mb:
+            build_parser().error(f"{args.input} does not exist (see --create-mb)")
+        create_input(args.input, args.create_mb)
+
+    if not args.real_ffmpeg:
+        configure_fake(args)
+
+    disk = disk_name(args.input)
+    results = [run_depth(args, depth, disk) for depth in args.depth]
+    baseline = next((r for r in results if r["depth"] == 0), None)
+    if baseline is not None:
+        for result in results:
+            result["speedup"] = round(baseline["wall_s"] / result["wall_s"], 2)
+    json.dump(results, sys.stdout, indent=1)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
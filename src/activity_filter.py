@@ -0,0 +1,146 @@
+# activity_filter.py
+"""Skip clips of static screen or black frames before they are encoded
+
+A pre-pass streams low-resolution frames (frame_sampler.py) and scores every
+planned clip window by its mean luma and by how much consecutive frames
+differ. Windows that are black or static are dropped from the job, and all
+scores are written to activity.json in the output folder.
+"""
+import json
+import logging
+import os
+
+import numpy as np
+from frame_sampler import SAMPLE_FPS, iter_frame_batches
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_FILE_NAME = "activity.json"
+# Mean absolute difference between sampled frames, 0-255 scale
+DEFAULT_MOTION_THRESHOLD = 1.0
+# Mean luma at or below which a window counts as black
+DEFAULT_BLACK_THRESHOLD = 16
+
+
+class WindowScore:
+    """Accumulated luma and motion of one clip window"""
+
+    __slots__ = ("index", "frames", "luma_sum", "motion_sum", "motion_count")
+
+    def __init__(self, index):
+        self.index = index
+        self.frames = 0
+        self.luma_sum = 0.0
+        self.motion_sum = 0.0
+        self.motion_count = 0
+
+    @property
+    def luma(self):
+        return self.luma_sum / self.frames if self.frames else 0.0
+
+    @property
+    def motion(self):
+        return self.motion_sum / self.motion_count if self.motion_count else 0.0
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "frames": self.frames,
+            "luma": round(self.luma, 2),
+            "motion": round(self.motion, 3),
+        }
+
+
+class ActivityFilter:
+    """Scores clip windows and decides which are worth encoding"""
+
+    def __init__(
+        self,
+        motion_threshold=DEFAULT_MOTION_THRESHOLD,
+        black_threshold=DEFAULT_BLACK_THRESHOLD,
+        fps=SAMPLE_FPS,
+    ):
+        self.motion_threshold = motion_threshold
+        self.black_threshold = black_threshold
+        self.fps = fps
+
+    def score_windows(self, input_path, plan):
+        """Return {window index: WindowScore} for every window in plan
+
+        Frames are matched to windows in one forward pass; frames in skip
+        gaps are decoded but only used as the reference for the next motion
+        difference inside a window.
+        """
+        windows = iter(plan)
+        window = next(windows, None)
+        scores = {}
+        previous = None
+
+        for times, frames in iter_frame_batches(input_path, fps=self.fps):
+            if window is None:
+                break
+            times_us = (times * 1_000_000).astype(np.int64)
+            frames = frames.astype(np.int16)
+            lumas = frames.mean(axis=(1, 2))
+            for position in range(len(frames)):
+                while window is not None and times_us[position] >= window.end_us:
+                    window = next(windows, None)
+                if window is None:
+                    break
+                frame = frames[position]
+                if times_us[position] >= window.start_us:
+                    score = scores.get(window.index)
+                    if score is None:
+                        score = scores[window.index] = WindowScore(window.index)
+                    score.frames += 1
+                    score.luma_sum += float(lumas[position])
+                    if previous is not None:
+                        score.motion_sum += float(np.abs(frame - previous).mean())
+                        score.motion_count += 1
+                previous = frame
+        return scores
+
+    def is_active(self, score):
+        if score is None or not score.frames:
+            return True  # Nothing sampled (very short window): keep it
+        if score.luma <= self.black_threshold:
+            return False
+        return score.motion_count == 0 or score.motion >= self.motion_threshold
+
+    def active_windows(self, input_path, plan, output_folder=None):
+        """Return the set of window indexes to encode
+
+        With output_folder, the scores are written to activity.json there.
+        """
+        scores = self.score_windows(input_path, plan)
+        active = set()
+        records = []
+        for window in plan:
+            score = scores.get(window.index)
+            keep = self.is_active(score)
+            if keep:
+                active.add(window.index)
+            record = score.to_dict() if score else {"index": window.index}
+            record["active"] = keep
+            records.append(record)
+
+        logger.info(
+            f"Activity filter kept {len(active)} of {len(records)} clips "
+            f"(motion >= {self.motion_threshold}, luma > {self.black_threshold})"
+        )
+        if output_folder is not None:
+            write_activity_report(output_folder, records, self)
+        return active
+
+
+def write_activity_report(output_folder, records, activity_filter):
+    report = {
+        "motion_threshold": activity_filter.motion_threshold,
+        "black_threshold": activity_filter.black_threshold,
+        "sample_fps": activity_filter.fps,
+        "clips": records,
+    }
+    report_path = os.path.join(output_folder, ACTIVITY_FILE_NAME)
+    with open(report_path, "w", encoding="utf-8") as report_file:
+        json.dump(report, report_file, indent=1)
+    return report_path
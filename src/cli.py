@@ -0,0 +1,346 @@
+# cli.py
+"""Command-line front end for the video cutter
+
+    python cli.py INPUT OUTPUT_FOLDER [--clip-duration 3] [--skip-duration 10]
+                  [--encoder libx264] [--workers 4] [--dry-run] [--follow]
+                  [--trace trace.json]
+"""
+import argparse
+import json
+import logging
+import sys
+
+from activity_filter import (DEFAULT_BLACK_THRESHOLD, DEFAULT_MOTION_THRESHOLD,
+                             ActivityFilter)
+from clip_archive import ARCHIVE_FORMATS
+from clip_cache import DEFAULT_MAX_BYTES, ClipCache
+from clip_layout import ClipLayout
+from clip_planner import DEFAULT_MIN_LAST_CLIP
+from duplicate_filter import DEFAULT_MAX_DISTANCE, DuplicateFilter
+from encoder_lanes import LaneScheduler, parse_lane
+from packaged_output import DEFAULT_SEGMENT_DURATION, OUTPUT_FORMATS
+from retry_policy import RetryPolicy
+from silence_planner import DEFAULT_SILENCE_DB, SilencePlanner
+from trace_recorder import TraceRecorder
+
+# Options of a regular job that tail mode (--follow) cannot honour
+FOLLOW_UNSUPPORTED = (
+    "lane",
+    "output_format",
+    "segment_duration",
+    "single_playlist",
+    "max_attempts",
+    "cache_dir",
+    "cache_max_gb",
+    "skip_static",
+    "motion_threshold",
+    "black_threshold",
+    "skip_duplicates",
+    "duplicate_distance",
+    "snap_to_silence",
+    "silence_db",
+    "digits",
+    "shard_size",
+    "shard_by_hour",
+    "no_index",
+    "archive",
+    "archive_max_mb",
+    "read_ahead",
+    "engine",
+    "trace",
+)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Cut a video into short clips")
+    parser.add_argument("input", help="Input video")
+    parser.add_argument("output", nargs="?", help="Output folder for the clips")
+    parser.add_argument("--clip-duration", type=float, default=3)
+    parser.add_argument("--skip-duration", type=float, default=10)
+    parser.add_argument("--encoder", default="libx264")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--lane",
+        action="append",
+        default=[],
+        metavar="ENCODER[:SLOTS[:PRESET]]",
+        help="Encode on several encoders at once, e.g. --lane h264_nvenc:2 "
+        "--lane libx264:6; replaces --encoder and --workers",
+    )
+    parser.add_argument(
+        "--min-last-clip",
+        type=float,
+        default=DEFAULT_MIN_LAST_CLIP,
+        help="Drop a last clip shorter than this many seconds",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=sorted(OUTPUT_FORMATS),
+        default="mp4",
+        help="Write plain MP4 clips or package each clip as HLS/DASH",
+    )
+    parser.add_argument(
+        "--segment-duration",
+        type=float,
+        default=DEFAULT_SEGMENT_DURATION,
+        help="Segment length in seconds for HLS/DASH output",
+    )
+    parser.add_argument(
+        "--single-playlist",
+        action="store_true",
+        help="With HLS output, also write one playlist for the whole clip sequence",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=3,
+        help="Attempts per clip before giving up (the last ones use libx264)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Reuse identical clips from this content-addressed cache folder",
+    )
+    parser.add_argument(
+        "--cache-max-gb",
+        type=float,
+        default=DEFAULT_MAX_BYTES / 1024**3,
+        help="Size cap of the clip cache; least recently used clips are evicted",
+    )
+    parser.add_argument(
+        "--skip-static",
+        action="store_true",
+        help="Score clips in a low-resolution pre-pass and skip static or black ones",
+    )
+    parser.add_argument(
+        "--motion-threshold",
+        type=float,
+        default=DEFAULT_MOTION_THRESHOLD,
+        help="With --skip-static, mean frame difference (0-255) a clip needs",
+    )
+    parser.add_argument(
+        "--black-threshold",
+        type=float,
+        default=DEFAULT_BLACK_THRESHOLD,
+        help="With --skip-static, mean luma (0-255) at or below which a clip is black",
+    )
+    parser.add_argument(
+        "--skip-duplicates",
+        action="store_true",
+        help="Skip clips whose frames repeat an earlier clip (perceptual hash)",
+    )
+    parser.add_argument(
+        "--duplicate-distance",
+        type=int,
+        default=DEFAULT_MAX_DISTANCE,
+        help="With --skip-duplicates, max differing hash bits (of 64) for a repeat",
+    )
+    parser.add_argument(
+        "--snap-to-silence",
+        action="store_true",
+        help="Move clip boundaries into audio pauses and skip silent clips",
+    )
+    parser.add_argument(
+        "--silence-db",
+        type=float,
+        default=DEFAULT_SILENCE_DB,
+        help="With --snap-to-silence, audio level (dBFS) counted as silence",
+    )
+    parser.add_argument(
+        "--digits",
+        type=int,
+        help="Zero-padding of clip numbers (default: sized to the plan, min 3)",
+    )
+    shards = parser.add_mutually_exclusive_group()
+    shards.add_argument(
+        "--shard-size",
+        type=int,
+        metavar="N",
+        help="Write clips into sub-directories of N clips each",
+    )
+    shards.add_argument(
+        "--shard-by-hour",
+        action="store_true",
+        help="Write clips into one sub-directory per hour of source time",
+    )
+    parser.add_argument(
+        "--no-index",
+        action="store_true",
+        help="Do not write clip_index.tsv to the output folder",
+    )
+    parser.add_argument(
+        "--archive",
+        choices=ARCHIVE_FORMATS,
+        help="Pack the clips into clips.tar or a store-only clips.zip as they finish",
+    )
+    parser.add_argument(
+        "--archive-max-mb",
+        type=float,
+        help="With --archive, start a new archive before one grows past this size",
+    )
+    parser.add_argument(
+        "--read-ahead",
+        type=int,
+        default=0,
+        metavar="CLIPS",
+        help="Load the input of this many upcoming clips ahead of their encodes "
+        "(for inputs on hard disks or network mounts)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("ffmpeg", "pyav-copy", "pyav-encode"),
+        default="ffmpeg",
+        help="Cut in-process with PyAV instead of one ffmpeg per clip "
+        "(pyav-copy remuxes from the previous keyframe without encoding)",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Write a Chrome/Perfetto trace of the job timeline to PATH",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the frame-exact clip plan as JSON and exit",
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Cut a recording that is still growing, clip by clip as it is written",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=30,
+        help="With --follow, seconds without growth before the file is final",
+    )
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+
+    from cutting_video import cut_video, plan_clips
+    from stream_input import is_streaming_input
+
+    if args.dry_run:
+        plan = plan_clips(
+            args.input, args.clip_duration, args.skip_duration, args.min_last_clip
+        )
+        json.dump(plan, sys.stdout, indent=1)
+        sys.stdout.write("\n")
+        return 0
+
+    if not args.output:
+        build_parser().error("an output folder is required unless --dry-run is used")
+
+    if args.follow:
+        parser = build_parser()
+        unsupported = [
+            "--" + dest.replace("_", "-")
+            for dest in FOLLOW_UNSUPPORTED
+            if getattr(args, dest) != parser.get_default(dest)
+        ]
+        if unsupported:
+            parser.error(f"--follow cannot be combined with {', '.join(unsupported)}")
+
+    clip_cache = None
+    if args.cache_dir:
+        clip_cache = ClipCache(args.cache_dir, int(args.cache_max_gb * 1024**3))
+
+    activity_filter = None
+    if args.skip_static:
+        activity_filter = ActivityFilter(args.motion_threshold, args.black_threshold)
+
+    duplicate_filter = None
+    if args.skip_duplicates:
+        duplicate_filter = DuplicateFilter(max_distance=args.duplicate_distance)
+
+    silence_planner = None
+    if args.snap_to_silence:
+        silence_planner = SilencePlanner(silence_db=args.silence_db)
+
+    engine = None
+    if args.engine != "ffmpeg":
+        try:
+            from pyav_engine import PyAVEngine
+        except ImportError:
+            build_parser().error(f"--engine {args.engine} needs PyAV (pip install av)")
+        engine = PyAVEngine(args.engine.split("-", 1)[1])
+
+    try:
+        layout = ClipLayout(args.digits, args.shard_size, args.shard_by_hour)
+    except ValueError as e:
+        build_parser().error(str(e))
+
+    archive_max_bytes = None
+    if args.archive_max_mb:
+        archive_max_bytes = int(args.archive_max_mb * 1024**2)
+
+    lanes = None
+    if args.lane:
+        if engine is not None:
+            build_parser().error("--lane cannot be combined with --engine")
+        try:
+            lanes = LaneScheduler([parse_lane(spec) for spec in args.lane])
+        except ValueError as e:
+            build_parser().error(str(e))
+
+    # A single-pass stream cannot retry clips, so it gets no retry policy
+    retry_policy = None
+    if not is_streaming_input(args.input):
+        retry_policy = RetryPolicy(max_attempts=args.max_attempts)
+
+    if args.follow:
+        from tail_mode import follow_and_cut
+
+        success = follow_and_cut(
+            args.input,
+            args.output,
+            max_workers=args.workers,
+            clip_duration=args.clip_duration,
+            skip_duration=args.skip_duration,
+            encoder=args.encoder,
+            min_last_clip=args.min_last_clip,
+            idle_timeout=args.idle_timeout,
+        )
+    else:
+        trace = TraceRecorder(args.trace) if args.trace else None
+        try:
+            success = cut_video(
+                args.input,
+                args.output,
+                max_workers=args.workers,
+                clip_duration=args.clip_duration,
+                skip_duration=args.skip_duration,
+                encoder=args.encoder,
+                min_last_clip=args.min_last_clip,
+                output_format=args.output_format,
+                segment_duration=args.segment_duration,
+                single_playlist=args.single_playlist,
+                retry_policy=retry_policy,
+                clip_cache=clip_cache,
+                activity_filter=activity_filter,
+                silence_planner=silence_planner,
+                duplicate_filter=duplicate_filter,
+                trace=trace,
+                engine=engine,
+                lanes=lanes,
+                layout=layout,
+                clip_index=not args.no_index,
+                archive=args.archive,
+                archive_max_bytes=archive_max_bytes,
+                read_ahead=args.read_ahead,
+            )
+        finally:
+            if trace is not None:
+                trace.close()
+            if engine is not None:
+                engine.close()
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
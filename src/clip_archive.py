@@ -0,0 +1,202 @@
+# clip_archive.py
+"""Clips packed into tar or store-only zip archives as they are finished
+
+Copying thousands of small MP4 files is dominated by per-file overhead, so
+a job can write its clips into one archive (clips.tar or clips.zip) or a
+rolling series of archives of bounded size (clips-0001.tar, ...). Each
+clip is encoded into a scratch folder, appended to the current archive as
+soon as it is done and deleted; no loose clips are left and no second
+packing pass is needed. MP4 needs a seekable output for its index, which
+is why ffmpeg cannot write into the archive directly.
+
+Clips are stored uncompressed, so a clip can be read straight out of an
+archive with one seek: the job's clip_index.tsv gets "archive" and
+"offset" columns with the archive file name and the byte offset of the
+clip's data in it. Zip archives also have their own central directory.
+"""
+import logging
+import os
+import tarfile
+import threading
+import zipfile
+
+from clip_layout import CLIP_INDEX_NAME
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMATS = ("tar", "zip")
+SCRATCH_FOLDER = ".clips-scratch"
+# Header bytes reserved per member when deciding whether a clip still fits
+MEMBER_OVERHEAD = 1024
+
+
+class ClipArchive:
+    """Appends finished clips to tar or zip archives in output_folder"""
+
+    def __init__(
+        self, output_folder, archive_format="tar", max_bytes=None, name="clips"
+    ):
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(
+                f"Unknown archive format '{archive_format}', "
+                f"expected one of {', '.join(ARCHIVE_FORMATS)}"
+            )
+        self.output_folder = output_folder
+        self.archive_format = archive_format
+        self.max_bytes = max_bytes
+        self.name = name
+        self.scratch_folder = os.path.join(output_folder, SCRATCH_FOLDER)
+        self.archive = None  # Open TarFile or ZipFile
+        self.archive_name = None
+        self.archive_bytes = 0
+        self.archives = []  # File names of all archives written so far
+        self.unarchived = []  # Scratch paths of clips that could not be added
+        self.lock = threading.Lock()
+
+    def next_name(self):
+        if self.max_bytes is None:
+            return f"{self.name}.{self.archive_format}"
+        return f"{self.name}-{len(self.archives) + 1:04d}.{self.archive_format}"
+
+    def open_next(self):
+        self.close_current()
+        self.archive_name = self.next_name()
+        path = os.path.join(self.output_folder, self.archive_name)
+        if self.archive_format == "tar":
+            self.archive = tarfile.open(path, "w", format=tarfile.PAX_FORMAT)
+        else:
+            self.archive = zipfile.ZipFile(
+                path, "w", compression=zipfile.ZIP_STORED, allowZip64=True
+            )
+        self.archive_bytes = 0
+        self.archives.append(self.archive_name)
+        logger.info(f"Writing clips to {path}")
+
+    def close_current(self):
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+
+    def rollback(self, start, members):
+        """Cut a half-written member off the end of the current archive
+
+        start is the archive's size and members its member count before the
+        member was added. If the archive cannot be cut back it is left as is
+        and the next clip starts a new archive.
+        """
+        try:
+            if self.archive_format == "tar":
+                archive_file = self.archive.fileobj
+                self.archive.offset = start
+            else:
+                archive_file = self.archive.fp
+                del self.archive.filelist[members:]
+                self.archive.NameToInfo = {
+                    info.filename: info for info in self.archive.filelist
+                }
+                self.archive.start_dir = start
+            archive_file.seek(start)
+            archive_file.truncate()
+        except OSError as e:
+            logger.error(f"Could not repair {self.archive_name}: {e}")
+            try:
+                self.close_current()
+            except OSError:
+                pass
+            self.archive = None
+
+    def add(self, clip_path):
+        """Move clip_path from the scratch folder into the current archive
+
+        Returns (archive file name, member name, offset of the clip's data).
+        Raises OSError if the clip cannot be added; the clip is then left in
+        the scratch folder and the archive keeps only the earlier clips.
+        """
+        member_name = os.path.relpath(clip_path, self.scratch_folder)
+        member_name = member_name.replace(os.sep, "/")
+        size = os.path.getsize(clip_path)
+        with self.lock:
+            try:
+                if self.archive is None or (
+                    self.max_bytes is not None
+                    and self.archive_bytes
+                    and self.archive_bytes + size + MEMBER_OVERHEAD > self.max_bytes
+                ):
+                    self.open_next()
+                start = self.archive_bytes
+                members = len(self.archive_members())
+                try:
+                    offset = self.write_member(clip_path, member_name, size)
+                except OSError:
+                    self.rollback(start, members)
+                    raise
+            except OSError:
+                self.unarchived.append(clip_path)
+                raise
+            archive_name = self.archive_name
+        os.remove(clip_path)
+        return archive_name, member_name, offset
+
+    def archive_members(self):
+        if self.archive_format == "tar":
+            return self.archive.members
+        return self.archive.filelist
+
+    def write_member(self, clip_path, member_name, size):
+        """Append one clip to the current archive; returns its data offset"""
+        if self.archive_format == "tar":
+            member = self.archive.gettarinfo(clip_path, member_name)
+            member.uid = member.gid = 0
+            member.uname = member.gname = ""
+            with open(clip_path, "rb") as clip_file:
+                self.archive.addfile(member, clip_file)
+            # Data is followed by padding up to the next 512-byte block
+            blocks, remainder = divmod(size, tarfile.BLOCKSIZE)
+            padded = (blocks + bool(remainder)) * tarfile.BLOCKSIZE
+            self.archive_bytes = self.archive.offset
+            return self.archive.offset - padded
+        self.archive.write(clip_path, member_name)
+        self.archive_bytes = self.archive.fp.tell()
+        return self.archive_bytes - size
+
+    def close(self):
+        """Finish the current archive and clean up the scratch folder
+
+        Leftovers of failed encodes are removed; clips that could not be
+        added to an archive are kept there.
+        """
+        with self.lock:
+            self.close_current()
+        kept = set(self.unarchived)
+        try:
+            for folder, _, files in os.walk(self.scratch_folder, topdown=False):
+                for name in files:
+                    path = os.path.join(folder, name)
+                    if path not in kept:
+                        os.remove(path)  # Failed clips
+                if not os.listdir(folder):
+                    os.rmdir(folder)
+        except OSError as e:
+            logger.warning(f"Could not remove {self.scratch_folder}: {e}")
+        if kept:
+            logger.warning(
+                f"{len(kept)} clips could not be archived and were left in "
+                f"{self.scratch_folder}"
+            )
+        return self.archives
+
+
+def read_archived_clip(output_folder, index):
+    """Bytes of clip number index of an archived job, found via its clip index"""
+    index_path = os.path.join(output_folder, CLIP_INDEX_NAME)
+    with open(index_path, "r", encoding="utf-8") as rows:
+        columns = next(rows).rstrip("\n").split("\t")
+        for line in rows:
+            row = dict(zip(columns, line.rstrip("\n").split("\t")))
+            if int(row["index"]) == index:
+                break
+        else:
+            raise KeyError(f"Clip {index} is not in the clip index")
+    with open(os.path.join(output_folder, row["archive"]), "rb") as archive_file:
+        archive_file.seek(int(row["offset"]))
+        return archive_file.read(int(row["bytes"]))
@@ -0,0 +1,150 @@
+# clip_cache.py
+"""Content-addressed cache of encoded clips
+
+A clip is identified by the fingerprint of its input file (fingerprint.py)
+plus the exact encode parameters (start, duration, encoder and rate-control
+options), so re-cutting the same source with the same settings reuses earlier clips
+instead of encoding them again. Clips are placed into the new output folder
+as reflinks or hard links where the filesystem allows it, so a cache hit
+costs no extra disk space. Clips enter the cache only as reflinks or
+copies: an output file may later be rewritten in place, which must never
+change a cached clip. The store is capped in size and evicts the least
+recently used clips first.
+"""
+import errno
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".video_cutter", "clip_cache")
+DEFAULT_MAX_BYTES = 20 * 1024**3
+# After eviction the store is brought down to this fraction of max_bytes
+EVICT_TARGET_RATIO = 0.9
+# Linux FICLONE ioctl: copy-on-write clone on btrfs/XFS
+FICLONE = 0x40049409
+# Bump when the meaning of a key changes so stale entries are never reused
+KEY_VERSION = 2
+
+
+def clip_cache_key(fingerprint, encode_params):
+    """Cache key for one clip from the input fingerprint and encode parameters"""
+    payload = json.dumps(
+        {"version": KEY_VERSION, "input": fingerprint, "params": encode_params},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def reflink(source, destination):
+    """Copy-on-write clone of source; raises OSError where unsupported"""
+    import fcntl
+
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def link_or_copy(source, destination, hard_link=True):
+    """Place source at destination as a reflink, hard link or copy
+
+    With hard_link=False the two paths never share an inode.
+    """
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        reflink(source, destination)
+        return "reflink"
+    except (OSError, ImportError):
+        if os.path.exists(destination):
+            os.remove(destination)
+    if hard_link:
+        try:
+            os.link(source, destination)
+            return "link"
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                logger.debug(f"Hard link failed, copying instead: {e}")
+    shutil.copyfile(source, destination)
+    return "copy"
+
+
+class ClipCache:
+    """Size-capped, LRU-evicted store of encoded clips keyed by content"""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.total_bytes = sum(size for _, size, _ in self._entries())
+
+    def object_path(self, key):
+        return os.path.join(self.objects_dir, key[:2], f"{key}.mp4")
+
+    def fetch(self, key, destination):
+        """Place the cached clip for key at destination; False on a miss"""
+        path = self.object_path(key)
+        try:
+            os.utime(path)  # Mark as recently used
+            link_or_copy(path, destination)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"Could not reuse cached clip {key}: {e}")
+            return False
+
+    def store(self, key, source):
+        """Add an encoded clip to the cache and evict old entries if needed"""
+        path = self.object_path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            # A hard link would let a later rewrite of the output corrupt it
+            link_or_copy(source, temp_path, hard_link=False)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not cache {os.path.basename(source)}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        with self.lock:
+            self.total_bytes += os.path.getsize(path)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        """Yield (path, size, last_used) for every cached clip"""
+        for shard in os.scandir(self.objects_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".mp4"):
+                    stat = entry.stat()
+                    yield entry.path, stat.st_size, stat.st_mtime
+
+    def _evict(self):
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self.total_bytes = sum(size for _, size, _ in entries)
+        evicted = 0
+        for path, size, _ in entries:
+            if self.total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.total_bytes -= size
+            evicted += 1
+        if evicted:
+            logger.info(f"Evicted {evicted} clips from the clip cache")
@@ -0,0 +1,216 @@
+# clip_layout.py
+"""Clip file names, sub-directories and the clip index of a job
+
+Clips are named clip_<number> with the number zero-padded to the size of
+the plan (at least three digits), so names sort in clip order however
+many clips there are. Large jobs can be split into sub-directories of
+shard_size clips (clip_00001.mp4 ... in 00001-01000/) or one per hour of
+source time (hour_00/, hour_01/, ...), which keeps file browsers and
+directory listings fast with 100k+ clips.
+
+Every job also writes clip_index.tsv to the output folder: a header line
+and one tab-separated row per written clip, in clip order,
+
+    index   path    start_us    end_us  bytes
+
+with the path relative to the output folder and the source range in
+microseconds. Rows are appended while the job runs, so downstream tools
+can find clips without listing directories, even before the job ends.
+Jobs writing into archives (see clip_archive) add archive and offset
+columns, and the path is the clip's name inside the archive. The last two
+columns, encoder and preset, say how the clip was encoded (empty when
+unknown, e.g. for clips of an in-process engine), so tools such as
+highlight_reel can encode alike clips later.
+"""
+import os
+import threading
+from collections import deque
+
+from packaged_output import OUTPUT_FORMATS, is_packaged
+
+CLIP_INDEX_NAME = "clip_index.tsv"
+INDEX_COLUMNS = ("index", "path", "start_us", "end_us", "bytes")
+ARCHIVE_COLUMNS = ("archive", "offset")
+ENCODER_COLUMNS = ("encoder", "preset")
+MIN_DIGITS = 3
+US_PER_HOUR = 3_600_000_000
+
+
+class ClipLayout:
+    """Where each clip of a job is written"""
+
+    __slots__ = ("digits", "shard_size", "shard_by_hour", "prefix")
+
+    def __init__(
+        self, digits=None, shard_size=None, shard_by_hour=False, prefix="clip"
+    ):
+        if shard_size and shard_by_hour:
+            raise ValueError("Shard clips by count or by hour, not both")
+        if shard_size is not None and shard_size < 1:
+            raise ValueError("shard_size must be at least 1")
+        self.digits = digits
+        self.shard_size = shard_size
+        self.shard_by_hour = shard_by_hour
+        self.prefix = prefix
+
+    def for_plan(self, clip_count):
+        """This layout with the padding sized to a plan of clip_count clips"""
+        if self.digits is not None:
+            return self
+        return ClipLayout(
+            max(MIN_DIGITS, len(str(clip_count))),
+            self.shard_size,
+            self.shard_by_hour,
+            self.prefix,
+        )
+
+    def shard(self, index, start_us=0):
+        """Sub-directory of clip number index, or None"""
+        digits = self.digits or MIN_DIGITS
+        if self.shard_by_hour:
+            return f"hour_{start_us // US_PER_HOUR:02d}"
+        if self.shard_size:
+            first = (index - 1) // self.shard_size * self.shard_size + 1
+            last = first + self.shard_size - 1
+            return f"{first:0{digits}d}-{last:0{digits}d}"
+        return None
+
+    def relative_path(self, index, start_us=0, output_format="mp4"):
+        """Path of clip number index relative to the output folder"""
+        name = f"{self.prefix}_{index:0{self.digits or MIN_DIGITS}d}"
+        parts = []
+        shard = self.shard(index, start_us)
+        if shard is not None:
+            parts.append(shard)
+        if is_packaged(output_format):
+            # Packaged clips get a folder holding the playlist and segments
+            parts.extend([name, OUTPUT_FORMATS[output_format][0]])
+        else:
+            parts.append(f"{name}.mp4")
+        return os.path.join(*parts)
+
+    def clip_path(self, output_folder, window, output_format="mp4"):
+        """Path the clip of ClipWindow window is written to"""
+        return os.path.join(
+            output_folder,
+            self.relative_path(window.index, window.start_us, output_format),
+        )
+
+    def __repr__(self):
+        return (
+            f"ClipLayout(digits={self.digits}, shard_size={self.shard_size}, "
+            f"shard_by_hour={self.shard_by_hour})"
+        )
+
+
+DEFAULT_LAYOUT = ClipLayout()
+
+
+class ClipIndexWriter:
+    """Appends clip_index.tsv rows in clip order as clips finish in any order
+
+    Clips are registered with submitted() in plan order; a finished clip's
+    row is held back until every clip submitted before it has finished.
+    Only a few clips are in flight at once, so little is ever held.
+    """
+
+    def __init__(self, output_folder, archived=False):
+        self.output_folder = output_folder
+        self.path = os.path.join(output_folder, CLIP_INDEX_NAME)
+        self.file = open(self.path, "w", encoding="utf-8", newline="\n")
+        columns = INDEX_COLUMNS + (ARCHIVE_COLUMNS if archived else ())
+        columns += ENCODER_COLUMNS
+        self.file.write("\t".join(columns) + "\n")
+        self.pending = deque()  # Clip numbers in submission order
+        self.rows = {}  # Clip number -> row, or None for a failed clip
+        self.lock = threading.Lock()
+
+    def submitted(self, index):
+        with self.lock:
+            self.pending.append(index)
+
+    def finished(
+        self,
+        window,
+        output_path,
+        success,
+        bytes_written,
+        archived=None,
+        encoded_with=None,
+    ):
+        """Record a finished clip
+
+        archived is ClipArchive.add()'s result, encoded_with the (encoder,
+        preset) the clip was encoded with, if known.
+        """
+        row = None
+        if archived is not None:
+            archive_name, member_name, offset = archived
+            row = (
+                window.index,
+                member_name,
+                window.start_us,
+                window.end_us,
+                bytes_written,
+                archive_name,
+                offset,
+            )
+        elif success:
+            path = os.path.relpath(output_path, self.output_folder)
+            row = (
+                window.index,
+                path.replace(os.sep, "/"),
+                window.start_us,
+                window.end_us,
+                bytes_written,
+            )
+        if row is not None:
+            encoder, preset = encoded_with or (None, None)
+            row += (encoder or "", preset or "")
+        with self.lock:
+            self.rows[window.index] = row
+            while self.pending and self.pending[0] in self.rows:
+                self.write(self.rows.pop(self.pending.popleft()))
+            self.file.flush()
+
+    def write(self, row):
+        if row is not None:
+            self.file.write("\t".join(str(value) for value in row) + "\n")
+
+    def close(self):
+        """Write the remaining rows (clips that never ran are left out)"""
+        with self.lock:
+            while self.pending:
+                self.write(self.rows.pop(self.pending.popleft(), None))
+            self.file.close()
+        return self.path
+
+
+def read_clip_index(output_folder):
+    """Yield (index, path, start_us, end_us, bytes) rows of a job's clip index"""
+    index_path = os.path.join(output_folder, CLIP_INDEX_NAME)
+    with open(index_path, "r", encoding="utf-8") as index_file:
+        next(index_file)  # Header
+        for line in index_file:
+            row = line.rstrip("\n").split("\t")
+            index, path, start_us, end_us, size = row[: len(INDEX_COLUMNS)]
+            yield int(index), path, int(start_us), int(end_us), int(size)
+
+
+def read_clip_encoders(output_folder):
+    """Clip number -> (encoder, preset or None) of clips of a job's clip index
+
+    Clips whose encoder is unknown, and all clips of indexes written before
+    the encoder was recorded, are left out.
+    """
+    encoders = {}
+    index_path = os.path.join(output_folder, CLIP_INDEX_NAME)
+    with open(index_path, "r", encoding="utf-8") as index_file:
+        columns = next(index_file).rstrip("\n").split("\t")
+        if "encoder" not in columns:
+            return encoders
+        for line in index_file:
+            row = dict(zip(columns, line.rstrip("\n").split("\t")))
+            if row.get("encoder"):
+                encoders[int(row["index"])] = (row["encoder"], row["preset"] or None)
+    return encoders
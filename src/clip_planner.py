@@ -0,0 +1,237 @@
+# clip_planner.py
+from fractions import Fraction
+
+# Used when the probe data has no usable video frame rate (e.g. audio only);
+# the plan then works in millisecond ticks instead of frames
+FALLBACK_TICK_RATE = Fraction(1000)
+
+# Last clips shorter than this (in seconds) are dropped instead of spawning
+# a whole encoder process for a sliver of video
+DEFAULT_MIN_LAST_CLIP = 0.5
+
+
+def parse_rational(value):
+    """Parse an ffprobe rational such as '30000/1001' or '0.040' into a Fraction
+
+    Returns None for missing or degenerate values like '0/0'.
+    """
+    if value in (None, "", "N/A"):
+        return None
+    try:
+        if isinstance(value, str) and "/" in value:
+            num, den = value.split("/", 1)
+            if int(den) == 0:
+                return None
+            result = Fraction(int(num), int(den))
+        else:
+            result = Fraction(str(value))
+    except (ValueError, ZeroDivisionError):
+        return None
+    return result if result > 0 else None
+
+
+def round_fraction(value):
+    """Round a Fraction to the nearest integer, halves rounding up"""
+    return int((value * 2 + 1) // 2)
+
+
+def format_us(microseconds):
+    """Format integer microseconds as an ffmpeg time string ('12.345678')"""
+    return f"{microseconds // 1_000_000}.{microseconds % 1_000_000:06d}"
+
+
+def parse_us(value):
+    """Inverse of format_us: '12.345678' -> 12345678"""
+    seconds, _, fraction = str(value).partition(".")
+    return int(seconds) * 1_000_000 + int((fraction + "000000")[:6])
+
+
+def frames_to_us(frames, frame_rate):
+    """Convert a frame count at frame_rate to the nearest whole microsecond"""
+    return round_fraction(Fraction(frames * 1_000_000) / frame_rate)
+
+
+def get_video_stream(probe_data):
+    return next(
+        (
+            stream
+            for stream in probe_data.get("streams", [])
+            if stream.get("codec_type") == "video"
+            and not stream.get("disposition", {}).get("attached_pic")
+        ),
+        None,
+    )
+
+
+def get_frame_rate(probe_data):
+    """Exact frame rate of the main video stream, or the fallback tick rate"""
+    stream = get_video_stream(probe_data)
+    if stream:
+        for key in ("avg_frame_rate", "r_frame_rate"):
+            rate = parse_rational(stream.get(key))
+            if rate:
+                return rate
+    return FALLBACK_TICK_RATE
+
+
+def get_exact_duration(probe_data):
+    """Media duration in seconds as a Fraction
+
+    Uses the video stream's duration_ts in its time_base when available so
+    no float rounding enters the plan, and the container duration otherwise.
+    """
+    stream = get_video_stream(probe_data)
+    if stream:
+        time_base = parse_rational(stream.get("time_base"))
+        duration_ts = stream.get("duration_ts")
+        if time_base and duration_ts not in (None, "N/A"):
+            return int(duration_ts) * time_base
+
+        duration = parse_rational(stream.get("duration"))
+        if duration:
+            return duration
+
+    duration = parse_rational(probe_data.get("format", {}).get("duration"))
+    if duration is None:
+        raise ValueError("Input has no known duration")
+    return duration
+
+
+class ClipWindow:
+    """One planned clip, expressed in whole frames of the source"""
+
+    __slots__ = ("index", "start_frame", "frame_count", "frame_rate")
+
+    def __init__(self, index, start_frame, frame_count, frame_rate):
+        self.index = index
+        self.start_frame = start_frame
+        self.frame_count = frame_count
+        self.frame_rate = frame_rate
+
+    @property
+    def end_frame(self):
+        return self.start_frame + self.frame_count
+
+    @property
+    def start_us(self):
+        return frames_to_us(self.start_frame, self.frame_rate)
+
+    @property
+    def end_us(self):
+        return frames_to_us(self.end_frame, self.frame_rate)
+
+    @property
+    def duration_us(self):
+        # Derived from the rounded boundaries so consecutive clips never
+        # overlap or leave a gap, however many clips there are
+        return self.end_us - self.start_us
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "start_frame": self.start_frame,
+            "frame_count": self.frame_count,
+            "start_us": self.start_us,
+            "duration_us": self.duration_us,
+        }
+
+    def __repr__(self):
+        return (
+            f"ClipWindow(index={self.index}, start_frame={self.start_frame}, "
+            f"frame_count={self.frame_count})"
+        )
+
+
+class ClipPlan:
+    """Frame-exact plan of clip/skip windows over a source
+
+    total_frames may be None for a source whose length is not known yet, in
+    which case iteration never ends and the caller decides when to stop.
+    """
+
+    def __init__(
+        self,
+        frame_rate,
+        clip_duration,
+        skip_duration,
+        total_frames=None,
+        min_last_clip=DEFAULT_MIN_LAST_CLIP,
+    ):
+        self.frame_rate = Fraction(frame_rate)
+        self.clip_frames = max(1, self.seconds_to_frames(clip_duration))
+        self.skip_frames = max(0, self.seconds_to_frames(skip_duration))
+        self.min_last_frames = self.seconds_to_frames(min_last_clip)
+        self.total_frames = total_frames
+
+    @classmethod
+    def from_probe(
+        cls,
+        probe_data,
+        clip_duration,
+        skip_duration,
+        min_last_clip=DEFAULT_MIN_LAST_CLIP,
+    ):
+        frame_rate = get_frame_rate(probe_data)
+        total_frames = round_fraction(get_exact_duration(probe_data) * frame_rate)
+        return cls(
+            frame_rate, clip_duration, skip_duration, total_frames, min_last_clip
+        )
+
+    def seconds_to_frames(self, seconds):
+        return round_fraction(Fraction(str(seconds)) * self.frame_rate)
+
+    @property
+    def period_frames(self):
+        return self.clip_frames + self.skip_frames
+
+    def window(self, index, total_frames=None):
+        """Return window number index (1-based), trimmed to total_frames
+
+        Returns None if the window starts past the end or would be a last
+        clip shorter than the minimum.
+        """
+        if total_frames is None:
+            total_frames = self.total_frames
+
+        start_frame = (index - 1) * self.period_frames
+        frame_count = self.clip_frames
+        if total_frames is not None:
+            if start_frame >= total_frames:
+                return None
+            frame_count = min(frame_count, total_frames - start_frame)
+            if frame_count < self.clip_frames and frame_count < self.min_last_frames:
+                if index > 1:
+                    return None
+        return ClipWindow(index, start_frame, frame_count, self.frame_rate)
+
+    def __len__(self):
+        if self.total_frames is None:
+            raise TypeError("Plan length is unknown for an open-ended source")
+        if self.total_frames <= 0:
+            return 0
+
+        count = -(-self.total_frames // self.period_frames)  # ceil
+        if count > 1 and self.window(count) is None:
+            count -= 1
+        return count
+
+    def __iter__(self):
+        index = 1
+        while True:
+            window = self.window(index)
+            if window is None:
+                return
+            yield window
+            index += 1
+
+    def to_dict(self):
+        """Full dry-run description of the plan"""
+        rate = self.frame_rate
+        return {
+            "frame_rate": f"{rate.numerator}/{rate.denominator}",
+            "total_frames": self.total_frames,
+            "clip_frames": self.clip_frames,
+            "skip_frames": self.skip_frames,
+            "min_last_frames": self.min_last_frames,
+            "clips": [window.to_dict() for window in self],
+        }
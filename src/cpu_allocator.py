@@ -0,0 +1,203 @@
+# cpu_allocator.py
+"""Topology-aware division of CPU cores between concurrent ffmpeg processes
+
+Each encode slot gets its own set of cores (whole physical cores where
+possible), the ffmpeg running in that slot is pinned to it and told to use
+that many threads, and it runs at a lower CPU/IO priority so the desktop
+stays responsive.
+"""
+import logging
+import math
+import os
+import queue
+import sys
+from contextlib import contextmanager
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NICE = 10
+# psutil IO priority: best-effort class, lowest level
+DEFAULT_IONICE = 7
+
+
+def cgroup_cpu_limit():
+    """CPU count allowed by the cgroup quota, or None if unlimited"""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max", "r") as cpu_max:
+            quota, period = cpu_max.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        # cgroup v1
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "r") as quota_file:
+            quota = int(quota_file.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us", "r") as period_file:
+            period = int(period_file.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus():
+    """Logical CPUs this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    try:
+        return sorted(psutil.Process().cpu_affinity())
+    except (AttributeError, psutil.Error):
+        return list(range(psutil.cpu_count(logical=True) or 1))
+
+
+def physical_core_groups(cpus):
+    """Group logical CPUs that share a physical core (hyper-threads)"""
+    groups = {}
+    for cpu in cpus:
+        topology = f"/sys/devices/system/cpu/cpu{cpu}/topology"
+        try:
+            with open(f"{topology}/physical_package_id", "r") as package_file:
+                package = int(package_file.read())
+            with open(f"{topology}/core_id", "r") as core_file:
+                core = int(core_file.read())
+            key = (package, core)
+        except (OSError, ValueError):
+            key = None
+        groups.setdefault(key if key is not None else ("cpu", cpu), []).append(cpu)
+
+    if len(groups) == len(cpus):
+        # No topology info (non-Linux): assume consecutive logical CPUs are
+        # siblings when psutil reports fewer physical than logical cores
+        physical = psutil.cpu_count(logical=False) or len(cpus)
+        per_core = max(1, len(cpus) // physical)
+        return [cpus[i : i + per_core] for i in range(0, len(cpus), per_core)]
+    return sorted(groups.values())
+
+
+def split_evenly(items, parts):
+    """Split items into parts contiguous chunks whose sizes differ by at most 1"""
+    size, extra = divmod(len(items), parts)
+    chunks = []
+    start = 0
+    for index in range(parts):
+        end = start + size + (1 if index < extra else 0)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
+
+
+class CpuSlot:
+    """Cores assigned to one concurrent encode"""
+
+    __slots__ = ("index", "cores")
+
+    def __init__(self, index, cores):
+        self.index = index
+        self.cores = cores
+
+    @property
+    def threads(self):
+        return len(self.cores)
+
+    def __repr__(self):
+        return f"CpuSlot(index={self.index}, cores={self.cores})"
+
+
+class CpuAllocator:
+    """Hands out disjoint core sets to at most `slots` concurrent encodes"""
+
+    def __init__(self, slots, nice=DEFAULT_NICE, ionice=DEFAULT_IONICE):
+        self.nice = nice
+        self.ionice = ionice
+
+        cpus = available_cpus()
+        limit = cgroup_cpu_limit()
+        if limit is not None:
+            # Running on more cores than the quota only causes throttling
+            cpus = cpus[: max(1, math.ceil(limit))]
+
+        groups = physical_core_groups(cpus)
+        if slots <= len(groups):
+            core_sets = [sum(chunk, []) for chunk in split_evenly(groups, slots)]
+        elif slots <= len(cpus):
+            core_sets = split_evenly(cpus, slots)
+        else:
+            # More encodes than CPUs: slots share single CPUs round-robin
+            core_sets = [[cpus[index % len(cpus)]] for index in range(slots)]
+
+        self.slots = [CpuSlot(index, cores) for index, cores in enumerate(core_sets)]
+        self.free = queue.Queue()
+        for slot in self.slots:
+            self.free.put(slot)
+
+        logger.info(
+            f"CPU allocation: {len(cpus)} CPUs, {len(groups)} physical cores, "
+            f"{slots} slots of {[slot.threads for slot in self.slots]} threads"
+        )
+
+    @contextmanager
+    def slot(self):
+        """Reserve a core set for the duration of one encode"""
+        slot = self.free.get()
+        try:
+            yield slot
+        finally:
+            self.free.put(slot)
+
+    def child_setup(self, slot):
+        """preexec_fn applying slot settings inside the forked ffmpeg, or None
+
+        On Linux affinity, nice and IO priority are set in the child between
+        fork and exec, so ffmpeg is pinned from its first instruction, before
+        it starts its own threads, while the pooled worker thread that spawns
+        it keeps its own settings for clips that are not given a slot (e.g.
+        hardware encoder lanes). Errors are ignored: nothing may be logged
+        between fork and exec.
+        """
+        if not sys.platform.startswith("linux"):
+            return None
+        cores, nice, ionice = slot.cores, self.nice, self.ionice
+
+        def setup():
+            try:
+                os.sched_setaffinity(0, cores)
+            except OSError:
+                pass
+            try:
+                if nice and os.getpriority(os.PRIO_PROCESS, 0) < nice:
+                    os.setpriority(os.PRIO_PROCESS, 0, nice)
+            except OSError:
+                pass
+            if ionice is not None:
+                try:
+                    psutil.Process().ionice(psutil.IOPRIO_CLASS_BE, ionice)
+                except (psutil.Error, OSError, ValueError):
+                    pass
+
+        return setup
+
+    def after_spawn(self, process, slot):
+        """Apply slot settings to a started process on non-Linux systems"""
+        if sys.platform.startswith("linux"):
+            return
+        try:
+            child = psutil.Process(process.pid)
+            if hasattr(child, "cpu_affinity"):
+                child.cpu_affinity(slot.cores)
+            if self.nice:
+                if os.name == "nt":
+                    child.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
+                else:
+                    child.nice(self.nice)
+            if self.ionice is not None and hasattr(child, "ionice"):
+                if os.name == "nt":
+                    child.ionice(psutil.IOPRIO_LOW)
+        except (psutil.Error, OSError, ValueError) as e:
+            logger.debug(f"Could not apply CPU settings to ffmpeg: {e}")
@@ -0,0 +1,291 @@
+# cutter_api.py
+"""Qt-free library API for embedding the cutter in other programs
+
+    from cutter_api import Cutter, CutJob
+
+    with Cutter(max_jobs=2, max_concurrent_clips=4) as cutter:
+        future = cutter.submit(CutJob("talk.mp4", "clips/talk", encoder="libx264"))
+        result = future.result()
+        print(result.succeeded, result.failed)
+
+A Cutter runs many jobs in one process. Jobs share a cap on concurrent
+encodes and the CPU cores, and never kill ffmpeg processes they did not
+start. Every job reports structured per-clip results and can be cancelled.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from clip_layout import ClipLayout
+from clip_planner import DEFAULT_MIN_LAST_CLIP, ClipPlan
+from cpu_allocator import CpuAllocator
+from cutting_video import cut_video, probe_video
+from progress_tracker import ProgressTracker
+
+# cut_video arguments the Cutter sets itself
+RESERVED_OPTIONS = (
+    "progress_callback",
+    "progress_tracker",
+    "clip_callback",
+    "clip_slots",
+    "cleanup",
+    "cancel_event",
+)
+
+
+class ClipSpec:
+    """One planned clip: position in the source and output path"""
+
+    __slots__ = ("index", "start_us", "duration_us", "output_path")
+
+    def __init__(self, index, start_us, duration_us, output_path):
+        self.index = index
+        self.start_us = start_us
+        self.duration_us = duration_us
+        self.output_path = output_path
+
+    @classmethod
+    def from_window(cls, window, output_path):
+        return cls(window.index, window.start_us, window.duration_us, output_path)
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "start_us": self.start_us,
+            "duration_us": self.duration_us,
+            "output_path": self.output_path,
+        }
+
+    def __repr__(self):
+        return (
+            f"ClipSpec(index={self.index}, start_us={self.start_us}, "
+            f"duration_us={self.duration_us})"
+        )
+
+
+class ClipResult:
+    """Outcome of one clip; error holds the last ffmpeg error on failure"""
+
+    __slots__ = ("spec", "success", "error", "bytes_written")
+
+    def __init__(self, spec, success, error=None, bytes_written=0):
+        self.spec = spec
+        self.success = success
+        self.error = error
+        self.bytes_written = bytes_written
+
+    def to_dict(self):
+        result = self.spec.to_dict()
+        result.update(
+            {
+                "success": self.success,
+                "error": self.error,
+                "bytes_written": self.bytes_written,
+            }
+        )
+        return result
+
+
+class JobResult:
+    """Outcome of a CutJob, clips sorted by index
+
+    completed is False when cut_video reported the job as failed, e.g. a
+    stream input whose ffmpeg pass failed before any clip was written.
+    """
+
+    __slots__ = ("job", "clips", "elapsed", "cancelled", "completed")
+
+    def __init__(self, job, clips, elapsed, cancelled=False, completed=True):
+        self.job = job
+        self.clips = sorted(clips, key=lambda clip: clip.spec.index)
+        self.elapsed = elapsed
+        self.cancelled = cancelled
+        self.completed = completed
+
+    @property
+    def succeeded(self):
+        return sum(1 for clip in self.clips if clip.success)
+
+    @property
+    def failed(self):
+        return len(self.clips) - self.succeeded
+
+    @property
+    def ok(self):
+        return not self.cancelled and self.completed and self.failed == 0
+
+    def to_dict(self):
+        return {
+            "input_path": self.job.input_path,
+            "output_folder": self.job.output_folder,
+            "elapsed": round(self.elapsed, 3),
+            "cancelled": self.cancelled,
+            "completed": self.completed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "clips": [clip.to_dict() for clip in self.clips],
+        }
+
+
+class CutJob:
+    """Description of one cutting job
+
+    options are passed on to cut_video as keyword arguments (output_format,
+    retry_policy, clip_cache, activity_filter, ...). progress is a
+    ProgressTracker that can be sampled while the job runs.
+    """
+
+    __slots__ = (
+        "input_path",
+        "output_folder",
+        "clip_duration",
+        "skip_duration",
+        "encoder",
+        "max_workers",
+        "min_last_clip",
+        "options",
+        "progress",
+        "cancel_event",
+    )
+
+    def __init__(
+        self,
+        input_path,
+        output_folder,
+        clip_duration=3,
+        skip_duration=10,
+        encoder="h264_nvenc",
+        max_workers=4,
+        min_last_clip=DEFAULT_MIN_LAST_CLIP,
+        **options,
+    ):
+        reserved = [name for name in options if name in RESERVED_OPTIONS]
+        if reserved:
+            raise TypeError(f"CutJob does not accept {', '.join(reserved)}")
+        self.input_path = input_path
+        self.output_folder = output_folder
+        self.clip_duration = clip_duration
+        self.skip_duration = skip_duration
+        self.encoder = encoder
+        self.max_workers = max_workers
+        self.min_last_clip = min_last_clip
+        self.options = options
+        self.progress = ProgressTracker()
+        self.cancel_event = threading.Event()
+
+    def plan(self):
+        """ClipSpecs of the unfiltered plan, without encoding anything"""
+        plan = ClipPlan.from_probe(
+            probe_video(self.input_path),
+            self.clip_duration,
+            self.skip_duration,
+            self.min_last_clip,
+        )
+        output_format = self.options.get("output_format", "mp4")
+        layout = (self.options.get("layout") or ClipLayout()).for_plan(len(plan))
+        return [
+            ClipSpec.from_window(
+                window, layout.clip_path(self.output_folder, window, output_format)
+            )
+            for window in plan
+        ]
+
+    def cancel(self):
+        """Stop the job; running clips finish, queued clips are dropped"""
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def __repr__(self):
+        return f"CutJob({self.input_path!r}, {self.output_folder!r})"
+
+
+class Cutter:
+    """Runs CutJobs on a thread pool and returns futures of JobResults
+
+    max_concurrent_clips caps the encodes running at once across all jobs
+    and divides the CPU cores between them; without it each job runs up to
+    its own max_workers encodes.
+    """
+
+    def __init__(self, max_jobs=1, max_concurrent_clips=None):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_jobs, thread_name_prefix="cut-job"
+        )
+        self.jobs = set()  # Submitted jobs that have not finished
+        self.jobs_lock = threading.Lock()
+        self.clip_slots = None
+        self.cpu_allocator = None
+        if max_concurrent_clips:
+            self.clip_slots = threading.BoundedSemaphore(max_concurrent_clips)
+            self.cpu_allocator = CpuAllocator(max_concurrent_clips)
+
+    def submit(self, job):
+        """Queue job; returns a concurrent.futures.Future of its JobResult"""
+        with self.jobs_lock:
+            self.jobs.add(job)
+        future = self.executor.submit(self.run, job)
+        future.add_done_callback(lambda _: self.forget(job))
+        return future
+
+    def forget(self, job):
+        with self.jobs_lock:
+            self.jobs.discard(job)
+
+    def run(self, job):
+        """Run job in the calling thread and return its JobResult"""
+        clips = []
+        clips_lock = threading.Lock()
+        started = time.monotonic()
+
+        def clip_callback(window, output_path, success, error, bytes_written):
+            spec = ClipSpec.from_window(window, output_path)
+            with clips_lock:
+                clips.append(ClipResult(spec, success, error, bytes_written))
+
+        options = dict(job.options)
+        if self.cpu_allocator is not None:
+            options.setdefault("cpu_allocator", self.cpu_allocator)
+
+        job.progress.reset()
+        completed = False
+        if not job.cancelled:
+            completed = cut_video(
+                job.input_path,
+                job.output_folder,
+                max_workers=job.max_workers,
+                clip_duration=job.clip_duration,
+                skip_duration=job.skip_duration,
+                encoder=job.encoder,
+                min_last_clip=job.min_last_clip,
+                progress_tracker=job.progress,
+                clip_callback=clip_callback,
+                clip_slots=self.clip_slots,
+                cleanup=False,
+                cancel_event=job.cancel_event,
+                **options,
+            )
+        if job.cancelled:
+            job.progress.finish("Cancelled")
+
+        with clips_lock:
+            return JobResult(
+                job, clips, time.monotonic() - started, job.cancelled, completed
+            )
+
+    def shutdown(self, wait=True, cancel_jobs=False):
+        """Stop accepting jobs; with cancel_jobs, running jobs are cancelled too"""
+        if cancel_jobs:
+            with self.jobs_lock:
+                jobs = list(self.jobs)
+            for job in jobs:
+                job.cancel()
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown(wait=True)
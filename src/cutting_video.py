@@ -5,17 +5,44 @@ import logging
 import os
 import signal
 import subprocess
-from concurrent.futures import ThreadPoolExecutor
-from datetime import timedelta
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
 
 import psutil
+from clip_archive import ClipArchive
+from clip_cache import clip_cache_key
+from clip_layout import DEFAULT_LAYOUT, ClipIndexWriter, ClipLayout
+from clip_planner import DEFAULT_MIN_LAST_CLIP, ClipPlan, format_us, parse_us
+from cpu_allocator import DEFAULT_IONICE, DEFAULT_NICE, CpuAllocator
+from encoder_lanes import CONSISTENT_OUTPUT_ARGS
+from ffmpeg_binaries import ffmpeg_executable, ffprobe_executable
+from fingerprint import fingerprint_file
+from packaged_output import (DEFAULT_SEGMENT_DURATION, clip_output_size,
+                             is_packaged, output_format_args,
+                             validate_output_format, write_sequence_playlist)
+from read_ahead import ByteMap, ReadAhead
+from retry_policy import (AdaptiveLimiter, EncoderCircuitBreaker, RetryPolicy,
+                          is_session_limit_error)
+from trace_recorder import trace_span
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
+# Only the last lines of ffmpeg's stderr are kept for error reporting
+STDERR_TAIL_LINES = 50
+
+# Futures kept in flight per worker, bounds memory on very long plans
+PENDING_PER_WORKER = 2
+
+# ffmpeg thread count when no CpuAllocator divides the cores
+DEFAULT_FFMPEG_THREADS = 4
+
+# Policy for callers that do not ask for retries: one attempt, no fallback
+NO_RETRY = RetryPolicy(max_attempts=1)
+
 
 def cleanup_resources():
     """Comprehensive cleanup of system resources"""
@@ -78,25 +105,92 @@ def cleanup_resources():
         logger.error(f"Error during cleanup: {e}")
 
 
-# Register cleanup function to run on program exit
-atexit.register(cleanup_resources)
+def install_exit_cleanup():
+    """Run cleanup_resources on exit, SIGINT and SIGTERM
 
-# Register cleanup for system signals
-signal.signal(signal.SIGINT, lambda x, y: (cleanup_resources(), exit(0)))
-signal.signal(signal.SIGTERM, lambda x, y: (cleanup_resources(), exit(0)))
+    cleanup_resources kills every ffmpeg on the machine, so only standalone
+    applications such as the GUI should call this; importing this module
+    installs no handlers.
+    """
+    atexit.register(cleanup_resources)
+    signal.signal(signal.SIGINT, lambda x, y: (cleanup_resources(), sys.exit(0)))
+    signal.signal(signal.SIGTERM, lambda x, y: (cleanup_resources(), sys.exit(0)))
 
 
-def get_video_info(input_path):
-    """Get video duration and audio info using ffprobe"""
-    # Create startupinfo object to hide console window
-    startupinfo = None
-    if os.name == "nt":  # Windows
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        startupinfo.wShowWindow = subprocess.SW_HIDE
+def hidden_window_kwargs():
+    """Popen keyword arguments that hide the console window on Windows"""
+    if os.name != "nt":
+        return {}
+
+    startupinfo = subprocess.STARTUPINFO()
+    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    startupinfo.wShowWindow = subprocess.SW_HIDE
+    return {"startupinfo": startupinfo, "creationflags": subprocess.CREATE_NO_WINDOW}
+
+
+def run_ffmpeg(
+    cmd,
+    stdin=subprocess.DEVNULL,
+    poll=None,
+    poll_interval=0.5,
+    on_start=None,
+    preexec_fn=None,
+):
+    """Run an ffmpeg command keeping only the tail of its stderr
+
+    Raises CalledProcessError with the captured tail on a non-zero exit, like
+    subprocess.run(check=True) but without buffering the whole stderr. If
+    poll is given it is called every poll_interval seconds while ffmpeg runs
+    and once more after it exits. on_start is called with the Popen object
+    right after the process is created, preexec_fn in the child before exec
+    (POSIX only).
+    """
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    process = subprocess.Popen(
+        cmd,
+        stdin=stdin,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        preexec_fn=preexec_fn,
+        **hidden_window_kwargs(),
+    )
+
+    def drain_stderr():
+        for line in process.stderr:
+            stderr_tail.append(line)
+
+    try:
+        if on_start is not None:
+            on_start(process)
+        if poll is None:
+            drain_stderr()
+        else:
+            reader = threading.Thread(target=drain_stderr, daemon=True)
+            reader.start()
+            while process.poll() is None:
+                poll()
+                time.sleep(poll_interval)
+            reader.join()
+            poll()
+        returncode = process.wait()
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        process.stderr.close()
+
+    if returncode != 0:
+        raise subprocess.CalledProcessError(
+            returncode, cmd, stderr=b"".join(stderr_tail)
+        )
+    return returncode
 
+
+def probe_video(input_path):
+    """Return the raw ffprobe streams/format data for input_path"""
     cmd = [
-        "ffprobe",
+        *ffprobe_executable(),
         "-v",
         "quiet",
         "-print_format",
@@ -112,95 +206,444 @@ def get_video_info(input_path):
             capture_output=True,
             text=True,
             check=True,
-            startupinfo=startupinfo,  # Use startupinfo to hide console
-            creationflags=(
-                subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0
-            ),  # Additional for Windows
+            **hidden_window_kwargs(),  # Hide console on Windows
         )
-        data = json.loads(result.stdout)
-        duration = float(data["format"]["duration"])
-
-        # Check if video has audio
-        has_audio = any(stream["codec_type"] == "audio" for stream in data["streams"])
-
-        return duration, has_audio
+        return json.loads(result.stdout)
     except subprocess.CalledProcessError as e:
         logger.error(f"Error getting video info: {e}")
         raise
 
 
-def process_clip(args):
-    """Process a single clip with audio"""
-    input_path, output_path, start_time, clip_duration, encoder = args
-    process = None
+def input_fingerprint(input_path, probe_data=None):
+    """Sampled content fingerprint of input_path including its probe metadata"""
+    if probe_data is None:
+        probe_data = probe_video(input_path)
+    return fingerprint_file(input_path, probe_data)
+
+
+def get_video_info(input_path):
+    """Get video duration and audio info using ffprobe"""
+    data = probe_video(input_path)
+    duration = float(data["format"]["duration"])
+
+    # Check if video has audio
+    has_audio = any(stream["codec_type"] == "audio" for stream in data["streams"])
+
+    return duration, has_audio
+
+
+def encoder_args(encoder, preset=None):
+    """Video/audio encoding options shared by every output path"""
+    args = [
+        "-c:v",
+        encoder,  # Use selected encoder
+        "-preset",
+        preset
+        or (
+            "p1" if encoder == "h264_nvenc" else "medium"
+        ),  # Adjust preset based on encoder
+        "-b:v",
+        "5M",  # Video bitrate
+        "-c:a",
+        "aac",  # Audio codec
+        "-b:a",
+        "192k",  # Audio bitrate
+    ]
+
+    # Add encoder-specific options
+    if encoder == "h264_nvenc":
+        args.extend(["-tune", "hq"])
+    elif encoder == "h264_amf":
+        args.extend(["-quality", "quality"])
+    elif encoder == "h264_qsv":
+        args.extend(["-global_quality", "23"])
+    return args
 
-    try:
-        # Create startupinfo object to hide console window
-        startupinfo = None
-        if os.name == "nt":  # Windows
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = subprocess.SW_HIDE
 
-        cmd = [
-            "ffmpeg",
+def lane_encoder_args(encoder, lane=None):
+    """encoder_args, or the options of an EncoderLane"""
+    if lane is None:
+        return encoder_args(encoder)
+    return [*encoder_args(lane.encoder, lane.preset), *CONSISTENT_OUTPUT_ARGS]
+
+
+def task_options(task):
+    """Extra options dict carried by a clip task tuple, if any"""
+    return task[5] if len(task) > 5 else {}
+
+
+def encode_clip(args, encoder, lane=None):
+    """Encode one clip task with encoder, raising CalledProcessError on failure
+
+    lane is the EncoderLane the clip was given to, if any. Hardware lanes
+    do not take cores from the CpuAllocator.
+    """
+    input_path, output_path, start_time, clip_duration = args[:4]
+    options = task_options(args)
+    output_format = options.get("output_format", "mp4")
+    cpu_allocator = options.get("cpu_allocator")
+    if lane is not None and lane.hardware:
+        cpu_allocator = None
+    trace = options.get("trace")
+    engine = options.get("engine")
+
+    def build_command(threads):
+        return [
+            *ffmpeg_executable(),
+            "-filter_threads",
+            str(threads),
+            "-threads",
+            str(threads),  # Decoder threads
             "-ss",
             start_time,
             "-t",
             str(clip_duration),
             "-i",
             input_path,
-            "-c:v",
-            encoder,  # Use selected encoder
-            "-preset",
-            (
-                "p1" if encoder == "h264_nvenc" else "medium"
-            ),  # Adjust preset based on encoder
-            "-b:v",
-            "5M",  # Video bitrate
-            "-c:a",
-            "aac",  # Audio codec
-            "-b:a",
-            "192k",  # Audio bitrate
+            *lane_encoder_args(encoder, lane),
             "-y",  # Overwrite output files
             "-threads",
-            "4",  # Use 4 threads for processing
+            str(threads),  # Encoder threads, matched to the allocated cores
             "-loglevel",
             "error",  # Minimize ffmpeg output
+            *output_format_args(
+                output_path,
+                output_format,
+                options.get("segment_duration", DEFAULT_SEGMENT_DURATION),
+            ),
             output_path,
         ]
 
-        # Add encoder-specific options
-        if encoder == "h264_nvenc":
-            cmd.extend(["-tune", "hq"])
-        elif encoder == "h264_amf":
-            cmd.extend(["-quality", "quality"])
-        elif encoder == "h264_qsv":
-            cmd.extend(["-global_quality", "23"])
+    def run_engine(threads):
+        with trace_span(
+            trace,
+            "encode",
+            "encode",
+            clip=os.path.basename(output_path),
+            encoder=encoder,
+            engine=engine.name,
+        ):
+            engine.cut_clip(
+                input_path,
+                output_path,
+                parse_us(start_time),
+                parse_us(clip_duration),
+                encoder,
+                threads,
+            )
 
-        process = subprocess.run(
-            cmd,
-            capture_output=True,
-            check=True,
-            startupinfo=startupinfo,
-            creationflags=subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0,
-        )
+    def run(threads, slot=None):
+        if engine is not None:
+            return run_engine(threads)
+        spawn_start = trace.now() if trace else 0
+        spawned = [spawn_start]
+        preexec_fn = None
+        if slot is not None:
+            preexec_fn = cpu_allocator.child_setup(slot)
 
-        if process.returncode == 0:
-            logger.info(f"Successfully created {os.path.basename(output_path)}")
-            return True
-    except subprocess.CalledProcessError as e:
-        logger.error(
-            f"Error creating {os.path.basename(output_path)}: {e.stderr.decode()}"
-        )
-        return False
+        def on_start(process):
+            if slot is not None:
+                cpu_allocator.after_spawn(process, slot)
+            if trace:
+                spawned[0] = trace.now()
+                trace.complete("spawn", spawn_start, spawned[0], "spawn")
+
+        try:
+            run_ffmpeg(
+                build_command(threads), on_start=on_start, preexec_fn=preexec_fn
+            )
+        finally:
+            if trace:
+                trace.complete(
+                    "encode",
+                    spawned[0],
+                    category="encode",
+                    clip=os.path.basename(output_path),
+                    encoder=encoder,
+                    threads=threads,
+                )
+
+    if cpu_allocator is None:
+        run(DEFAULT_FFMPEG_THREADS)
+        return
+
+    with cpu_allocator.slot() as slot:
+        run(slot.threads, slot)
+
+
+def clip_key(args, encoder, lane=None):
+    """Clip cache key for a task encoded with encoder (on lane)"""
+    start_time, clip_duration = args[2], args[3]
+    options = task_options(args)
+    params = [start_time, str(clip_duration), *lane_encoder_args(encoder, lane)]
+    if options.get("engine") is not None:
+        params.extend(options["engine"].cache_params())
+    return clip_cache_key(options["input_fingerprint"], params)
+
+
+def process_clip(args):
+    """Process a single clip with audio
+
+    args is (input_path, output_path, start_time, clip_duration, encoder),
+    optionally followed by a dict of extra options (output_format,
+    cpu_allocator, retry_policy, clip_cache, ...). With a retry_policy, failed
+    clips are retried with backoff and eventually with the fallback encoder.
+    With a clip_cache, identical earlier encodes are reused.
+    """
+    return process_clip_result(args)[0]
+
+
+def process_clip_result(args):
+    """Like process_clip, but return (success, error message or None,
+    encoded_with), encoded_with being the clip's (encoder, preset) if known
+    """
+    lanes = task_options(args).get("lanes")
+    try:
+        return encode_with_retries(args)
     finally:
-        # Ensure process is properly terminated
-        if process:
+        if lanes is not None:
+            lanes.clip_done()
+
+
+def encode_with_retries(args):
+    """Encode one clip (or reuse a cached one), retrying failed attempts"""
+    output_path, encoder = args[1], args[4]
+    options = task_options(args)
+    retry_policy = options.get("retry_policy") or NO_RETRY
+    circuit_breaker = options.get("circuit_breaker")
+    limiter = options.get("concurrency_limiter")
+    clip_cache = options.get("clip_cache")
+    lanes = options.get("lanes")
+    trace = options.get("trace")
+    clip_name = os.path.basename(output_path)
+    # Sharded layouts write into sub-directories created on first use
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    engine = options.get("engine")
+
+    def encoded_with(attempt_encoder, lane):
+        # An in-process engine may copy the source stream as it is
+        if engine is not None:
+            return None
+        if lane is not None:
+            return lane.encoder, lane.preset
+        return attempt_encoder, None
+
+    if clip_cache is not None:
+        # A clip from any lane will do: lanes write alike clips
+        choices = [(encoder, None)]
+        if lanes is not None:
+            choices = [(lane.encoder, lane) for lane in lanes.lanes]
+        with trace_span(trace, "cache lookup", "finalize", clip=clip_name):
+            hit = next(
+                (
+                    choice
+                    for choice in choices
+                    if clip_cache.fetch(clip_key(args, *choice), output_path)
+                ),
+                None,
+            )
+        if hit is not None:
+            logger.info(f"Reused cached {clip_name}")
+            return True, None, encoded_with(*hit)
+    # The old file may be a link into a clip cache (from an earlier job with
+    # a cache); ffmpeg -y would rewrite it in place, so never write through it
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    error = None
+    clip_seconds = parse_us(args[3]) / 1_000_000
+    for attempt in range(1, retry_policy.max_attempts + 1):
+        attempt_encoder = retry_policy.encoder_for(encoder, attempt, circuit_breaker)
+        with encode_slot(options, clip_seconds, attempt) as (lane, limiter_token):
+            if lane is not None:
+                attempt_encoder = lane.encoder
+            elif lanes is not None:
+                attempt_encoder = retry_policy.fallback_encoder  # No lane allowed
+            started = time.monotonic()
             try:
-                process.terminate()
-            except:
-                pass
+                encode_clip(args, attempt_encoder, lane)
+            except subprocess.CalledProcessError as e:
+                stderr = e.stderr.decode(errors="replace")
+                error = stderr.strip() or str(e)
+                logger.error(
+                    f"Error creating {clip_name} with {attempt_encoder} "
+                    f"(attempt {attempt}/{retry_policy.max_attempts}): {stderr}"
+                )
+                if is_session_limit_error(stderr):
+                    if lane is not None:
+                        lanes.shrink(lane)
+                    elif limiter:
+                        limiter.shrink(limiter_token)
+                elif circuit_breaker:
+                    circuit_breaker.record_failure(attempt_encoder)
+            else:
+                if lane is not None:
+                    lanes.record_success(
+                        lane, clip_seconds, time.monotonic() - started
+                    )
+                if circuit_breaker:
+                    circuit_breaker.record_success(attempt_encoder)
+                if clip_cache is not None:
+                    key = clip_key(args, attempt_encoder, lane)
+                    with trace_span(trace, "cache store", "finalize", clip=clip_name):
+                        clip_cache.store(key, output_path)
+                if lane is not None:
+                    logger.info(f"Successfully created {clip_name} on {lane.name}")
+                elif attempt_encoder != encoder:
+                    logger.info(
+                        f"Successfully created {clip_name} "
+                        f"with fallback encoder {attempt_encoder}"
+                    )
+                else:
+                    logger.info(f"Successfully created {clip_name}")
+                return True, None, encoded_with(attempt_encoder, lane)
+
+        if attempt < retry_policy.max_attempts:
+            with trace_span(trace, "retry backoff", "encode", attempt=attempt):
+                time.sleep(retry_policy.delay(attempt))
+    return False, error, None
+
+
+@contextmanager
+def encode_slot(options, clip_seconds, attempt):
+    """Reserve an encoder lane or a concurrency slot for one attempt
+
+    Yields (lane, limiter token); either is None when not in use. Lanes
+    whose encoder keeps failing are skipped, and after fallback_after
+    attempts only software lanes are used. A clip_slots semaphore shared
+    with other jobs is taken after the job's own slot; both are held for
+    the attempt only, never during the retry backoff.
+    """
+    clip_slots = options.get("clip_slots")
+    with job_slot(options, clip_seconds, attempt) as slot:
+        with clip_slots if clip_slots is not None else nullcontext():
+            yield slot
+
+
+@contextmanager
+def job_slot(options, clip_seconds, attempt):
+    """Reserve the job's encoder lane or concurrency slot for one attempt"""
+    lanes = options.get("lanes")
+    if lanes is None:
+        limiter = options.get("concurrency_limiter")
+        with limiter.slot() if limiter else nullcontext() as limiter_token:
+            yield None, limiter_token
+        return
+
+    retry_policy = options.get("retry_policy") or NO_RETRY
+    circuit_breaker = options.get("circuit_breaker")
+
+    def allowed(lane):
+        if circuit_breaker is not None and not circuit_breaker.allow(lane.encoder):
+            return False
+        return attempt <= retry_policy.fallback_after or not lane.hardware
+
+    with lanes.lane(clip_seconds, allowed) as lane:
+        yield lane, None
+
+
+def clip_task(input_path, output_folder, window, encoder, options=None):
+    """Build the process_clip task tuple for one planned ClipWindow"""
+    options = options or {}
+    layout = options.get("layout") or DEFAULT_LAYOUT
+    output_path = layout.clip_path(
+        output_folder, window, options.get("output_format", "mp4")
+    )
+    # Include encoder in clip task parameters
+    task = (
+        input_path,
+        output_path,
+        format_us(window.start_us),
+        format_us(window.duration_us),
+        encoder,
+    )
+    return task + (options,) if options else task
+
+
+def run_clip_task(task, progress_tracker=None, on_finished=None):
+    """Run process_clip for task, tracking progress
+
+    on_finished, if given, is called with (success, error, bytes_written,
+    encoded_with) once the clip is done and returns whether the clip
+    succeeded, which is False if finishing it failed (e.g. it could not be
+    archived).
+    """
+    if not progress_tracker and not on_finished:
+        return process_clip(task)
+
+    if progress_tracker:
+        progress_tracker.clip_started()
+    success, error, bytes_written, encoded_with = False, None, 0, None
+    try:
+        success, error, encoded_with = process_clip_result(task)
+        if success:
+            options = task_options(task)
+            output_format = options.get("output_format", "mp4")
+            with trace_span(options.get("trace"), "finalize", "finalize"):
+                try:
+                    bytes_written = clip_output_size(task[1], output_format)
+                except OSError:
+                    pass
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        if on_finished:
+            success = on_finished(success, error, bytes_written, encoded_with)
+        if progress_tracker:
+            progress_tracker.clip_finished(success, bytes_written)
+    return success
+
+
+def plan_clips(
+    input_path, clip_duration=3, skip_duration=10, min_last_clip=DEFAULT_MIN_LAST_CLIP
+):
+    """Dry run: return the frame-exact clip plan without encoding anything
+
+    The result is ClipPlan.to_dict(), with every clip's start and duration in
+    integer microseconds and frames, for previews and validation.
+    """
+    probe_data = probe_video(input_path)
+    plan = ClipPlan.from_probe(probe_data, clip_duration, skip_duration, min_last_clip)
+    return plan.to_dict()
+
+
+def bounded_map(executor, fn, iterable, max_pending):
+    """Like executor.map, but keeps at most max_pending futures alive
+
+    Tasks are pulled from iterable only as earlier ones finish and results
+    are yielded in completion order, so memory stays flat for any plan size.
+    """
+    pending = set()
+    try:
+        for item in iterable:
+            pending.add(executor.submit(fn, item))
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        # Drop queued work if the consumer stops early (e.g. cancellation)
+        for future in pending:
+            future.cancel()
+
+
+def submitted_windows(windows, trace=None, index_writer=None, read_ahead=None):
+    """Yield windows, noting each as submitted to the trace, index and read-ahead"""
+    for window in windows:
+        if trace is not None:
+            trace.async_begin("queued", window.index, index=window.index)
+        if index_writer is not None:
+            index_writer.submitted(window.index)
+        if read_ahead is not None:
+            read_ahead.submitted(window)
+        yield window
 
 
 # Update cut_video function in cutting_video.py
@@ -212,53 +655,372 @@ def cut_video(
     skip_duration=10,
     encoder="h264_nvenc",
     progress_callback=None,
+    progress_tracker=None,
+    min_last_clip=DEFAULT_MIN_LAST_CLIP,
+    clip_slots=None,
+    cleanup=False,
+    output_format="mp4",
+    segment_duration=DEFAULT_SEGMENT_DURATION,
+    single_playlist=False,
+    cpu_allocator=None,
+    nice=DEFAULT_NICE,
+    ionice=DEFAULT_IONICE,
+    retry_policy=None,
+    clip_cache=None,
+    fingerprint=None,
+    activity_filter=None,
+    silence_planner=None,
+    duplicate_filter=None,
+    proxy_cache=None,
+    clip_callback=None,
+    cancel_event=None,
+    trace=None,
+    engine=None,
+    lanes=None,
+    layout=None,
+    clip_index=True,
+    archive=None,
+    archive_max_bytes=None,
+    read_ahead=0,
 ):
-    """Main function to cut video into clips"""
+    """Main function to cut video into clips
+
+    progress_tracker, if given, is a ProgressTracker that is updated as clips
+    start and finish so a UI can sample it instead of reacting to callbacks.
+    Clips are planned in whole source frames, and a last clip shorter than
+    min_last_clip seconds is skipped.
+
+    clip_slots is an optional semaphore shared by several concurrent jobs to
+    cap the total number of encoders. A slot is held only while a clip is
+    being encoded, not during retry backoff or cache lookups.
+
+    cleanup=True runs cleanup_resources() when the job ends, which kills
+    every ffmpeg on the machine, drops the page cache and resets the GPU;
+    only a standalone app that owns the machine (the GUI) should opt in.
+
+    Non-seekable inputs ("-" for stdin, named pipes, .m3u8 playlists) are cut
+    in a single forward pass by stream_input.cut_stream, which honours the
+    progress, clip_slots, clip_callback, cancel_event, layout (unsharded)
+    and clip_index options. Per-clip options (packaged output, archives,
+    retries, caching, pre-passes, trace, engine, lanes, cpu_allocator,
+    read_ahead) raise ValueError for them.
+
+    output_format "hls", "hls_fmp4" or "dash" packages every clip into its
+    own folder with segments of segment_duration seconds plus a playlist;
+    with single_playlist an HLS playlist for the whole sequence is added.
+
+    Available cores are divided between the max_workers concurrent encodes
+    and each ffmpeg is pinned to its share at the given nice/ionice level.
+    Pass a shared cpu_allocator when several jobs run at once.
+
+    Failed clips are retried according to retry_policy (RetryPolicy() by
+    default), falling back to libx264 for that clip. An encoder that keeps
+    failing is dropped for the rest of the job, and hitting an encoder
+    session limit lowers the number of concurrent clips.
+
+    With a ClipCache, clips already encoded from the same input with the same
+    parameters are linked into output_folder instead of being encoded again.
+    Inputs are identified by input_fingerprint(); callers that already
+    computed it for their own records can pass it as fingerprint.
+
+    With an ActivityFilter, a low-resolution pre-pass scores every planned
+    clip and static or black clips are dropped before any encoder starts;
+    the scores are written to activity.json in output_folder.
+
+    With a DuplicateFilter, clips whose sampled frames match an earlier clip
+    are dropped (or only reported) and the mapping is written to
+    duplicates.json.
+
+    With a ProxyCache, probe data comes from the cache and the activity and
+    duplicate pre-passes read the input's proxy once it has been generated.
+
+    With a SilencePlanner, the audio track is analysed once; silent clips
+    are dropped and clip boundaries are moved into nearby pauses.
+
+    clip_callback, if given, is called from worker threads with (window,
+    output_path, success, error, bytes_written) as every clip finishes.
+    Setting cancel_event (a threading.Event) stops the job: clips that have
+    not started are skipped and cut_video returns False.
+
+    With a TraceRecorder as trace, the job's probe, plan, queue, spawn,
+    encode and finalize steps are recorded on one track per worker; the
+    caller closes the recorder to write the file.
+
+    engine replaces the ffmpeg process per clip with an in-process engine
+    such as pyav_engine.PyAVEngine (MP4 output only, no lanes); the job's
+    inputs are released from it when the job ends.
+
+    With a LaneScheduler as lanes, clips are spread over several encoders
+    at once (e.g. NVENC and libx264), each clip going to the lane expected
+    to finish it soonest. encoder and max_workers are then taken from the
+    lanes.
+
+    layout, a ClipLayout, names the clips and optionally shards them into
+    sub-directories; clip numbers are zero-padded to the size of the plan.
+    Unless clip_index is False, clip_index.tsv in output_folder lists every
+    written clip with its path, source range and size.
+
+    archive "tar" or "zip" packs the MP4 clips into clips.tar/clips.zip in
+    output_folder as they finish instead of leaving loose files; with
+    archive_max_bytes a new archive (clips-0001.tar, ...) is started when
+    one would grow past that size. The clip index then also records each
+    clip's archive and data offset, and clip_callback gets the clip's path
+    inside the archive (output_folder/clips.tar/clip_001.mp4).
+
+    read_ahead > 0 loads the input bytes of that many upcoming clips into
+    the page cache ahead of their encodes (see read_ahead.ReadAhead), which
+    turns concurrent seeks into sequential reads on hard disks and network
+    mounts.
+    """
+    validate_output_format(output_format)
+    from stream_input import cut_stream, is_streaming_input
+
+    if is_streaming_input(input_path):
+        # One ffmpeg process cuts the whole stream, so per-clip machinery
+        # (retries, caching, pre-passes, engines, lanes) has nothing to act on
+        unsupported = [
+            name
+            for name, value in (
+                ("output_format", output_format != "mp4"),
+                ("single_playlist", single_playlist),
+                ("cpu_allocator", cpu_allocator),
+                ("retry_policy", retry_policy),
+                ("clip_cache", clip_cache),
+                ("activity_filter", activity_filter),
+                ("silence_planner", silence_planner),
+                ("duplicate_filter", duplicate_filter),
+                ("proxy_cache", proxy_cache),
+                ("trace", trace),
+                ("engine", engine),
+                ("lanes", lanes),
+                ("archive", archive),
+                ("read_ahead", read_ahead),
+            )
+            if value
+        ]
+        if unsupported:
+            raise ValueError(
+                f"Not supported for streaming inputs: {', '.join(unsupported)}"
+            )
+        return cut_stream(
+            input_path,
+            output_folder,
+            clip_duration=clip_duration,
+            skip_duration=skip_duration,
+            encoder=encoder,
+            min_last_clip=min_last_clip,
+            progress_callback=progress_callback,
+            progress_tracker=progress_tracker,
+            clip_slots=clip_slots,
+            clip_callback=clip_callback,
+            cancel_event=cancel_event,
+            layout=layout,
+            clip_index=clip_index,
+        )
+
+    if engine is not None and is_packaged(output_format):
+        raise ValueError(f"The {engine.name} engine only writes MP4 clips")
+    if engine is not None and lanes is not None:
+        raise ValueError(f"The {engine.name} engine cannot run on encoder lanes")
+    if archive is not None and is_packaged(output_format):
+        raise ValueError("Only MP4 clips can be written into archives")
+
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
-    duration, has_audio = get_video_info(input_path)
-    current_time = 0
-    clip_tasks = []
+    analysis_path = input_path
+    with trace_span(trace, "probe", "probe", input=input_path):
+        if proxy_cache is not None:
+            probe_data = proxy_cache.probe(input_path)
+            analysis_path = proxy_cache.proxy_path(input_path) or input_path
+        else:
+            probe_data = probe_video(input_path)
+    plan_start = trace.now() if trace else 0
+    plan = ClipPlan.from_probe(probe_data, clip_duration, skip_duration, min_last_clip)
+    layout = (layout or ClipLayout()).for_plan(len(plan))
+    cpu_slots = max_workers
+    if lanes is not None:
+        max_workers = lanes.slots
+        cpu_slots = max(1, lanes.cpu_slots)
+    if cpu_allocator is None:
+        cpu_allocator = CpuAllocator(cpu_slots, nice=nice, ionice=ionice)
+    options = {
+        "cpu_allocator": cpu_allocator,
+        "retry_policy": retry_policy or RetryPolicy(),
+        "circuit_breaker": EncoderCircuitBreaker(),
+        "layout": layout,
+    }
+    if clip_slots is not None:
+        options["clip_slots"] = clip_slots
+    if lanes is not None:
+        options["lanes"] = lanes
+    else:
+        options["concurrency_limiter"] = AdaptiveLimiter(max_workers)
+    if is_packaged(output_format):
+        options.update(
+            {"output_format": output_format, "segment_duration": segment_duration}
+        )
+    elif clip_cache is not None:
+        # Only single-file MP4 clips are cached
+        if fingerprint is None:
+            fingerprint = input_fingerprint(input_path, probe_data)
+        options["clip_cache"] = clip_cache
+        options["input_fingerprint"] = fingerprint
+    if trace is not None:
+        options["trace"] = trace
+    if engine is not None:
+        options["engine"] = engine
+
+    windows = plan
+    total_clips = len(plan)
+    selected = None
+    if activity_filter is not None:
+        if progress_tracker:
+            progress_tracker.set_message("Scoring clip activity")
+        with trace_span(trace, "activity filter", "plan"):
+            selected = activity_filter.active_windows(
+                analysis_path, plan, output_folder
+            )
+    if duplicate_filter is not None:
+        if progress_tracker:
+            progress_tracker.set_message("Looking for duplicate clips")
+        with trace_span(trace, "duplicate filter", "plan"):
+            unique = duplicate_filter.unique_windows(
+                analysis_path, plan, output_folder
+            )
+        selected = unique if selected is None else selected & unique
+    if selected is not None:
+        windows = (window for window in plan if window.index in selected)
+        total_clips = len(selected)
+    if silence_planner is not None:
+        if progress_tracker:
+            progress_tracker.set_message("Analysing audio")
+        with trace_span(trace, "silence planning", "plan"):
+            windows = silence_planner.plan_windows(input_path, windows)
+        total_clips = len(windows)
+    if trace is not None:
+        trace.complete("plan", plan_start, category="plan", clips=total_clips)
+    clip_archive = None
+    clips_folder = output_folder
+    if archive is not None:
+        clip_archive = ClipArchive(output_folder, archive, archive_max_bytes)
+        clips_folder = clip_archive.scratch_folder
+    index_writer = None
+    if clip_index:
+        index_writer = ClipIndexWriter(output_folder, archived=archive is not None)
+    prefetcher = None
+    if read_ahead:
+        byte_map = ByteMap.from_probe(input_path, probe_data)
+        prefetcher = ReadAhead(input_path, byte_map, read_ahead)
+    if trace is not None or index_writer is not None or prefetcher is not None:
+        windows = submitted_windows(windows, trace, index_writer, prefetcher)
 
-    while current_time < duration:
-        remaining_time = duration - current_time
-        current_clip_duration = min(clip_duration, remaining_time)
+    if progress_tracker:
+        progress_tracker.set_total(total_clips)
+    if lanes is not None:
+        lanes.expect(total_clips)
 
-        start_time = str(timedelta(seconds=current_time))
-        if "." not in start_time:
-            start_time += ".000"
+    succeeded = set()  # Clip numbers written by this job
 
-        output_path = os.path.join(output_folder, f"clip_{len(clip_tasks)+1:03d}.mp4")
-        # Include encoder in clip task parameters
-        clip_tasks.append(
-            (input_path, output_path, start_time, current_clip_duration, encoder)
-        )
+    def run_clip(window):
+        if trace is not None:
+            trace.async_end("queued", window.index)
+        if prefetcher is not None:
+            prefetcher.started(window)
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        task = clip_task(input_path, clips_folder, window, encoder, options)
+        on_finished = None
+        if clip_callback or index_writer is not None or clip_archive is not None:
 
-        current_time += current_clip_duration + skip_duration
+            def on_finished(success, error, bytes_written, encoded_with):
+                output_path, archived = task[1], None
+                if success and clip_archive is not None:
+                    try:
+                        archived = clip_archive.add(output_path)
+                    except OSError as e:
+                        # The clip stays in the scratch folder for recovery
+                        logger.error(f"Could not archive {output_path}: {e}")
+                        success, error = False, str(e)
+                    else:
+                        output_path = os.path.join(output_folder, *archived[:2])
+                if index_writer is not None:
+                    index_writer.finished(
+                        window,
+                        output_path,
+                        success,
+                        bytes_written,
+                        archived,
+                        encoded_with,
+                    )
+                if clip_callback:
+                    clip_callback(window, output_path, success, error, bytes_written)
+                return success
 
-    total_clips = len(clip_tasks)
+        with trace_span(trace, f"clip {window.index}", "clip", index=window.index):
+            success = run_clip_task(task, progress_tracker, on_finished)
+        if success:
+            succeeded.add(window.index)
+        return success
 
     try:
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        with ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="clip-worker"
+        ) as executor:
             successful_clips = 0
-            for index, result in enumerate(
-                executor.map(process_clip, clip_tasks), start=1
-            ):
-                if result:
-                    successful_clips += 1
-                if progress_callback:
-                    progress_callback(
-                        index, total_clips, f"Processing clip {index}/{total_clips}"
+            results = bounded_map(
+                executor, run_clip, windows, max_workers * PENDING_PER_WORKER
+            )
+            try:
+                for index, result in enumerate(results, start=1):
+                    if cancel_event is not None and cancel_event.is_set():
+                        logger.info("Job cancelled")
+                        return False
+                    if result:
+                        successful_clips += 1
+                    if progress_callback:
+                        progress_callback(
+                            index, total_clips, f"Processing clip {index}/{total_clips}"
+                        )
+            finally:
+                results.close()
+
+            if single_playlist and output_format.startswith("hls"):
+                with trace_span(trace, "sequence playlist", "finalize"):
+                    # Playlists left by an earlier run in the folder are not
+                    # this job's clips
+                    write_sequence_playlist(
+                        output_folder,
+                        [
+                            layout.clip_path(output_folder, window, output_format)
+                            for window in plan
+                            if window.index in succeeded
+                        ],
+                    )
+
+            if lanes is not None:
+                for lane in lanes.summary():
+                    logger.info(
+                        f"Lane {lane['name']}: {lane['completed']} clips, "
+                        f"{lane['cost']:.2f}s per clip second"
                     )
 
+            completed_message = f"Completed processing {successful_clips} clips"
+            if progress_tracker:
+                progress_tracker.finish(completed_message)
             if progress_callback:
-                progress_callback(
-                    total_clips,
-                    total_clips,
-                    f"Completed processing {successful_clips} clips",
-                )
+                progress_callback(total_clips, total_clips, completed_message)
 
         return successful_clips == total_clips
     finally:
-        cleanup_resources()
+        if prefetcher is not None:
+            prefetcher.close()
+        if clip_archive is not None:
+            clip_archive.close()
+        if index_writer is not None:
+            index_writer.close()
+        if engine is not None:
+            engine.release(input_path)
+        if cleanup:
+            with trace_span(trace, "cleanup", "finalize"):
+                cleanup_resources()
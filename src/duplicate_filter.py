@@ -0,0 +1,186 @@
+# duplicate_filter.py
+"""Drop planned clips that repeat an earlier clip
+
+Loops, intros and repeated segments give many near-identical clips. A
+pre-pass computes a 64-bit difference hash (dHash) of a few frames per
+planned window, from 9x8 grayscale frames produced by frame_sampler.py.
+Each window's signature is looked up in a band index: the hash is split
+into max_distance + 1 bands, so any hash within max_distance bits of an
+earlier one matches it exactly in at least one band. A window whose
+hashes are all within max_distance of an earlier kept window is a
+duplicate. The mapping is written to duplicates.json.
+"""
+import json
+import logging
+import os
+
+import numpy as np
+from frame_sampler import iter_frame_batches
+
+logger = logging.getLogger(__name__)
+
+DUPLICATES_FILE_NAME = "duplicates.json"
+HASH_BITS = 64
+# dHash compares each pixel with its right neighbour: 9x8 pixels -> 64 bits
+HASH_WIDTH = 9
+HASH_HEIGHT = 8
+DEFAULT_MAX_DISTANCE = 6
+DEFAULT_HASHES_PER_WINDOW = 3
+DEFAULT_SAMPLE_FPS = 2
+
+
+def dhash_batch(frames):
+    """64-bit dHash of every (8, 9) grayscale frame in frames, as Python ints"""
+    bits = frames[:, :, 1:] > frames[:, :, :-1]
+    packed = np.packbits(bits.reshape(len(frames), HASH_BITS), axis=1)
+    return [int(value) for value in packed.view(">u8").ravel()]
+
+
+def hamming(first, second):
+    return bin(first ^ second).count("1")
+
+
+def pick_evenly(items, count):
+    if len(items) <= count:
+        return list(items)
+    step = len(items) / count
+    return [items[int(step * (number + 0.5))] for number in range(count)]
+
+
+class BandIndex:
+    """Finds earlier hashes within max_distance bits of a query"""
+
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        band_count = max_distance + 1
+        width, extra = divmod(HASH_BITS, band_count)
+        self.bands = []
+        shift = 0
+        for band in range(band_count):
+            bits = width + (1 if band < extra else 0)
+            self.bands.append((shift, (1 << bits) - 1))
+            shift += bits
+        self.buckets = [{} for _ in self.bands]
+
+    def keys(self, value):
+        return [(value >> shift) & mask for shift, mask in self.bands]
+
+    def add(self, value, item):
+        for bucket, key in zip(self.buckets, self.keys(value)):
+            bucket.setdefault(key, []).append((value, item))
+
+    def candidates(self, value):
+        """Yield (distance, item) for stored hashes within max_distance"""
+        seen = set()
+        for bucket, key in zip(self.buckets, self.keys(value)):
+            for stored, item in bucket.get(key, ()):
+                if id(item) in seen:
+                    continue
+                seen.add(id(item))
+                distance = hamming(value, stored)
+                if distance <= self.max_distance:
+                    yield distance, item
+
+
+class DuplicateFilter:
+    """Marks planned clips whose frames match an earlier clip"""
+
+    def __init__(
+        self,
+        max_distance=DEFAULT_MAX_DISTANCE,
+        hashes_per_window=DEFAULT_HASHES_PER_WINDOW,
+        fps=DEFAULT_SAMPLE_FPS,
+        drop=True,
+    ):
+        self.max_distance = max_distance
+        self.hashes_per_window = hashes_per_window
+        self.fps = fps
+        # With drop=False duplicates are only reported, not skipped
+        self.drop = drop
+
+    def window_hashes(self, input_path, plan):
+        """Yield (window, hashes) for every window in plan, in order"""
+        windows = iter(plan)
+        window = next(windows, None)
+        hashes = []
+
+        batches = iter_frame_batches(
+            input_path, self.fps, HASH_WIDTH, HASH_HEIGHT, scale_flags="area"
+        )
+        for times, frames in batches:
+            times_us = (times * 1_000_000).astype(np.int64)
+            frame_hashes = dhash_batch(frames)
+            for time_us, frame_hash in zip(times_us, frame_hashes):
+                while window is not None and time_us >= window.end_us:
+                    yield window, pick_evenly(hashes, self.hashes_per_window)
+                    window, hashes = next(windows, None), []
+                if window is None:
+                    batches.close()
+                    return
+                if time_us >= window.start_us:
+                    hashes.append(frame_hash)
+
+        while window is not None:
+            yield window, pick_evenly(hashes, self.hashes_per_window)
+            window, hashes = next(windows, None), []
+
+    def is_match(self, hashes, other_hashes):
+        if len(hashes) != len(other_hashes):
+            return False
+        return all(
+            hamming(first, second) <= self.max_distance
+            for first, second in zip(hashes, other_hashes)
+        )
+
+    def find_duplicates(self, input_path, plan):
+        """Return {duplicate window index: (original index, distance)}"""
+        index = BandIndex(self.max_distance)
+        duplicates = {}
+        for window, hashes in self.window_hashes(input_path, plan):
+            if not hashes:
+                continue
+            key_hash = hashes[len(hashes) // 2]
+            original = None
+            for distance, (other_index, other_hashes) in index.candidates(key_hash):
+                if self.is_match(hashes, other_hashes):
+                    if original is None or distance < original[1]:
+                        original = (other_index, distance)
+            if original is None:
+                index.add(key_hash, (window.index, hashes))
+            else:
+                duplicates[window.index] = original
+        return duplicates
+
+    def unique_windows(self, input_path, plan, output_folder=None):
+        """Return the set of window indexes to encode
+
+        With output_folder, the duplicate mapping is written to
+        duplicates.json there.
+        """
+        duplicates = self.find_duplicates(input_path, plan)
+        indexes = {window.index for window in plan}
+        logger.info(
+            f"Duplicate filter found {len(duplicates)} of {len(indexes)} clips "
+            f"repeating an earlier clip"
+        )
+        if output_folder is not None:
+            write_duplicate_report(output_folder, duplicates, self)
+        if not self.drop:
+            return indexes
+        return indexes - set(duplicates)
+
+
+def write_duplicate_report(output_folder, duplicates, duplicate_filter):
+    report = {
+        "max_distance": duplicate_filter.max_distance,
+        "hashes_per_window": duplicate_filter.hashes_per_window,
+        "dropped": duplicate_filter.drop,
+        "duplicates": [
+            {"index": index, "duplicate_of": original, "distance": distance}
+            for index, (original, distance) in sorted(duplicates.items())
+        ],
+    }
+    report_path = os.path.join(output_folder, DUPLICATES_FILE_NAME)
+    with open(report_path, "w", encoding="utf-8") as report_file:
+        json.dump(report, report_file, indent=1)
+    return report_path
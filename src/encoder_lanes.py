@@ -0,0 +1,203 @@
+# encoder_lanes.py
+"""Several encoders side by side, each clip sent to the one that finishes first
+
+An EncoderLane is one encoder (a hardware encoder, or libx264 at some
+preset) with its own number of concurrent encodes and a cost model: the
+estimated encode time per second of clip. The estimate starts from a
+guess and is updated from every clip the lane finishes. A LaneScheduler
+gives each clip to the lane expected to finish it soonest. While plenty of
+clips are still waiting, a free slower lane takes a clip as long as it
+finishes it before all lanes together would work through the backlog, so
+no encoder idles; near the end of a job clips wait for the fast lanes.
+
+    lanes = LaneScheduler([EncoderLane("h264_nvenc", 2), EncoderLane("libx264", 6)])
+    cut_video("talk.mp4", "clips", lanes=lanes)
+
+Every lane writes the same resolution, bitrate, pixel format, H.264
+profile and audio, so clips from different lanes are interchangeable.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+HARDWARE_SUFFIXES = ("_nvenc", "_amf", "_qsv", "_vaapi", "_videotoolbox")
+# Output options every lane adds to encoder_args() so lanes produce alike clips
+CONSISTENT_OUTPUT_ARGS = ["-pix_fmt", "yuv420p", "-profile:v", "high"]
+# Initial guess of encode seconds per clip second, refined as clips finish
+DEFAULT_HARDWARE_COST = 0.25
+DEFAULT_SOFTWARE_COST = 1.0
+# Weight of the newest clip in the moving average of a lane's cost
+DEFAULT_SMOOTHING = 0.3
+# Longest wait before re-evaluating lanes while the best one is busy
+MAX_WAIT = 1.0
+
+
+def is_hardware_encoder(encoder):
+    return encoder.endswith(HARDWARE_SUFFIXES)
+
+
+def parse_lane(spec):
+    """EncoderLane from "encoder[:slots[:preset]]", e.g. "libx264:4:veryfast" """
+    encoder, _, rest = spec.partition(":")
+    slots, _, preset = rest.partition(":")
+    if not encoder:
+        raise ValueError(f"Invalid encoder lane {spec!r}")
+    return EncoderLane(encoder, int(slots) if slots else 1, preset or None)
+
+
+class EncoderLane:
+    """One encoder with its own concurrency limit and speed estimate"""
+
+    def __init__(self, encoder, slots=1, preset=None, cost=None, name=None):
+        self.encoder = encoder
+        self.slots = max(1, slots)
+        self.preset = preset
+        if cost is None:
+            cost = DEFAULT_HARDWARE_COST if self.hardware else DEFAULT_SOFTWARE_COST
+        self.cost = cost
+        self.name = name or (f"{encoder}/{preset}" if preset else encoder)
+        self.running = {}  # Reservation token -> expected finish (monotonic)
+        self.completed = 0
+
+    @property
+    def hardware(self):
+        return is_hardware_encoder(self.encoder)
+
+    @property
+    def free(self):
+        return len(self.running) < self.slots
+
+    def estimated_finish(self, seconds, now):
+        """When a clip of seconds would be done if given to this lane now"""
+        start = now
+        if not self.free:
+            start = max(now, min(self.running.values()))
+        return start + self.cost * seconds
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "encoder": self.encoder,
+            "preset": self.preset,
+            "slots": self.slots,
+            "cost": round(self.cost, 4),
+            "completed": self.completed,
+        }
+
+    def __repr__(self):
+        return f"EncoderLane({self.name!r}, slots={self.slots}, cost={self.cost:.3f})"
+
+
+class LaneScheduler:
+    """Dispatches clips to the encoder lane that will finish them soonest"""
+
+    def __init__(self, lanes, smoothing=DEFAULT_SMOOTHING):
+        self.lanes = list(lanes)
+        if not self.lanes:
+            raise ValueError("LaneScheduler needs at least one lane")
+        self.smoothing = smoothing
+        self.backlog = 0  # Clips of the current job not finished yet
+        self.condition = threading.Condition()
+
+    @property
+    def slots(self):
+        """Concurrent encodes over all lanes"""
+        return sum(lane.slots for lane in self.lanes)
+
+    @property
+    def cpu_slots(self):
+        """Concurrent encodes of software lanes, which need their own cores"""
+        return sum(lane.slots for lane in self.lanes if not lane.hardware)
+
+    def expect(self, clips):
+        """Set the number of clips the job will ask lanes for"""
+        with self.condition:
+            self.backlog = clips
+
+    def clip_done(self):
+        """Take a finished clip off the backlog, whatever its attempts"""
+        with self.condition:
+            self.backlog = max(0, self.backlog - 1)
+
+    def drain_time(self, seconds, lanes):
+        """Seconds for lanes together to encode the backlog of such clips"""
+        throughput = sum(lane.slots / max(lane.cost, 1e-6) for lane in lanes)
+        return self.backlog * seconds / throughput
+
+    def best_lane(self, seconds, allowed, now):
+        candidates = [lane for lane in self.lanes if allowed(lane)]
+        if not candidates:
+            return None
+
+        def finish(lane):
+            return (lane.estimated_finish(seconds, now), lane.cost)
+
+        best = min(candidates, key=finish)
+        if not best.free:
+            drain = self.drain_time(seconds, candidates)
+            useful = [
+                lane
+                for lane in candidates
+                if lane.free and lane.cost * seconds <= drain
+            ]
+            if useful:
+                return min(useful, key=finish)
+        return best
+
+    @contextmanager
+    def lane(self, seconds, allowed=None):
+        """Reserve a slot on the best lane for a clip of seconds
+
+        allowed(lane) can rule lanes out (e.g. encoders that keep failing);
+        None is yielded when no lane is allowed. Speed estimates are only
+        updated through record_success().
+        """
+        allowed = allowed or (lambda lane: True)
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                lane = self.best_lane(seconds, allowed, now)
+                if lane is None or lane.free:
+                    break
+                # Releases notify; the timeout only re-checks the estimates
+                wait = min(lane.running.values()) - now
+                self.condition.wait(min(MAX_WAIT, wait) if wait > 0 else MAX_WAIT)
+            if lane is not None:
+                token = object()
+                lane.running[token] = now + lane.cost * seconds
+
+        if lane is None:
+            yield None
+            return
+        try:
+            yield lane
+        finally:
+            with self.condition:
+                del lane.running[token]
+                self.condition.notify_all()
+
+    def record_success(self, lane, seconds, elapsed):
+        """Fold the encode time of a finished clip into the lane's cost"""
+        if seconds <= 0:
+            return
+        with self.condition:
+            lane.cost += self.smoothing * (elapsed / seconds - lane.cost)
+            lane.completed += 1
+
+    def shrink(self, lane):
+        """Lower lane's limit after an encoder session limit was hit"""
+        with self.condition:
+            new_slots = max(1, len(lane.running) - 1)
+            if new_slots < lane.slots:
+                logger.warning(
+                    f"Encoder session limit reached on lane {lane.name}, reducing "
+                    f"its concurrent clips from {lane.slots} to {new_slots}"
+                )
+                lane.slots = new_slots
+
+    def summary(self):
+        with self.condition:
+            return [lane.to_dict() for lane in self.lanes]
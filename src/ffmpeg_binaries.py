@@ -0,0 +1,32 @@
+# ffmpeg_binaries.py
+"""Command prefixes used to run ffmpeg and ffprobe
+
+Both default to the executables on PATH. VIDEO_CUTTER_FFMPEG and
+VIDEO_CUTTER_FFPROBE override them, e.g. to use a bundled build or the
+stand-in in benchmarks/fake_ffmpeg.py; the value may include arguments
+("python benchmarks/fake_ffmpeg.py"). They are read on every call, so a
+process can switch binaries without re-importing anything.
+"""
+import os
+import shlex
+
+FFMPEG_ENV = "VIDEO_CUTTER_FFMPEG"
+FFPROBE_ENV = "VIDEO_CUTTER_FFPROBE"
+
+
+def command_prefix(env_name, default):
+    value = os.environ.get(env_name)
+    if not value:
+        return [default]
+    if os.name == "nt":
+        # Non-POSIX splitting keeps the quotes around quoted paths
+        return [part.strip('"') for part in shlex.split(value, posix=False)]
+    return shlex.split(value)
+
+
+def ffmpeg_executable():
+    return command_prefix(FFMPEG_ENV, "ffmpeg")
+
+
+def ffprobe_executable():
+    return command_prefix(FFPROBE_ENV, "ffprobe")
@@ -0,0 +1,126 @@
+# frame_sampler.py
+"""Low-resolution grayscale frames for analysis passes
+
+ffmpeg decodes the input once, drops frames down to a small sampling rate
+and scales them to a thumbnail, so analysis in NumPy costs almost nothing
+next to decoding. Used by the activity filter and the duplicate filter.
+"""
+import logging
+import subprocess
+import threading
+from collections import deque
+
+import numpy as np
+from ffmpeg_binaries import ffmpeg_executable
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_FPS = 2
+SAMPLE_WIDTH = 64
+SAMPLE_HEIGHT = 36
+# Frames read from the pipe per NumPy batch
+READ_BATCH = 64
+
+
+def sampler_command(input_path, fps, width, height, scale_flags="fast_bilinear"):
+    return [
+        *ffmpeg_executable(),
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-threads",
+        "0",
+        "-i",
+        input_path,
+        "-an",
+        "-sn",
+        "-dn",
+        "-vf",
+        f"fps={fps},scale={width}:{height}:flags={scale_flags}",
+        "-pix_fmt",
+        "gray",
+        "-f",
+        "rawvideo",
+        "-",
+    ]
+
+
+def iter_raw_records(cmd, record_size, batch, description):
+    """Run an ffmpeg writing raw data to stdout and yield it in whole records
+
+    Each yielded bytes object holds up to batch records of record_size bytes;
+    a trailing partial record is dropped. ffmpeg is killed if the consumer
+    stops early. stderr is drained by a thread, keeping only its tail, so a
+    chatty ffmpeg never blocks on a full pipe.
+    """
+    from cutting_video import STDERR_TAIL_LINES, hidden_window_kwargs
+
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        **hidden_window_kwargs(),
+    )
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+
+    def drain_stderr():
+        for line in process.stderr:
+            stderr_tail.append(line)
+
+    reader = threading.Thread(target=drain_stderr, daemon=True)
+    reader.start()
+    exhausted = False
+    try:
+        while True:
+            data = process.stdout.read(record_size * batch)
+            count = len(data) // record_size
+            if not count:
+                exhausted = True
+                break
+            yield data[: count * record_size]
+    finally:
+        process.stdout.close()
+        if not exhausted:
+            process.kill()  # Consumer stopped early
+        returncode = process.wait()
+        reader.join()
+        process.stderr.close()
+        if returncode != 0 and exhausted:
+            stderr = b"".join(stderr_tail).decode("utf-8", errors="replace")
+            logger.warning(f"{description} failed: {stderr.strip()}")
+
+
+def iter_frame_batches(
+    input_path,
+    fps=SAMPLE_FPS,
+    width=SAMPLE_WIDTH,
+    height=SAMPLE_HEIGHT,
+    scale_flags="fast_bilinear",
+):
+    """Yield (times, frames) batches for the whole input
+
+    times is a float array of frame times in seconds and frames a uint8 array
+    of shape (n, height, width). The last batch may be shorter. Use
+    scale_flags "area" when scaling down to a few pixels.
+    """
+    frame_size = width * height
+    frame_number = 0
+    for data in iter_raw_records(
+        sampler_command(input_path, fps, width, height, scale_flags),
+        frame_size,
+        READ_BATCH,
+        f"Frame sampling of {input_path}",
+    ):
+        count = len(data) // frame_size
+        frames = np.frombuffer(data, dtype=np.uint8).reshape(count, height, width)
+        times = (np.arange(count) + frame_number) / fps
+        frame_number += count
+        yield times, frames
+
+
+def iter_frames(input_path, fps=SAMPLE_FPS, width=SAMPLE_WIDTH, height=SAMPLE_HEIGHT):
+    """Yield (time, frame) for every sampled frame"""
+    for times, frames in iter_frame_batches(input_path, fps, width, height):
+        for time, frame in zip(times, frames):
+            yield float(time), frame
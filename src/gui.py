@@ -1,4 +1,5 @@
 # gui.py
+import argparse
 import json
 import logging
 import os
@@ -7,10 +8,16 @@ import sys
 import time
 import webbrowser
 
+from collections import deque
 from datetime import datetime
+from logging.handlers import RotatingFileHandler
 
-from cutting_video import cut_video
+from clip_cache import ClipCache
+from cutting_video import cut_video, install_exit_cleanup
+from encoder_lanes import EncoderLane, LaneScheduler
 from gpu_utils import GPUDetector
+from progress_tracker import ProgressTracker, format_snapshot
+from proxy_cache import ProxyCache, grab_frame
 from PyQt6.QtCore import QObject, Qt, QThread, QTimer, pyqtSignal
 from PyQt6.QtGui import QColor, QFont, QPixmap, QTextCharFormat, QTextCursor
 from PyQt6.QtWidgets import (QApplication, QCheckBox, QComboBox, QDialog,
@@ -19,6 +26,7 @@ from PyQt6.QtWidgets import (QApplication, QCheckBox, QComboBox, QDialog,
                             QMainWindow, QMessageBox, QProgressBar,
                             QPushButton, QScrollArea, QSlider, QTextBrowser,
                             QTextEdit, QVBoxLayout, QWidget)
+from trace_recorder import TraceRecorder
 
 # Konfigurasi Logging
 logging.basicConfig(
@@ -26,6 +34,11 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s",  # Format log
 )
 
+# Log lengkap disimpan ke file yang dirotasi
+LOG_FILE = "video_cutter.log"
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 3
+
 class WelcomeDialog(QDialog):
     dialog_closed = pyqtSignal(bool)  # Emit sinyal saat dialog ditutup
 
@@ -150,34 +163,65 @@ class LogFormatter(logging.Formatter):
 
 
 class GUILogger(logging.Handler):
-    """Enhanced GUI Logger with color support and auto-scroll"""
+    """Thread-safe GUI logger that batches records into the log widget.
+
+    Records are queued from any thread and flushed from the GUI thread by a
+    QTimer, so workers never touch the widget and bursts of log lines cost a
+    single repaint per flush instead of one per record.
+    """
+
+    FLUSH_INTERVAL_MS = 100  # Maksimal 10 flush per detik
+    MAX_RECORDS_PER_FLUSH = 500
+    MAX_BLOCKS = 5000  # Jumlah baris maksimal di widget (ring buffer)
 
     def __init__(self, log_widget):
         super().__init__()
         self.log_widget = log_widget
-        self.formatter = LogFormatter()
+        self.setFormatter(LogFormatter())
+
+        # deque.append thread-safe, dan maxlen membuang record tertua saat burst
+        self.pending = deque(maxlen=self.MAX_BLOCKS)
+
+        # Widget hanya menyimpan MAX_BLOCKS baris terakhir
+        self.log_widget.document().setMaximumBlockCount(self.MAX_BLOCKS)
+
+        # Timer dibuat di GUI thread sehingga flush selalu berjalan di sana
+        self.flush_timer = QTimer(log_widget)
+        self.flush_timer.setInterval(self.FLUSH_INTERVAL_MS)
+        self.flush_timer.timeout.connect(self.flush_pending)
+        self.flush_timer.start()
 
     def emit(self, record):
-        msg = self.formatter.format(record)
-        color = LogFormatter.COLORS.get(record.levelno, QColor(0, 0, 0))
+        try:
+            self.pending.append((record.levelno, self.format(record)))
+        except Exception:
+            self.handleError(record)
 
-        # Create text format with the appropriate color
-        fmt = QTextCharFormat()
-        fmt.setForeground(color)
+    def flush_pending(self):
+        """Write queued records to the widget in one edit block"""
+        if not self.pending:
+            return
 
-        # Get cursor and preserve its position
         cursor = self.log_widget.textCursor()
+        cursor.beginEditBlock()
         cursor.movePosition(QTextCursor.MoveOperation.End)
 
-        # Insert the text with the format
-        cursor.insertText(msg + "\n", fmt)
+        fmt = QTextCharFormat()
+        for _ in range(min(len(self.pending), self.MAX_RECORDS_PER_FLUSH)):
+            levelno, msg = self.pending.popleft()
+            fmt.setForeground(LogFormatter.COLORS.get(levelno, QColor(0, 0, 0)))
+            cursor.insertText(msg + "\n", fmt)
+
+        cursor.endEditBlock()
 
-        # Auto-scroll to bottom
+        # Auto-scroll ke bawah sekali per batch
         self.log_widget.setTextCursor(cursor)
         self.log_widget.ensureCursorVisible()
 
 
 class VideoProcessSignals(QObject):
+    # Progress per klip dibaca dari ProgressTracker oleh timer UI,
+    # sinyal progress di bawah tidak lagi dipancarkan per klip
     progress = pyqtSignal(int, int, str)  # Untuk log dan status
     progress_percent = pyqtSignal(int)  # Untuk progress bar
     status_update = pyqtSignal(str)  # Untuk status pesan
@@ -200,10 +244,68 @@ class GpuDetectionThread(QThread):
             self.detected_gpus.emit([])  # Kirim daftar kosong jika terjadi error
 
 
+class ProxyThread(QThread):
+    """Membuat proxy resolusi rendah dari video input di latar belakang"""
+
+    ready = pyqtSignal(str, str)  # Path input, path proxy
+    failed = pyqtSignal(str)
+
+    def __init__(self, proxy_cache, input_path):
+        super().__init__()
+        self.proxy_cache = proxy_cache
+        self.input_path = input_path
+        self.is_running = True
+
+    def run(self):
+        def poll():
+            if not self.is_running:
+                raise InterruptedError("Proxy generation cancelled")
+
+        try:
+            proxy_path = self.proxy_cache.build(self.input_path, poll=poll)
+            self.ready.emit(self.input_path, proxy_path)
+        except InterruptedError:
+            pass
+        except Exception as e:
+            logging.error(f"Error generating preview proxy: {str(e)}")
+            self.failed.emit(str(e))
+
+    def stop(self):
+        self.is_running = False
+
+
+class FrameGrabThread(QThread):
+    """Mengambil satu frame dari proxy untuk scrubber"""
+
+    frame_ready = pyqtSignal(float, bytes)
+
+    def __init__(self, video_path, seconds, width):
+        super().__init__()
+        self.video_path = video_path
+        self.seconds = seconds
+        self.width = width
+
+    def run(self):
+        try:
+            frame = grab_frame(self.video_path, self.seconds, self.width)
+            self.frame_ready.emit(self.seconds, frame)
+        except Exception as e:
+            logging.debug(f"Error reading preview frame: {str(e)}")
+
+
 class VideoCutterApp(QMainWindow):
-    def __init__(self):
+    PROGRESS_REFRESH_MS = 66  # ~15 fps
+    PREVIEW_WIDTH = 320
+    # Encode bersamaan per GPU saat semua encoder dipakai
+    HARDWARE_LANE_SLOTS = 2
+    SCRUB_STEPS_PER_SECOND = 10
+
+    def __init__(self, trace_path=None):
         super().__init__()
 
+        # Path file trace (--trace), ditimpa oleh setiap proses pemotongan
+        self.trace_path = trace_path
+
         # Inisialisasi UI utama
         self.initUI()
         self.setup_logging()
@@ -216,6 +318,18 @@ class VideoCutterApp(QMainWindow):
         self.show_welcome_dialog()
 
         self.worker = None
+
+        # Proxy untuk preview dan analisis, dibuat saat video dipilih
+        self.proxy_cache = ProxyCache()
+        self.proxy_thread = None
+        self.proxy_video = None
+        self.frame_thread = None
+
+        # Timer UI yang membaca snapshot progress dengan frame rate tetap
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(self.PROGRESS_REFRESH_MS)
+        self.progress_timer.timeout.connect(self.refresh_progress)
+
         self.load_cache()
         self.last_input_dir = None
         self.last_output_dir = None
@@ -326,6 +440,7 @@ class VideoCutterApp(QMainWindow):
                     skip_duration=self.skip_duration,
                     encoder=self.encoder,
                     progress_callback=progress_callback,
+                    cleanup=True,
                 )
                 if self.is_running:  # Cek lagi setelah proses selesai
                     self.signals.finished.emit(True)
@@ -467,6 +582,21 @@ class VideoCutterApp(QMainWindow):
         gui_handler = GUILogger(self.log_widget)
         logger.addHandler(gui_handler)
 
+        # Stream the full log to a rotating file
+        try:
+            file_handler = RotatingFileHandler(
+                LOG_FILE,
+                maxBytes=LOG_FILE_MAX_BYTES,
+                backupCount=LOG_FILE_BACKUP_COUNT,
+                encoding="utf-8",
+            )
+            file_handler.setFormatter(
+                logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+            )
+            logger.addHandler(file_handler)
+        except OSError as e:
+            logging.error(f"Failed to open log file: {str(e)}")
+
     def initUI(self):
         self.setWindowTitle("Advanced Video Cutter")
         self.setGeometry(
@@ -589,6 +719,15 @@ class VideoCutterApp(QMainWindow):
         gpu_layout.addWidget(QLabel("Select GPU:"))
         gpu_layout.addWidget(self.gpu_combo)
 
+        # Pakai semua encoder sekaligus: GPU dan CPU bekerja bersamaan
+        self.all_encoders_checkbox = QCheckBox(
+            "Use all encoders at once (GPUs and CPU together)"
+        )
+        self.all_encoders_checkbox.setToolTip(
+            "Each clip goes to the encoder that will finish it first"
+        )
+        gpu_layout.addWidget(self.all_encoders_checkbox)
+
         # Tambahkan peringatan jika bukan NVIDIA GPU
         self.gpu_warning = QLabel("")
         self.gpu_warning.setStyleSheet("color: orange;")
@@ -601,6 +740,23 @@ class VideoCutterApp(QMainWindow):
         gpu_group.setLayout(gpu_layout)
         grid_layout.addWidget(gpu_group, 2, 0, 1, 2)  # Tambahkan ke grid layout
 
+        # Preview dengan scrubber, membaca proxy resolusi rendah
+        preview_group = QGroupBox("Preview")
+        preview_layout = QVBoxLayout()
+        self.preview_label = QLabel("Select a video to preview")
+        self.preview_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.preview_label.setMinimumHeight(self.PREVIEW_WIDTH * 9 // 16)
+        preview_layout.addWidget(self.preview_label)
+        self.scrub_slider = QSlider(Qt.Orientation.Horizontal)
+        self.scrub_slider.setEnabled(False)
+        self.scrub_slider.valueChanged.connect(self.on_scrub)
+        preview_layout.addWidget(self.scrub_slider)
+        self.scrub_time_label = QLabel("00:00:00.0")
+        self.scrub_time_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        preview_layout.addWidget(self.scrub_time_label)
+        preview_group.setLayout(preview_layout)
+        grid_layout.addWidget(preview_group, 3, 0, 1, 2)
+
         # Tambahkan Grid Layout ke Layout Utama
         self.layout.addLayout(grid_layout)
 
@@ -779,6 +935,72 @@ class VideoCutterApp(QMainWindow):
             logging.info(f"Selected input video: {file_path}")
             # Update last input directory
             self.last_input_dir = os.path.dirname(file_path)
+            self.start_proxy(file_path)
+
+    def start_proxy(self, input_path):
+        """Mulai membuat proxy untuk preview di latar belakang"""
+        self.stop_proxy()
+        self.proxy_video = None
+        self.scrub_slider.setEnabled(False)
+        self.preview_label.setPixmap(QPixmap())
+        self.preview_label.setText("Generating preview...")
+        self.proxy_thread = ProxyThread(self.proxy_cache, input_path)
+        self.proxy_thread.ready.connect(self.on_proxy_ready)
+        self.proxy_thread.failed.connect(
+            lambda error: self.preview_label.setText("Preview unavailable")
+        )
+        self.proxy_thread.start()
+
+    def stop_proxy(self):
+        if self.proxy_thread and self.proxy_thread.isRunning():
+            self.proxy_thread.stop()
+            self.proxy_thread.wait()
+        self.proxy_thread = None
+
+    def on_proxy_ready(self, input_path, proxy_path):
+        if input_path != self.input_video:
+            return  # Video lain sudah dipilih
+        self.proxy_video = proxy_path
+        probe_data = self.proxy_cache.probe(input_path)
+        duration = float(probe_data.get("format", {}).get("duration", 0) or 0)
+        self.scrub_slider.setRange(0, int(duration * self.SCRUB_STEPS_PER_SECOND))
+        self.scrub_slider.setValue(0)
+        self.scrub_slider.setEnabled(True)
+        self.request_preview_frame()
+
+    def on_scrub(self, value):
+        seconds = value / self.SCRUB_STEPS_PER_SECOND
+        hours, rest = divmod(seconds, 3600)
+        minutes, seconds = divmod(rest, 60)
+        self.scrub_time_label.setText(
+            f"{int(hours):02d}:{int(minutes):02d}:{seconds:04.1f}"
+        )
+        self.request_preview_frame()
+
+    def request_preview_frame(self):
+        """Ambil frame pada posisi scrubber, paling banyak satu proses sekaligus"""
+        if not self.proxy_video:
+            return
+        if self.frame_thread and self.frame_thread.isRunning():
+            return  # Posisi terbaru diambil saat frame ini selesai
+        seconds = self.scrub_slider.value() / self.SCRUB_STEPS_PER_SECOND
+        self.frame_thread = FrameGrabThread(
+            self.proxy_video, seconds, self.PREVIEW_WIDTH
+        )
+        self.frame_thread.frame_ready.connect(self.show_preview_frame)
+        self.frame_thread.finished.connect(self.on_frame_grab_finished)
+        self.frame_thread.start()
+
+    def on_frame_grab_finished(self):
+        seconds = self.scrub_slider.value() / self.SCRUB_STEPS_PER_SECOND
+        if self.frame_thread and self.frame_thread.seconds != seconds:
+            self.frame_thread = None
+            self.request_preview_frame()
+
+    def show_preview_frame(self, seconds, frame):
+        pixmap = QPixmap()
+        if pixmap.loadFromData(frame):
+            self.preview_label.setPixmap(pixmap)
 
     def select_output_folder(self):
         initial_dir = self.last_output_dir if self.last_output_dir else ""
@@ -803,6 +1025,11 @@ class VideoCutterApp(QMainWindow):
             # Reset input/output
             self.input_video = None
             self.input_label.setText("Input Video: None")
+            self.stop_proxy()
+            self.proxy_video = None
+            self.scrub_slider.setEnabled(False)
+            self.preview_label.setPixmap(QPixmap())
+            self.preview_label.setText("Select a video to preview")
 
             # Pertahankan output folder
             if self.output_folder:
@@ -846,12 +1073,27 @@ class VideoCutterApp(QMainWindow):
         self.threads_slider.setEnabled(enabled)
         self.clip_duration_slider.setEnabled(enabled)
         self.skip_duration_slider.setEnabled(enabled)
+        self.all_encoders_checkbox.setEnabled(enabled)
         self.start_btn.setEnabled(enabled)
         # Toggle cancel button opposite to other controls
         self.cancel_btn.setEnabled(not enabled)
         # Keep reset button always enabled
         self.reset_button.setEnabled(True)
 
+    def encoder_lanes(self):
+        """Satu lane per encoder terdeteksi jika opsi semua encoder dicentang"""
+        if not self.all_encoders_checkbox.isChecked():
+            return None
+        lanes = []
+        for encoder in dict.fromkeys(gpu["encoder"] for gpu in self.available_gpus):
+            if encoder == "libx264":
+                # CPU memakai jumlah thread dari slider
+                lanes.append(EncoderLane(encoder, self.threads_slider.value()))
+            else:
+                lanes.append(EncoderLane(encoder, self.HARDWARE_LANE_SLOTS))
+        logging.info(f"Encoder lanes: {', '.join(lane.name for lane in lanes)}")
+        return LaneScheduler(lanes)
+
     def start_cutting(self):
         if not self.input_video or not self.output_folder:
             QMessageBox.warning(
@@ -888,17 +1130,19 @@ class VideoCutterApp(QMainWindow):
                 self.clip_duration_slider.value(),
                 self.skip_duration_slider.value(),
                 selected_gpu["encoder"],  # Pass encoder to worker
+                proxy_cache=self.proxy_cache,
+                trace_path=self.trace_path,
+                lanes=self.encoder_lanes(),
             )
 
             # Connect signals
-            self.worker.signals.progress.connect(self.handle_progress)
-            self.worker.signals.progress_percent.connect(self.update_progress)
             self.worker.signals.status_update.connect(self.update_status)
             self.worker.signals.finished.connect(self.process_finished)
             self.worker.signals.error.connect(self.handle_error)
 
             # Start processing
             self.worker.start()
+            self.progress_timer.start()
 
         except Exception as e:
             logging.error(f"Error: {str(e)}")
@@ -910,6 +1154,20 @@ class VideoCutterApp(QMainWindow):
         self.update_progress(progress_percentage)
         self.update_status(message)
 
+    def refresh_progress(self):
+        """Sample the worker's progress snapshot and repaint once"""
+        if not self.worker:
+            self.progress_timer.stop()
+            return
+
+        snapshot = self.worker.tracker.snapshot()
+        if snapshot["total"]:
+            self.progress_bar.setValue(snapshot["percent"])
+            self.status_label.setText(format_snapshot(snapshot))
+
+        if not self.worker.isRunning():
+            self.progress_timer.stop()
+
     def handle_error(self, error_message):
         """Handle errors from the worker thread"""
         if "Process stopped by user" in error_message:
@@ -938,6 +1196,10 @@ class VideoCutterApp(QMainWindow):
 
     def process_finished(self, success):
         """Handle completion of video processing"""
+        # Final progress sample before the status text is replaced
+        self.refresh_progress()
+        self.progress_timer.stop()
+
         # Re-enable all controls
         self.enable_controls(True)
 
@@ -965,6 +1227,7 @@ class VideoCutterApp(QMainWindow):
 
         if reply == QMessageBox.StandardButton.Yes:
             logging.info("User confirmed exit.")
+            self.stop_proxy()
             self.save_cache()
             event.accept()  # Mengizinkan aplikasi untuk menutup
         else:
@@ -995,6 +1258,7 @@ class VideoCutterApp(QMainWindow):
                 clip_duration=self.clip_duration_slider.value(),
                 skip_duration=self.skip_duration_slider.value(),
                 progress_callback=progress_callback,
+                cleanup=True,
             )
 
             # Update final status
@@ -1009,6 +1273,10 @@ class VideoCutterApp(QMainWindow):
 
     def process_finished(self, success):
         """Handle completion of video processing"""
+        # Final progress sample before the status text is replaced
+        self.refresh_progress()
+        self.progress_timer.stop()
+
         # Re-enable all controls
         self.enable_controls(True)
 
@@ -1030,7 +1298,16 @@ class VideoCutterApp(QMainWindow):
 
 class VideoCutterWorker(QThread):
     def __init__(
-        self, input_video, output_dir, threads, clip_duration, skip_duration, encoder
+        self,
+        input_video,
+        output_dir,
+        threads,
+        clip_duration,
+        skip_duration,
+        encoder,
+        proxy_cache=None,
+        trace_path=None,
+        lanes=None,
     ):
         super().__init__()
         self.input_video = input_video
@@ -1039,7 +1316,11 @@ class VideoCutterWorker(QThread):
         self.clip_duration = clip_duration
         self.skip_duration = skip_duration
         self.encoder = encoder
+        self.proxy_cache = proxy_cache
+        self.trace_path = trace_path
+        self.lanes = lanes
         self.signals = VideoProcessSignals()
+        self.tracker = ProgressTracker()
         self.is_running = True
 
     def run(self):
@@ -1048,23 +1329,34 @@ class VideoCutterWorker(QThread):
             from cutting_video import cut_video
 
             def progress_callback(current, total, message):
+                # Progress dibaca UI dari self.tracker, di sini hanya cek cancel
                 if not self.is_running:
                     raise Exception("Process stopped by user")
-                progress_percentage = int((current / total) * 100)
-                self.signals.progress.emit(current, total, message)
-                self.signals.progress_percent.emit(progress_percentage)
-                self.signals.status_update.emit(message)
+
+            # Timeline job ditulis ke file trace jika aplikasi dijalankan dengan --trace
+            trace = TraceRecorder(self.trace_path) if self.trace_path else None
 
             # Pass encoder to cut_video function
-            cut_video(
-                self.input_video,
-                self.output_dir,
-                max_workers=self.threads,
-                clip_duration=self.clip_duration,
-                skip_duration=self.skip_duration,
-                encoder=self.encoder,  # Add encoder parameter
-                progress_callback=progress_callback,
-            )
+            self.tracker.reset()
+            try:
+                cut_video(
+                    self.input_video,
+                    self.output_dir,
+                    max_workers=self.threads,
+                    clip_duration=self.clip_duration,
+                    skip_duration=self.skip_duration,
+                    encoder=self.encoder,  # Add encoder parameter
+                    progress_callback=progress_callback,
+                    progress_tracker=self.tracker,
+                    clip_cache=ClipCache(),  # Re-cutting the same video reuses clips
+                    proxy_cache=self.proxy_cache,
+                    trace=trace,
+                    lanes=self.lanes,
+                    cleanup=True,
+                )
+            finally:
+                if trace is not None:
+                    trace.close()
             self.signals.finished.emit(True)
         except Exception as e:
             self.signals.error.emit(str(e))
@@ -1107,17 +1399,18 @@ class VideoCutterWorker(QThread):
                 self.clip_duration_slider.value(),
                 self.skip_duration_slider.value(),
                 selected_gpu["encoder"],
+                proxy_cache=self.proxy_cache,
+                trace_path=self.trace_path,
             )
 
             # Connect signals
-            self.worker.signals.progress.connect(self.handle_progress)
-            self.worker.signals.progress_percent.connect(self.update_progress)
             self.worker.signals.status_update.connect(self.update_status)
             self.worker.signals.finished.connect(self.process_finished)
             self.worker.signals.error.connect(self.handle_error)
 
             # Start processing
             self.worker.start()
+            self.progress_timer.start()
 
         except Exception as e:
             logging.error(f"Error: {str(e)}")
@@ -1139,14 +1432,26 @@ if __name__ == "__main__":
 
     sys.excepthook = handle_exception
 
+    # Matikan sisa proses ffmpeg saat aplikasi ditutup
+    install_exit_cleanup()
+
+    # Opsi command line milik aplikasi, sisanya diteruskan ke Qt
+    parser = argparse.ArgumentParser(description="Video cutter GUI")
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Write a Chrome/Perfetto trace of each cutting job to PATH",
+    )
+    args, qt_args = parser.parse_known_args()
+
     # Start application
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
 
     # Set application style
     app.setStyle("Fusion")
 
     # Create and show main window
-    window = VideoCutterApp()
+    window = VideoCutterApp(trace_path=args.trace)
     window.show()
 
     sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,376 @@
+# highlight_reel.py
+"""Join selected clips of a job into one highlight reel without re-encoding
+
+    python highlight_reel.py clips/talk reel.mp4 --clips 3 7 12-15
+
+Clips of one job share their encoder settings, so the reel is written by
+ffmpeg's concat demuxer in stream-copy mode and takes seconds, not a full
+encode. Every selected clip is probed first; the codec parameters most of
+them share are the reference, and only clips that differ (another encoder
+or preset, resolution or frame rate, an in-process engine, a missing audio
+track) are re-encoded to match it before the join. The comparison includes
+the H.264 level, reference frames and a hash of the codec extradata
+(SPS/PPS), because the joined file carries the parameter sets of one clip
+only, so clips are re-encoded with the encoder and preset the job's clip
+index records for the reference clips. When those are unknown, or another
+encoder is asked for, the parameter sets cannot be reproduced and the
+whole reel is encoded in one pass instead of producing a file that breaks
+after the first clip.
+
+Clips are found through the job's clip_index.tsv, or by scanning the
+folder for clip_<number>.mp4 files of jobs written without an index.
+"""
+import argparse
+import logging
+import os
+import json
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from clip_layout import CLIP_INDEX_NAME, read_clip_encoders, read_clip_index
+from cutting_video import encoder_args, hidden_window_kwargs, run_ffmpeg
+from ffmpeg_binaries import ffmpeg_executable, ffprobe_executable
+
+logger = logging.getLogger(__name__)
+
+CLIP_NAME = re.compile(r"clip_(\d+)\.mp4$")
+# ffprobe H.264 profile names -> encoder -profile:v values
+H264_PROFILES = {
+    "Constrained Baseline": "baseline",
+    "Baseline": "baseline",
+    "Main": "main",
+    "High": "high",
+    "High 10": "high10",
+    "High 4:2:2": "high422",
+    "High 4:4:4 Predictive": "high444",
+}
+# Encoder used to re-encode mismatched clips, by reference codec
+REEL_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+DEFAULT_WORKERS = 4
+
+
+def parse_selection(values):
+    """Clip numbers from values like "3", "7,9" or "12-15", in the given order"""
+    indices = []
+    for value in values:
+        for part in str(value).split(","):
+            if not part:
+                continue
+            first, _, last = part.partition("-")
+            if last:
+                indices.extend(range(int(first), int(last) + 1))
+            else:
+                indices.append(int(first))
+    return indices
+
+
+def clip_paths(output_folder):
+    """Clip number -> path of the MP4 clips of a job's output folder"""
+    if os.path.exists(os.path.join(output_folder, CLIP_INDEX_NAME)):
+        return {
+            index: os.path.join(output_folder, *path.split("/"))
+            for index, path, _, _, _ in read_clip_index(output_folder)
+            if path.endswith(".mp4")
+        }
+
+    paths = {}
+    for folder, _, files in os.walk(output_folder):
+        for name in files:
+            match = CLIP_NAME.match(name)
+            if match:
+                paths[int(match.group(1))] = os.path.join(folder, name)
+    return paths
+
+
+def probe_clip(clip_path):
+    """ffprobe streams of clip_path including hashes of the codec extradata"""
+    cmd = [
+        *ffprobe_executable(),
+        "-v",
+        "quiet",
+        "-print_format",
+        "json",
+        "-show_streams",
+        "-show_data_hash",
+        "CRC32",
+        clip_path,
+    ]
+    result = subprocess.run(
+        cmd, capture_output=True, text=True, check=True, **hidden_window_kwargs()
+    )
+    return json.loads(result.stdout)
+
+
+def stream_signature(probe_data):
+    """Parameters that have to match for clips to be joined by stream copy"""
+    streams = probe_data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    signature = (
+        video.get("codec_name"),
+        video.get("profile"),
+        video.get("level"),
+        video.get("refs"),
+        video.get("extradata_hash"),
+        video.get("width"),
+        video.get("height"),
+        video.get("pix_fmt"),
+        video.get("r_frame_rate"),
+    )
+    if audio is None:
+        return signature + (None,)
+    return signature + (
+        (
+            audio.get("codec_name"),
+            audio.get("sample_rate"),
+            audio.get("channels"),
+            audio.get("extradata_hash"),
+        ),
+    )
+
+
+def clip_encoders(output_folder):
+    """Clip number -> (encoder, preset) from the job's clip index, if recorded"""
+    if not os.path.exists(os.path.join(output_folder, CLIP_INDEX_NAME)):
+        return {}
+    return read_clip_encoders(output_folder)
+
+
+def match_args(clip_path, signature, output_path, reference, encoder, preset=None):
+    """ffmpeg command re-encoding a clip of signature to the reference one"""
+    codec, profile, level, refs, _, width, height, pix_fmt, frame_rate, audio = (
+        reference
+    )
+    cmd = [*ffmpeg_executable(), "-y", "-i", clip_path]
+    if audio is not None and signature[-1] is None:
+        # Clips without audio get silence so every clip has the same tracks
+        layout = "mono" if audio[2] == 1 else "stereo"
+        cmd.extend(["-f", "lavfi", "-i", f"anullsrc=r={audio[1]}:cl={layout}"])
+        cmd.extend(["-map", "0:v:0", "-map", "1:a:0", "-shortest"])
+    cmd.extend(
+        [
+            "-vf",
+            f"scale={width}:{height},setsar=1,fps={frame_rate}",
+            *encoder_args(encoder, preset),
+            "-pix_fmt",
+            pix_fmt,
+        ]
+    )
+    if codec == "h264" and profile in H264_PROFILES:
+        cmd.extend(["-profile:v", H264_PROFILES[profile]])
+    if codec == "h264" and level and level > 0:
+        cmd.extend(["-level", f"{level / 10:.1f}"])
+    if refs:
+        cmd.extend(["-refs", str(refs)])
+    if audio is None:
+        cmd.append("-an")
+    else:
+        cmd.extend(["-c:a", audio[0], "-ar", str(audio[1]), "-ac", str(audio[2])])
+    cmd.append(output_path)
+    return cmd
+
+
+def concat_line(path):
+    """concat demuxer "file" directive for path"""
+    quoted = os.path.abspath(path).replace("'", "'\\''")
+    return f"file '{quoted}'\n"
+
+
+def concat_args(list_path, reel_path, codec_args=("-c", "copy")):
+    """ffmpeg command joining the clips of list_path (by stream copy)"""
+    return [
+        *ffmpeg_executable(),
+        "-y",
+        "-f",
+        "concat",
+        "-safe",
+        "0",
+        "-i",
+        list_path,
+        "-map",
+        "0",
+        *codec_args,
+        "-movflags",
+        "+faststart",
+        reel_path,
+    ]
+
+
+def build_reel(output_folder, indices, reel_path, encoder=None, max_workers=None):
+    """Join clips number indices of a job into reel_path, in the given order
+
+    Returns a dict with the reel path, the joined clip numbers, the clip
+    numbers that had to be re-encoded, whether the whole reel had to be
+    encoded and the elapsed seconds. Raises
+    ValueError for unknown clip numbers and CalledProcessError if ffmpeg
+    fails.
+    """
+    started = time.perf_counter()
+    indices = list(indices)
+    if not indices:
+        raise ValueError("No clips selected for the reel")
+    paths = clip_paths(output_folder)
+    # Clips of archived jobs are listed in the index but not on disk
+    missing = [
+        index
+        for index in indices
+        if index not in paths or not os.path.exists(paths[index])
+    ]
+    if missing:
+        raise ValueError(
+            f"Clips not found in {output_folder}: "
+            f"{', '.join(str(index) for index in missing)}"
+        )
+    max_workers = max_workers or min(DEFAULT_WORKERS, len(indices))
+
+    # Each clip once, even if it appears several times in the reel
+    unique = list(dict.fromkeys(indices))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        probes = executor.map(lambda index: probe_clip(paths[index]), unique)
+        signatures = dict(zip(unique, map(stream_signature, probes)))
+    reference = Counter(signatures[index] for index in indices).most_common(1)[0][0]
+    mismatched = [index for index in unique if signatures[index] != reference]
+    preset = None
+    encode_reel = False
+    if mismatched:
+        encoders = clip_encoders(output_folder)
+        reference_encoder = Counter(
+            encoders.get(index) for index in indices if signatures[index] == reference
+        ).most_common(1)[0][0]
+        if reference_encoder is not None and encoder in (None, reference_encoder[0]):
+            encoder, preset = reference_encoder
+        else:
+            # Another or an unknown encoder writes other parameter sets, so
+            # re-encoded clips could never be copied next to the others
+            logger.info(
+                "The encoder of the other clips is unknown or not the one "
+                "asked for, encoding the whole reel"
+            )
+            encode_reel = True
+            encoder = encoder or REEL_ENCODERS.get(reference[0])
+            if encoder is None:
+                raise ValueError(f"Cannot re-encode clips to match {reference[0]}")
+
+    reel_folder = os.path.dirname(os.path.abspath(reel_path))
+    os.makedirs(reel_folder, exist_ok=True)
+    work_folder = tempfile.mkdtemp(prefix=".reel-", dir=reel_folder)
+    try:
+        sources = dict(paths)
+        reencoded = mismatched
+        if encode_reel:
+            # The reel encode normalises size and frame rate itself; only a
+            # missing audio track has to be filled in clip by clip
+            reencoded = [
+                index
+                for index in mismatched
+                if reference[-1] is not None and signatures[index][-1] is None
+            ]
+        commands = []
+        for index in reencoded:
+            sources[index] = os.path.join(work_folder, f"clip_{index}.mp4")
+            commands.append(
+                match_args(
+                    paths[index],
+                    signatures[index],
+                    sources[index],
+                    reference,
+                    encoder,
+                    preset,
+                )
+            )
+        if commands:
+            logger.info(
+                f"Re-encoding {len(commands)} of {len(unique)} clips to match "
+                f"the others"
+            )
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(run_ffmpeg, commands))
+                if not encode_reel:
+                    rechecked = executor.map(
+                        lambda index: stream_signature(probe_clip(sources[index])),
+                        reencoded,
+                    )
+                    still_mismatched = [
+                        index
+                        for index, signature in zip(reencoded, rechecked)
+                        if signature != reference
+                    ]
+            if not encode_reel and still_mismatched:
+                # E.g. a different encoder build; copying their parameter sets
+                # under the reference clip's would not decode
+                logger.warning(
+                    f"Clips {', '.join(map(str, still_mismatched))} cannot be "
+                    f"made to match the others, encoding the whole reel"
+                )
+                encode_reel = True
+
+        list_path = os.path.join(work_folder, "concat.txt")
+        with open(list_path, "w", encoding="utf-8") as list_file:
+            list_file.writelines(concat_line(sources[index]) for index in indices)
+        if encode_reel:
+            width, height, pix_fmt, frame_rate = reference[5:9]
+            codec_args = [
+                "-vf",
+                f"scale={width}:{height},setsar=1,fps={frame_rate}",
+                *encoder_args(encoder, preset),
+                "-pix_fmt",
+                pix_fmt,
+            ]
+            run_ffmpeg(concat_args(list_path, reel_path, codec_args))
+        else:
+            run_ffmpeg(concat_args(list_path, reel_path))
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Reel {reel_path} written from {len(indices)} clips in {elapsed:.1f}s "
+        f"({len(reencoded)} re-encoded)"
+    )
+    return {
+        "path": reel_path,
+        "clips": indices,
+        "reencoded": reencoded,
+        "encoded_reel": encode_reel,
+        "seconds": round(elapsed, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Join clips into a highlight reel")
+    parser.add_argument("clips_folder", help="Output folder of a cutting job")
+    parser.add_argument("reel", help="Path of the reel to write")
+    parser.add_argument(
+        "--clips",
+        nargs="+",
+        required=True,
+        help="Clip numbers in reel order, e.g. 3 7 12-15 or 3,7,12-15",
+    )
+    parser.add_argument(
+        "--encoder", help="Encoder for clips that have to be re-encoded"
+    )
+    parser.add_argument("--workers", type=int, help="Concurrent probes and encodes")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    try:
+        indices = parse_selection(args.clips)
+    except ValueError:
+        parser.error(f"invalid clip selection {' '.join(args.clips)!r}")
+    try:
+        build_reel(args.clips_folder, indices, args.reel, args.encoder, args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# packaged_output.py
+"""Streaming-ready output formats written straight from the encoder
+
+Besides one MP4 per clip, clips can be written as HLS (MPEG-TS or
+fragmented-MP4 segments) or DASH, each clip in its own folder with its
+playlist/manifest, so no second remux pass is needed. For HLS, a single
+playlist spanning the whole clip sequence can also be written.
+"""
+import os
+
+# output_format -> (file written per clip, segment extension)
+OUTPUT_FORMATS = {
+    "mp4": (None, None),
+    "hls": ("index.m3u8", ".ts"),
+    "hls_fmp4": ("index.m3u8", ".m4s"),
+    "dash": ("manifest.mpd", ".m4s"),
+}
+
+SEQUENCE_PLAYLIST_NAME = "playlist.m3u8"
+DEFAULT_SEGMENT_DURATION = 2
+
+
+def validate_output_format(output_format):
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"Unknown output format '{output_format}', "
+            f"expected one of {', '.join(OUTPUT_FORMATS)}"
+        )
+
+
+def is_packaged(output_format):
+    return OUTPUT_FORMATS[output_format][0] is not None
+
+
+def output_format_args(output_path, output_format, segment_duration):
+    """ffmpeg muxer options that package a clip as it is encoded"""
+    if not is_packaged(output_format):
+        return []
+
+    clip_dir = os.path.dirname(output_path)
+    os.makedirs(clip_dir, exist_ok=True)
+    segment_extension = OUTPUT_FORMATS[output_format][1]
+
+    if output_format == "dash":
+        return [
+            "-f",
+            "dash",
+            "-seg_duration",
+            str(segment_duration),
+            "-use_template",
+            "1",
+            "-use_timeline",
+            "1",
+            "-init_seg_name",
+            "init-$RepresentationID$.m4s",
+            "-media_seg_name",
+            "chunk-$RepresentationID$-$Number%05d$.m4s",
+        ]
+
+    args = [
+        "-f",
+        "hls",
+        "-hls_time",
+        str(segment_duration),
+        "-hls_playlist_type",
+        "vod",
+        "-hls_segment_filename",
+        os.path.join(clip_dir, f"segment_%05d{segment_extension}"),
+    ]
+    if output_format == "hls_fmp4":
+        args.extend(
+            ["-hls_segment_type", "fmp4", "-hls_fmp4_init_filename", "init.mp4"]
+        )
+    return args
+
+
+def clip_output_size(output_path, output_format="mp4"):
+    """Bytes written for one clip, including all of its segments"""
+    if not is_packaged(output_format):
+        return os.path.getsize(output_path)
+
+    clip_dir = os.path.dirname(output_path)
+    return sum(
+        entry.stat().st_size for entry in os.scandir(clip_dir) if entry.is_file()
+    )
+
+
+def write_sequence_playlist(output_folder, clip_playlists):
+    """Write one HLS playlist that plays every clip playlist in order
+
+    Clips are separated by EXT-X-DISCONTINUITY since each restarts its
+    timestamps, and segment/init URIs are rewritten relative to
+    output_folder. Returns the path of the written playlist.
+    """
+    target_duration = 1
+    version = 3
+    body = []
+
+    for number, playlist_path in enumerate(clip_playlists):
+        prefix = os.path.relpath(os.path.dirname(playlist_path), output_folder)
+        prefix = prefix.replace(os.sep, "/")
+        with open(playlist_path, "r", encoding="utf-8") as playlist_file:
+            lines = playlist_file.read().splitlines()
+
+        if number:
+            body.append("#EXT-X-DISCONTINUITY")
+        for line in lines:
+            if line.startswith("#EXT-X-TARGETDURATION:"):
+                target_duration = max(target_duration, int(line.split(":", 1)[1]))
+            elif line.startswith("#EXT-X-VERSION:"):
+                version = max(version, int(line.split(":", 1)[1]))
+            elif line.startswith("#EXT-X-MAP:"):
+                body.append(line.replace('URI="', f'URI="{prefix}/', 1))
+            elif line.startswith("#EXTINF:") or line.startswith("#EXT-X-BYTERANGE"):
+                body.append(line)
+            elif line and not line.startswith("#"):
+                body.append(f"{prefix}/{line}")
+
+    header = [
+        "#EXTM3U",
+        f"#EXT-X-VERSION:{version}",
+        f"#EXT-X-TARGETDURATION:{target_duration}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+    ]
+    sequence_path = os.path.join(output_folder, SEQUENCE_PLAYLIST_NAME)
+    with open(sequence_path, "w", encoding="utf-8") as sequence_file:
+        sequence_file.write("\n".join(header + body + ["#EXT-X-ENDLIST"]) + "\n")
+    return sequence_path
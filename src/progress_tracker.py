@@ -0,0 +1,101 @@
+# progress_tracker.py
+import threading
+import time
+
+
+class ProgressTracker:
+    """Shared job progress state updated by workers and sampled by the UI.
+
+    Workers only take a short lock to bump counters; the UI polls
+    snapshot() at its own frame rate, so signal traffic does not grow with
+    the number of clips.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, total=0):
+        """Clear all counters and start timing a new job"""
+        with self._lock:
+            self.total = total
+            self.done = 0
+            self.failed = 0
+            self.in_flight = 0
+            self.bytes_written = 0
+            self.message = ""
+            self.started_at = time.monotonic()
+            self.finished_at = None
+
+    def set_total(self, total):
+        with self._lock:
+            self.total = total
+
+    def set_message(self, message):
+        with self._lock:
+            self.message = message
+
+    def clip_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def clip_finished(self, success, bytes_written=0):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if success:
+                self.done += 1
+                self.bytes_written += bytes_written
+            else:
+                self.failed += 1
+
+    def finish(self, message=None):
+        with self._lock:
+            self.finished_at = time.monotonic()
+            if message is not None:
+                self.message = message
+
+    def snapshot(self):
+        """Return a consistent copy of the current progress as a dict"""
+        with self._lock:
+            end = self.finished_at if self.finished_at is not None else time.monotonic()
+            elapsed = max(end - self.started_at, 1e-6)
+            completed = self.done + self.failed
+            clips_per_sec = completed / elapsed
+            remaining = max(self.total - completed, 0)
+
+            eta = None
+            if clips_per_sec > 0:
+                eta = remaining / clips_per_sec
+
+            percent = int(completed * 100 / self.total) if self.total else 0
+
+            return {
+                "total": self.total,
+                "done": self.done,
+                "failed": self.failed,
+                "in_flight": self.in_flight,
+                "completed": completed,
+                "percent": min(percent, 100),
+                "bytes_written": self.bytes_written,
+                "elapsed": elapsed,
+                "clips_per_sec": clips_per_sec,
+                "bytes_per_sec": self.bytes_written / elapsed,
+                "eta": eta,
+                "message": self.message,
+                "finished": self.finished_at is not None,
+            }
+
+
+def format_snapshot(snapshot):
+    """Build a one-line status text from a snapshot"""
+    parts = [f"Clips {snapshot['completed']}/{snapshot['total']}"]
+    if snapshot["failed"]:
+        parts.append(f"{snapshot['failed']} failed")
+    if snapshot["in_flight"]:
+        parts.append(f"{snapshot['in_flight']} running")
+    parts.append(f"{snapshot['bytes_written'] / (1024 * 1024):.1f} MB")
+    parts.append(f"{snapshot['clips_per_sec']:.2f} clips/s")
+    if snapshot["eta"] is not None and not snapshot["finished"]:
+        eta = int(snapshot["eta"])
+        parts.append(f"ETA {eta // 3600:02d}:{eta % 3600 // 60:02d}:{eta % 60:02d}")
+    return " - ".join(parts)
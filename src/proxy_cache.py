@@ -0,0 +1,172 @@
+# proxy_cache.py
+"""Low-resolution, all-intra proxies of input videos
+
+Previewing or analysing a 4K source means decoding 4K frames. A proxy is a
+small copy of the input (180 lines, 10 fps, every frame a keyframe, no
+audio) that is generated once in the background and cached together with
+the input's probe data under its sampled content fingerprint. Any frame of
+a proxy decodes in a few milliseconds, so scrubbing and analysis passes
+read the proxy instead of the original.
+"""
+import json
+import logging
+import os
+import shutil
+import subprocess
+import uuid
+
+from cutting_video import hidden_window_kwargs, probe_video, run_ffmpeg
+from ffmpeg_binaries import ffmpeg_executable
+from fingerprint import fingerprint_file
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROXY_DIR = os.path.join(os.path.expanduser("~"), ".video_cutter", "proxies")
+DEFAULT_MAX_BYTES = 10 * 1024**3
+PROXY_HEIGHT = 180
+PROXY_FPS = 10
+PROXY_NAME = "proxy.mp4"
+PROBE_NAME = "probe.json"
+
+
+def proxy_command(input_path, output_path, height=PROXY_HEIGHT, fps=PROXY_FPS):
+    return [
+        *ffmpeg_executable(),
+        "-hide_banner",
+        "-threads",
+        "0",
+        "-i",
+        input_path,
+        "-map",
+        "0:v:0",
+        "-an",
+        "-sn",
+        "-dn",
+        "-vf",
+        f"fps={fps},scale=-2:{height}:flags=area",
+        "-c:v",
+        "libx264",
+        "-preset",
+        "ultrafast",
+        "-tune",
+        "fastdecode",
+        "-crf",
+        "28",
+        "-g",
+        "1",  # All-intra: any frame decodes on its own
+        "-pix_fmt",
+        "yuv420p",
+        "-movflags",
+        "+faststart",
+        "-y",
+        "-loglevel",
+        "error",
+        output_path,
+    ]
+
+
+def grab_frame(video_path, seconds, width=None):
+    """Return one frame at seconds as PNG bytes"""
+    cmd = [
+        *ffmpeg_executable(),
+        "-hide_banner",
+        "-ss",
+        f"{max(0.0, seconds):.3f}",
+        "-i",
+        video_path,
+        "-frames:v",
+        "1",
+    ]
+    if width:
+        cmd.extend(["-vf", f"scale={width}:-2"])
+    cmd.extend(["-f", "image2pipe", "-c:v", "png", "-loglevel", "error", "-"])
+    result = subprocess.run(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        check=True,
+        **hidden_window_kwargs(),
+    )
+    return result.stdout
+
+
+class ProxyCache:
+    """Proxies and probe data of inputs, keyed by input fingerprint"""
+
+    def __init__(self, root=DEFAULT_PROXY_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def entry_dir(self, input_path):
+        # Content only: the probe data is what gets cached here
+        fingerprint = fingerprint_file(input_path)
+        return os.path.join(self.root, fingerprint[:2], fingerprint)
+
+    def probe(self, input_path):
+        """Probe data of input_path, cached after the first call"""
+        entry_dir = self.entry_dir(input_path)
+        probe_path = os.path.join(entry_dir, PROBE_NAME)
+        try:
+            with open(probe_path, "r", encoding="utf-8") as probe_file:
+                return json.load(probe_file)
+        except (OSError, ValueError):
+            pass
+
+        probe_data = probe_video(input_path)
+        os.makedirs(entry_dir, exist_ok=True)
+        with open(probe_path, "w", encoding="utf-8") as probe_file:
+            json.dump(probe_data, probe_file)
+        return probe_data
+
+    def proxy_path(self, input_path):
+        """Path of the finished proxy of input_path, or None"""
+        path = os.path.join(self.entry_dir(input_path), PROXY_NAME)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)  # Mark as recently used
+        return path
+
+    def build(self, input_path, poll=None):
+        """Generate the proxy of input_path unless it exists; return its path
+
+        poll is called regularly while ffmpeg runs and may raise to cancel.
+        """
+        entry_dir = self.entry_dir(input_path)
+        path = os.path.join(entry_dir, PROXY_NAME)
+        if os.path.exists(path):
+            return path
+
+        self.probe(input_path)
+        temp_path = os.path.join(entry_dir, f"{uuid.uuid4().hex}.tmp.mp4")
+        logger.info(f"Generating preview proxy of {os.path.basename(input_path)}")
+        try:
+            run_ffmpeg(proxy_command(input_path, temp_path), poll=poll)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        logger.info(f"Preview proxy ready: {path}")
+        self._evict()
+        return path
+
+    def _evict(self):
+        """Remove least recently used proxies until the cache fits max_bytes"""
+        entries = []
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                proxy = os.path.join(entry.path, PROXY_NAME)
+                try:
+                    stat = os.stat(proxy)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
@@ -0,0 +1,222 @@
+# pyav_engine.py
+"""In-process clip engine based on PyAV (optional, ``pip install av``)
+
+Every clip normally costs an ffmpeg process: process creation, loading the
+libav libraries, probing the input and setting up the decoder. PyAVEngine
+opens the input once per worker thread and keeps it open for the whole
+job, so a clip is only a seek plus the packets it contains.
+
+    engine = PyAVEngine("copy")
+    cut_video("talk.mp4", "clips", engine=engine)
+
+Modes:
+
+    copy    packets are remuxed without decoding. Clips start at the
+            keyframe at or before the planned start, like ffmpeg -c copy.
+    encode  video is decoded from the preceding keyframe and re-encoded
+            frame-exact with the job's encoder and bitrate; audio packets
+            are copied.
+
+Audio is always stream-copied, so the input's audio codec must fit in MP4
+(AAC, MP3, Opus, ...). Only single-file MP4 output is supported.
+"""
+import logging
+import subprocess
+import threading
+from fractions import Fraction
+
+import av
+
+logger = logging.getLogger(__name__)
+
+MODES = ("copy", "encode")
+AV_ERROR = getattr(av, "FFmpegError", None) or av.AVError
+# Bitrate and preset arguments of cutting_video.encoder_args
+VIDEO_BIT_RATE = 5_000_000
+DEFAULT_FRAME_RATE = Fraction(30)
+
+
+def encoder_options(encoder):
+    """libav private options matching cutting_video.encoder_args(encoder)"""
+    options = {"preset": "p1" if encoder == "h264_nvenc" else "medium"}
+    if encoder == "h264_nvenc":
+        options["tune"] = "hq"
+    elif encoder == "h264_amf":
+        options["quality"] = "quality"
+    elif encoder == "h264_qsv":
+        options["global_quality"] = "23"
+    return options
+
+
+def copy_stream(output, stream):
+    """Add an output stream with the codec parameters of input stream"""
+    add_from_template = getattr(output, "add_stream_from_template", None)
+    if add_from_template is not None:
+        return add_from_template(stream)
+    return output.add_stream(template=stream)  # PyAV < 13
+
+
+def packet_seconds(packet, timestamp):
+    return float(timestamp * packet.time_base)
+
+
+class PyAVEngine:
+    """Cuts clips inside the Python process instead of spawning ffmpeg"""
+
+    def __init__(self, mode="copy"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown PyAV engine mode {mode!r}")
+        self.mode = mode
+        self.inputs = {}  # (thread ident, input path) -> open container
+        self.lock = threading.Lock()
+
+    @property
+    def name(self):
+        return f"pyav-{self.mode}"
+
+    def cache_params(self):
+        """Extra clip cache key parameters: clips differ from ffmpeg's"""
+        return [self.name, av.__version__]
+
+    def open_input(self, input_path):
+        """The calling thread's container of input_path, opened on first use"""
+        key = (threading.get_ident(), input_path)
+        container = self.inputs.get(key)
+        if container is None:
+            container = av.open(input_path)
+            with self.lock:
+                self.inputs[key] = container
+        return container
+
+    def release(self, input_path=None):
+        """Close open inputs (all of them, or those of input_path)"""
+        with self.lock:
+            keys = [key for key in self.inputs if input_path in (None, key[1])]
+            containers = [self.inputs.pop(key) for key in keys]
+        for container in containers:
+            container.close()
+
+    def close(self):
+        self.release()
+
+    def cut_clip(
+        self, input_path, output_path, start_us, duration_us, encoder, threads
+    ):
+        """Write one clip; raises CalledProcessError like a failed ffmpeg
+
+        Raising the same error as the subprocess engine keeps retries, the
+        encoder circuit breaker and error reporting unchanged.
+        """
+        try:
+            container = self.open_input(input_path)
+            base_us = container.start_time or 0
+            container.seek(base_us + start_us, backward=True)
+            start = (base_us + start_us) / 1_000_000
+            end = start + duration_us / 1_000_000
+            with av.open(output_path, mode="w", format="mp4") as output:
+                if self.mode == "copy":
+                    self.copy_packets(container, output, start, end)
+                else:
+                    self.encode_frames(container, output, start, end, encoder, threads)
+        except (AV_ERROR, OSError, ValueError) as e:
+            # The container may be left mid-packet; reopen it next time
+            self.release_current(input_path)
+            raise subprocess.CalledProcessError(
+                1, [self.name, input_path, output_path], stderr=str(e).encode()
+            ) from e
+
+    def release_current(self, input_path):
+        with self.lock:
+            container = self.inputs.pop((threading.get_ident(), input_path), None)
+        if container is not None:
+            container.close()
+
+    def copy_packets(self, container, output, start, end):
+        video = container.streams.video[0]
+        audio = container.streams.audio[0] if container.streams.audio else None
+        out_video = copy_stream(output, video)
+        out_audio = copy_stream(output, audio) if audio is not None else None
+
+        offset = None  # Seconds of the first copied video packet
+        video_done = False
+        for packet in container.demux(*[s for s in (video, audio) if s is not None]):
+            if packet.dts is None:
+                continue  # Flush packet at end of input
+            if packet.stream is video:
+                if video_done:
+                    continue
+                if offset is None:
+                    offset = packet_seconds(packet, packet.dts)
+                elif packet_seconds(packet, packet.dts) >= end:
+                    # Packets are in decode order: everything before is decodable
+                    video_done = True
+                    if audio is None:
+                        break
+                    continue
+                self.mux_shifted(output, packet, out_video, offset)
+            elif offset is not None and packet.pts is not None:
+                seconds = packet_seconds(packet, packet.pts)
+                if seconds >= end:
+                    if video_done:
+                        break
+                    continue
+                if seconds >= offset:
+                    self.mux_shifted(output, packet, out_audio, offset)
+
+    def encode_frames(self, container, output, start, end, encoder, threads):
+        video = container.streams.video[0]
+        audio = container.streams.audio[0] if container.streams.audio else None
+        source = video.codec_context
+        if not source.is_open:
+            source.thread_count = threads
+
+        out_video = output.add_stream(
+            encoder,
+            rate=video.average_rate or DEFAULT_FRAME_RATE,
+            options=encoder_options(encoder),
+        )
+        out_video.width = source.width
+        out_video.height = source.height
+        out_video.pix_fmt = "yuv420p"
+        out_video.bit_rate = VIDEO_BIT_RATE
+        out_video.codec_context.thread_count = threads
+        out_video.codec_context.time_base = video.time_base
+        out_audio = copy_stream(output, audio) if audio is not None else None
+
+        first_pts = int(start / video.time_base)
+        video_done = False
+        for packet in container.demux(*[s for s in (video, audio) if s is not None]):
+            if packet.stream is video:
+                if video_done:
+                    continue
+                for frame in packet.decode():
+                    if frame.pts is None or frame.pts < first_pts:
+                        continue
+                    if frame.time >= end:
+                        video_done = True
+                        break
+                    if frame.format.name != "yuv420p":
+                        frame = frame.reformat(format="yuv420p")
+                    frame.pts -= first_pts
+                    frame.time_base = video.time_base
+                    output.mux(out_video.encode(frame))
+                if video_done and audio is None:
+                    break
+            elif packet.pts is not None:
+                seconds = packet_seconds(packet, packet.pts)
+                if seconds >= end:
+                    if video_done:
+                        break
+                    continue
+                if seconds >= start:
+                    self.mux_shifted(output, packet, out_audio, start)
+        output.mux(out_video.encode(None))
+
+    @staticmethod
+    def mux_shifted(output, packet, out_stream, offset):
+        """Mux packet into out_stream with offset seconds subtracted"""
+        shift = int(round(offset / packet.time_base))
+        packet.pts = None if packet.pts is None else packet.pts - shift
+        packet.dts -= shift
+        packet.stream = out_stream
+        output.mux(packet)
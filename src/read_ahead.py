@@ -0,0 +1,151 @@
+# read_ahead.py
+"""Read-ahead of the source bytes of upcoming clips for slow input storage
+
+Every clip's ffmpeg opens the input and seeks to its own start, so with
+several clips running at once a hard disk or network mount sees small
+reads from several places in turn and spends its time seeking. Clips are
+dispatched in source order, so the bytes the next clips will need are
+known: ReadAhead maps each clip's time range to a byte range of the input
+(from the average bitrate) and asks the kernel to load the ranges of the
+next few clips with posix_fadvise(WILLNEED), in order, in one background
+thread. The kernel then reads the input in large sequential requests and
+the clips' ffmpeg processes find their data in the page cache.
+
+    cut_video("/mnt/nas/talk.mp4", "clips", read_ahead=4)
+
+Where posix_fadvise is not available (Windows, macOS) the ranges are read
+and discarded instead, which fills the OS cache the same way.
+"""
+import logging
+import os
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEPTH = 4
+# Clips start at the keyframe before their planned start
+LEAD_US = 2_000_000
+TRAIL_US = 500_000
+# Container headers and indexes (e.g. MP4 moov) at either end of the file
+HEADER_BYTES = 4 * 1024**2
+READ_CHUNK = 1024**2
+
+
+class ByteMap:
+    """Estimates the byte range of the input holding a source time range"""
+
+    __slots__ = ("file_size", "duration_us")
+
+    def __init__(self, file_size, duration_us):
+        self.file_size = file_size
+        self.duration_us = max(1, duration_us)
+
+    @classmethod
+    def from_probe(cls, input_path, probe_data):
+        duration = float(probe_data.get("format", {}).get("duration") or 0)
+        return cls(os.path.getsize(input_path), int(duration * 1_000_000))
+
+    def offset(self, time_us):
+        time_us = min(max(0, time_us), self.duration_us)
+        return self.file_size * time_us // self.duration_us
+
+    def byte_range(self, start_us, end_us):
+        """(offset, length) of the bytes ffmpeg reads to cut start_us..end_us"""
+        first = self.offset(start_us - LEAD_US)
+        last = self.offset(end_us + TRAIL_US)
+        return first, last - first
+
+
+class ReadAhead:
+    """Loads the input bytes of the next depth clips ahead of their encodes
+
+    Clips are registered with submitted() in dispatch order and reported
+    with started() when their encode begins; the background thread keeps
+    the byte ranges of the next depth clips after the last started one
+    loading. Close with close().
+    """
+
+    def __init__(self, input_path, byte_map, depth=DEFAULT_DEPTH):
+        self.input_path = input_path
+        self.byte_map = byte_map
+        self.depth = depth
+        self.use_fadvise = hasattr(os, "posix_fadvise")
+        self.queue = deque()  # (dispatch position, window) not yet loaded
+        self.submitted_count = 0
+        self.started_count = 0
+        self.loaded_until = 0  # End of the furthest range already loaded
+        self.loaded_bytes = 0
+        self.stopped = False
+        self.condition = threading.Condition()
+        self.fd = os.open(input_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        self.thread = threading.Thread(
+            target=self.run, name="read-ahead", daemon=True
+        )
+        self.thread.start()
+
+    def submitted(self, window):
+        with self.condition:
+            self.queue.append((self.submitted_count, window))
+            self.submitted_count += 1
+            self.condition.notify()
+
+    def started(self, window):
+        with self.condition:
+            self.started_count += 1
+            self.condition.notify()
+
+    def next_window(self):
+        """Next window within depth of the running clips, None when stopped"""
+        with self.condition:
+            while not self.stopped:
+                if self.queue and self.queue[0][0] < self.started_count + self.depth:
+                    return self.queue.popleft()[1]
+                self.condition.wait()
+        return None
+
+    def run(self):
+        try:
+            size = self.byte_map.file_size
+            self.load(0, min(HEADER_BYTES, size))
+            self.load(max(0, size - HEADER_BYTES), min(HEADER_BYTES, size))
+            while True:
+                window = self.next_window()
+                if window is None:
+                    break
+                offset, length = self.byte_map.byte_range(
+                    window.start_us, window.end_us
+                )
+                # Consecutive clips overlap by the lead; load each byte once
+                end = offset + length
+                offset = max(offset, self.loaded_until)
+                if end > offset:
+                    self.load(offset, end - offset)
+                    self.loaded_until = end
+        except OSError as e:
+            logger.warning(f"Read-ahead of {self.input_path} stopped: {e}")
+
+    def load(self, offset, length):
+        if self.use_fadvise:
+            os.posix_fadvise(self.fd, offset, length, os.POSIX_FADV_WILLNEED)
+        else:
+            # Only this thread uses fd, so seek + read is safe without pread
+            os.lseek(self.fd, offset, os.SEEK_SET)
+            remaining = length
+            while remaining > 0:
+                data = os.read(self.fd, min(READ_CHUNK, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+        self.loaded_bytes += length
+
+    def close(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        self.thread.join()
+        os.close(self.fd)
+        logger.debug(
+            f"Read-ahead loaded {self.loaded_bytes / 1024**2:.1f} MB of "
+            f"{self.input_path}"
+        )
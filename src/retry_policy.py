@@ -0,0 +1,154 @@
+# retry_policy.py
+"""Per-clip retries, encoder fallback and adaptive concurrency for a job
+
+Hardware encoders fail in ways a CPU encoder does not: session limits,
+driver initialisation errors, device resets. A RetryPolicy retries a failed
+clip with exponential backoff and falls back to libx264 for that clip, an
+EncoderCircuitBreaker stops using an encoder for the rest of the job after
+repeated failures, and an AdaptiveLimiter lowers the number of concurrent
+encodes to the level that last worked when a session limit is hit.
+"""
+import logging
+import random
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_ENCODER = "libx264"
+
+# stderr fragments that mean too many encoder sessions are open at once
+SESSION_LIMIT_MARKERS = (
+    "OpenEncodeSessionEx failed",
+    "incompatible client key",
+    "out of memory",
+    "No NVENC capable devices found",
+    "Too many sessions",
+    "MFX_ERR_DEVICE_FAILED",
+    "AMF_RESOURCE",
+)
+
+
+def is_session_limit_error(stderr):
+    lowered = stderr.lower()
+    return any(marker.lower() in lowered for marker in SESSION_LIMIT_MARKERS)
+
+
+class RetryPolicy:
+    """How often and with which encoder a failed clip is retried"""
+
+    def __init__(
+        self,
+        max_attempts=3,
+        backoff_base=1.0,
+        backoff_factor=2.0,
+        max_backoff=30.0,
+        fallback_after=2,
+        fallback_encoder=FALLBACK_ENCODER,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        # Attempts made with the selected encoder before falling back
+        self.fallback_after = fallback_after
+        self.fallback_encoder = fallback_encoder
+
+    def delay(self, attempt):
+        """Seconds to wait after failed attempt number attempt (1-based)"""
+        delay = self.backoff_base * self.backoff_factor ** (attempt - 1)
+        # Jitter keeps workers that failed together from retrying together
+        return min(delay, self.max_backoff) * random.uniform(0.8, 1.2)
+
+    def encoder_for(self, encoder, attempt, circuit_breaker=None):
+        """Encoder to use for attempt number attempt of a clip"""
+        if encoder == self.fallback_encoder:
+            return encoder
+        if circuit_breaker is not None and not circuit_breaker.allow(encoder):
+            return self.fallback_encoder
+        if attempt > self.fallback_after:
+            return self.fallback_encoder
+        return encoder
+
+
+class EncoderCircuitBreaker:
+    """Disables an encoder for the rest of a job after repeated failures
+
+    Session-limit errors are not counted here; they mean the encoder works
+    but is oversubscribed, which the AdaptiveLimiter deals with.
+    """
+
+    def __init__(self, failure_threshold=3, protected=(FALLBACK_ENCODER,)):
+        self.failure_threshold = failure_threshold
+        self.protected = set(protected)
+        self.lock = threading.Lock()
+        self.consecutive_failures = {}
+        self.open = set()
+
+    def allow(self, encoder):
+        with self.lock:
+            return encoder not in self.open
+
+    def record_success(self, encoder):
+        with self.lock:
+            self.consecutive_failures[encoder] = 0
+
+    def record_failure(self, encoder):
+        if encoder in self.protected:
+            return
+        with self.lock:
+            failures = self.consecutive_failures.get(encoder, 0) + 1
+            self.consecutive_failures[encoder] = failures
+            if failures >= self.failure_threshold and encoder not in self.open:
+                self.open.add(encoder)
+                logger.warning(
+                    f"Encoder {encoder} failed {failures} times in a row, "
+                    f"using the fallback encoder for the rest of the job"
+                )
+
+
+class AdaptiveLimiter:
+    """Concurrency cap that shrinks when encoder sessions run out"""
+
+    def __init__(self, limit):
+        self.limit = max(1, limit)
+        self.active = 0
+        self.condition = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """Wait for a free slot
+
+        Yields a token recording the limit in force and the number of
+        running encodes (including this one) when the slot was taken.
+        """
+        with self.condition:
+            while self.active >= self.limit:
+                self.condition.wait()
+            self.active += 1
+            token = (self.limit, self.active)
+        try:
+            yield token
+        finally:
+            with self.condition:
+                self.active -= 1
+                self.condition.notify()
+
+    def shrink(self, token):
+        """Drop the limit below the concurrency at which a session limit hit
+
+        token is the value yielded by slot(). Encoders fail to open a session
+        when they start, so the concurrency at that moment is what was too
+        high; encodes that started before an earlier shrink are ignored.
+        """
+        acquired_limit, concurrency = token
+        with self.condition:
+            if acquired_limit > self.limit:
+                return
+            new_limit = max(1, concurrency - 1)
+            if new_limit < self.limit:
+                logger.warning(
+                    f"Encoder session limit reached, reducing concurrent clips "
+                    f"from {self.limit} to {new_limit}"
+                )
+                self.limit = new_limit
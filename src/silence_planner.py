@@ -0,0 +1,173 @@
+# silence_planner.py
+"""Silence-aware clip boundaries from the audio track
+
+The first audio track is decoded once to low-rate mono PCM and reduced to
+one RMS level (dBFS) per 20 ms in NumPy. Planned clips that are almost
+entirely silent are dropped, and the start and end of the remaining clips
+are moved into a nearby pause so clips begin and end between words rather
+than mid-word.
+"""
+import logging
+import math
+
+import numpy as np
+from clip_planner import ClipWindow
+from ffmpeg_binaries import ffmpeg_executable
+from frame_sampler import iter_raw_records
+
+logger = logging.getLogger(__name__)
+
+AUDIO_SAMPLE_RATE = 8000
+LEVEL_WINDOW_MS = 20
+# Level windows per pipe read (10 seconds of audio)
+LEVEL_BATCH = 500
+DEFAULT_SILENCE_DB = -40.0
+# Seconds searched on either side of a planned boundary
+DEFAULT_SNAP_WINDOW = 0.75
+# Share of silent levels at or above which a whole clip is dropped
+DEFAULT_MAX_SILENT_RATIO = 0.95
+# Levels within this many dB of the quietest count as equally quiet
+TIE_DB = 1.0
+
+
+def audio_command(input_path, sample_rate):
+    return [
+        *ffmpeg_executable(),
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-i",
+        input_path,
+        "-vn",
+        "-sn",
+        "-dn",
+        "-map",
+        "0:a:0",
+        "-ac",
+        "1",
+        "-ar",
+        str(sample_rate),
+        "-f",
+        "s16le",
+        "-",
+    ]
+
+
+def audio_levels(input_path, sample_rate=AUDIO_SAMPLE_RATE, window_ms=LEVEL_WINDOW_MS):
+    """dBFS of every consecutive window_ms block of the first audio track"""
+    samples_per_level = sample_rate * window_ms // 1000
+    chunks = []
+    for data in iter_raw_records(
+        audio_command(input_path, sample_rate),
+        samples_per_level * 2,
+        LEVEL_BATCH,
+        f"Audio decoding of {input_path}",
+    ):
+        samples = np.frombuffer(data, dtype="<i2").astype(np.float32)
+        samples = samples.reshape(-1, samples_per_level)
+        rms = np.sqrt(np.mean(samples * samples, axis=1))
+        chunks.append(20 * np.log10(np.maximum(rms, 1.0) / 32768))
+    if not chunks:
+        return np.empty(0, dtype=np.float32)
+    return np.concatenate(chunks).astype(np.float32)
+
+
+class SilencePlanner:
+    """Drops silent clips and snaps clip boundaries to pauses"""
+
+    def __init__(
+        self,
+        silence_db=DEFAULT_SILENCE_DB,
+        snap_window=DEFAULT_SNAP_WINDOW,
+        max_silent_ratio=DEFAULT_MAX_SILENT_RATIO,
+        window_ms=LEVEL_WINDOW_MS,
+    ):
+        self.silence_db = silence_db
+        self.snap_window = snap_window
+        self.max_silent_ratio = max_silent_ratio
+        self.window_ms = window_ms
+
+    @property
+    def level_rate(self):
+        """Levels per second"""
+        return 1000 / self.window_ms
+
+    def frame_to_level(self, frame, frame_rate):
+        return float(frame / frame_rate) * self.level_rate
+
+    def is_silent(self, levels, window):
+        first = int(self.frame_to_level(window.start_frame, window.frame_rate))
+        last = math.ceil(self.frame_to_level(window.end_frame, window.frame_rate))
+        segment = levels[first:last]
+        if not len(segment):
+            return False  # No audio there, e.g. past the end of the track
+        silent_ratio = np.count_nonzero(segment <= self.silence_db) / len(segment)
+        return silent_ratio >= self.max_silent_ratio
+
+    def snap_frame(self, levels, frame, frame_rate, lower, upper):
+        """Move frame into the nearest pause within snap_window, inside [lower, upper]
+
+        The boundary is left alone if nothing nearby is quieter than
+        silence_db.
+        """
+        center = self.frame_to_level(frame, frame_rate)
+        reach = self.snap_window * self.level_rate
+        first = max(
+            0, int(center - reach), math.ceil(self.frame_to_level(lower, frame_rate))
+        )
+        last = min(
+            len(levels),
+            int(center + reach) + 1,
+            int(self.frame_to_level(upper, frame_rate)) + 1,
+        )
+        if first >= last:
+            return frame
+
+        candidates = levels[first:last]
+        if candidates.min() > self.silence_db:
+            return frame
+        quiet = np.flatnonzero(candidates <= candidates.min() + TIE_DB) + first
+        best = quiet[np.argmin(np.abs(quiet + 0.5 - center))]
+        snapped = round((best + 0.5) / self.level_rate * frame_rate)
+        return min(max(snapped, lower), upper)
+
+    def plan_windows(self, input_path, windows):
+        """Return the adjusted list of windows, without silent ones
+
+        Window indexes are kept, so clip numbers still match the plan.
+        """
+        levels = audio_levels(input_path, window_ms=self.window_ms)
+        if not len(levels):
+            logger.warning(f"No audio in {input_path}, clip boundaries unchanged")
+            return list(windows)
+
+        planned = []
+        dropped = 0
+        previous_end = 0
+        for window in windows:
+            if self.is_silent(levels, window):
+                dropped += 1
+                continue
+            rate = window.frame_rate
+            start = self.snap_frame(
+                levels,
+                window.start_frame,
+                rate,
+                max(previous_end, window.start_frame - window.frame_count // 2),
+                window.end_frame - 1,
+            )
+            end = self.snap_frame(
+                levels,
+                window.end_frame,
+                rate,
+                max(start + 1, window.end_frame - window.frame_count // 2),
+                window.end_frame + window.frame_count // 2,
+            )
+            planned.append(ClipWindow(window.index, start, end - start, rate))
+            previous_end = end
+
+        logger.info(
+            f"Silence planning kept {len(planned)} clips, "
+            f"dropped {dropped} silent clips"
+        )
+        return planned
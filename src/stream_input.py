@@ -0,0 +1,328 @@
+# stream_input.py
+"""Single-pass cutting of non-seekable inputs
+
+Stdin pipes, named pipes and local HLS playlists cannot be reopened and
+seeked for every clip, so they are cut by one ffmpeg process that reads the
+input once: frames in skip windows are dropped with select/aselect, and the
+remaining frames are split into clips by the segment muxer with a keyframe
+forced at every clip boundary. For VOD playlists, segments that fall
+entirely inside skip windows are removed from a temporary copy of the
+playlist first, so they are never read or decoded.
+
+The clip count is not known up front, so clips are numbered with the
+layout's fixed padding (three digits by default) and cannot be sharded.
+"""
+import csv
+import logging
+import os
+import re
+import stat
+import subprocess
+import sys
+import tempfile
+from contextlib import nullcontext
+from fractions import Fraction
+
+from clip_layout import DEFAULT_LAYOUT, MIN_DIGITS, ClipIndexWriter
+from clip_planner import DEFAULT_MIN_LAST_CLIP, ClipWindow
+from cutting_video import encoder_args, run_ffmpeg
+from ffmpeg_binaries import ffmpeg_executable
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_LIST_NAME = "clips.csv"
+# URI="..." attributes of tags such as EXT-X-MAP and EXT-X-KEY
+URI_ATTRIBUTE = re.compile(r'URI="([^"]*)"')
+US_PER_SECOND = 1_000_000
+
+
+class StreamCancelled(Exception):
+    """Raised from the progress poll to stop ffmpeg when a job is cancelled"""
+
+
+def is_streaming_input(input_path):
+    """True for inputs that must be read in a single forward pass"""
+    if input_path in ("-", "pipe:", "pipe:0"):
+        return True
+    if input_path.lower().endswith(".m3u8"):
+        return True
+    try:
+        return stat.S_ISFIFO(os.stat(input_path).st_mode)
+    except OSError:
+        return False
+
+
+def window_overlaps(start, end, clip_duration, skip_duration):
+    """True if [start, end) seconds overlaps any planned clip window"""
+    period = clip_duration + skip_duration
+    first = int(start // period)
+    # Only the window containing start and the one after can overlap
+    for index in (first, first + 1):
+        window_start = index * period
+        if window_start < end and window_start + clip_duration > start:
+            return True
+    return False
+
+
+def absolute_uri(uri, base_folder):
+    """uri with a relative path resolved against base_folder"""
+    if "://" in uri or uri.startswith("data:") or os.path.isabs(uri):
+        return uri
+    return os.path.normpath(os.path.join(base_folder, uri))
+
+
+def prune_playlist(playlist_path, clip_duration, skip_duration, temp_folder):
+    """Write a copy of a VOD media playlist without skip-only segments
+
+    Returns the path of the pruned playlist, a unique temporary file in
+    temp_folder that the caller deletes, or None when the playlist is a live
+    or master playlist that has to be read as is or nothing can be pruned.
+    Relative segment, map and key URIs are made absolute in the copy so the
+    input folder may be read-only.
+    """
+    with open(playlist_path, "r", encoding="utf-8") as playlist_file:
+        lines = playlist_file.read().splitlines()
+    base_folder = os.path.dirname(os.path.abspath(playlist_path))
+
+    def resolve(match):
+        return f'URI="{absolute_uri(match.group(1), base_folder)}"'
+
+    lines = [
+        URI_ATTRIBUTE.sub(resolve, line) if line.startswith("#") else line
+        for line in lines
+    ]
+
+    if "#EXT-X-ENDLIST" not in lines or any(
+        line.startswith("#EXT-X-STREAM-INF") for line in lines
+    ):
+        return None
+
+    clip_duration = Fraction(str(clip_duration))
+    skip_duration = Fraction(str(skip_duration))
+    output_lines = []
+    segment_tags = []
+    position = Fraction(0)
+    kept = dropped = 0
+
+    for line in lines:
+        if line.startswith("#EXTINF:"):
+            segment_tags.append(line)
+        elif segment_tags and line and not line.startswith("#"):
+            # A segment URI closes the tags collected since the previous one
+            extinf = next(tag for tag in segment_tags if tag.startswith("#EXTINF:"))
+            duration = Fraction(extinf[len("#EXTINF:") :].split(",")[0].strip())
+            if window_overlaps(
+                position, position + duration, clip_duration, skip_duration
+            ):
+                output_lines.extend(segment_tags)
+                output_lines.append(absolute_uri(line, base_folder))
+                kept += 1
+            else:
+                dropped += 1
+            position += duration
+            segment_tags = []
+        elif segment_tags and line.startswith("#EXT-X-ENDLIST"):
+            output_lines.extend(segment_tags)
+            output_lines.append(line)
+            segment_tags = []
+        elif segment_tags:
+            # Per-segment tags (byte ranges, discontinuities) travel with it
+            segment_tags.append(line)
+        else:
+            output_lines.append(line)
+
+    if not dropped:
+        return None
+
+    fd, pruned_path = tempfile.mkstemp(
+        prefix=".pruned-", suffix=".m3u8", dir=temp_folder
+    )
+    with os.fdopen(fd, "w", encoding="utf-8") as pruned_file:
+        pruned_file.write("\n".join(output_lines) + "\n")
+    logger.info(f"Skipping {dropped} of {kept + dropped} playlist segments")
+    return pruned_path
+
+
+def read_segment_list(list_path):
+    """Return [(filename, start, end)] for the clips finished so far"""
+    try:
+        with open(list_path, "r", newline="", encoding="utf-8") as list_file:
+            return [
+                (row[0], float(row[1]), float(row[2]))
+                for row in csv.reader(list_file)
+                if len(row) >= 3
+            ]
+    except (OSError, ValueError):
+        return []
+
+
+def segment_window(index, start, end, skip_duration):
+    """ClipWindow of segment number index in source microseconds
+
+    Segment times are on the output timeline, where the skipped frames are
+    already gone, so every earlier skip window is added back.
+    """
+    start_us = round((start + (index - 1) * skip_duration) * US_PER_SECOND)
+    return ClipWindow(
+        index, start_us, round((end - start) * US_PER_SECOND), US_PER_SECOND
+    )
+
+
+def cut_stream(
+    input_path,
+    output_folder,
+    clip_duration=3,
+    skip_duration=10,
+    encoder="libx264",
+    min_last_clip=DEFAULT_MIN_LAST_CLIP,
+    progress_callback=None,
+    progress_tracker=None,
+    clip_slots=None,
+    clip_callback=None,
+    cancel_event=None,
+    layout=None,
+    clip_index=True,
+):
+    """Cut a non-seekable input into clips in a single forward pass
+
+    clip_slots, clip_callback, cancel_event, layout and clip_index work as
+    for cutting_video.cut_video, except that layout cannot shard the clips.
+    The whole pass holds one clip slot.
+    """
+    layout = layout or DEFAULT_LAYOUT
+    if layout.shard_size or layout.shard_by_hour:
+        raise ValueError("Clips of a streaming input cannot be sharded")
+    os.makedirs(output_folder, exist_ok=True)
+
+    period = clip_duration + skip_duration
+    keep = f"lt(mod(t,{period}),{clip_duration})"
+    stdin = subprocess.DEVNULL
+    source = input_path
+    pruned_path = None
+
+    if input_path in ("-", "pipe:", "pipe:0"):
+        # Hand our stdin straight to ffmpeg, no copy through Python
+        stdin = sys.stdin.buffer
+        source = "pipe:0"
+    elif input_path.lower().endswith(".m3u8") and skip_duration > 0:
+        pruned_path = prune_playlist(
+            input_path, clip_duration, skip_duration, output_folder
+        )
+        source = pruned_path or input_path
+
+    list_path = os.path.join(output_folder, SEGMENT_LIST_NAME)
+    # The HLS demuxer marks timestamps discontinuous, so without -copyts
+    # ffmpeg closes gaps over -dts_delta_threshold (10s) left by pruned
+    # segments and the select windows would drift from the source timeline
+    copyts = ["-copyts"] if pruned_path else []
+    cmd = [
+        *ffmpeg_executable(),
+        *copyts,
+        "-i",
+        source,
+        "-map",
+        "0:v:0",
+        "-map",
+        "0:a:0?",
+        # Timestamps are kept relative to the first frame so pruned playlist
+        # segments leave gaps in t and the select windows stay aligned
+        "-vf",
+        f"setpts=PTS-STARTPTS,select='{keep}',setpts=N/FRAME_RATE/TB",
+        "-af",
+        f"asetpts=PTS-STARTPTS,aselect='{keep}',asetpts=N/SR/TB",
+        *encoder_args(encoder),
+        "-force_key_frames",
+        f"expr:gte(t,n_forced*{clip_duration})",
+        "-f",
+        "segment",
+        "-segment_time",
+        str(clip_duration),
+        "-reset_timestamps",
+        "1",
+        "-segment_start_number",
+        "1",
+        "-segment_list",
+        list_path,
+        "-segment_list_type",
+        "csv",
+        "-y",
+        "-loglevel",
+        "error",
+        os.path.join(
+            output_folder, f"{layout.prefix}_%0{layout.digits or MIN_DIGITS}d.mp4"
+        ),
+    ]
+
+    min_clip = min(min_last_clip, clip_duration)
+    index_writer = ClipIndexWriter(output_folder) if clip_index else None
+    reported = []
+
+    def report_progress(segments, final=False):
+        if cancel_event is not None and cancel_event.is_set():
+            raise StreamCancelled()
+        for filename, start, end in segments[len(reported) :]:
+            if not final and end - start < min_clip:
+                # Only the last clip can be this short; wait to see if it stays
+                break
+            reported.append(filename)
+            output_path = os.path.join(output_folder, filename)
+            try:
+                size = os.path.getsize(output_path)
+            except OSError:
+                size = 0
+            window = segment_window(len(reported), start, end, skip_duration)
+            if index_writer is not None:
+                index_writer.submitted(window.index)
+                index_writer.finished(
+                    window, output_path, True, size, encoded_with=(encoder, None)
+                )
+            if clip_callback:
+                clip_callback(window, output_path, True, None, size)
+            if progress_tracker:
+                progress_tracker.set_total(len(reported))
+                progress_tracker.clip_started()
+                progress_tracker.clip_finished(True, size)
+            if progress_callback:
+                progress_callback(
+                    len(reported), len(reported), f"Created clip {filename}"
+                )
+
+    try:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+        with clip_slots if clip_slots is not None else nullcontext():
+            run_ffmpeg(
+                cmd,
+                stdin=stdin,
+                poll=lambda: report_progress(read_segment_list(list_path)),
+            )
+
+        # The segment muxer always closes a final clip; drop it if it is a sliver
+        segments = read_segment_list(list_path)
+        if len(segments) > 1:
+            filename, start, end = segments[-1]
+            if end - start < min_clip:
+                os.remove(os.path.join(output_folder, filename))
+                logger.info(f"Dropped short last clip {filename}")
+                segments.pop()
+        report_progress(segments, final=True)
+    except StreamCancelled:
+        logger.info("Job cancelled")
+        return False
+    except subprocess.CalledProcessError as e:
+        logger.error(
+            f"Error cutting stream {input_path}: {e.stderr.decode(errors='replace')}"
+        )
+        return False
+    finally:
+        if pruned_path:
+            os.remove(pruned_path)
+        if index_writer is not None:
+            index_writer.close()
+
+    message = f"Completed processing {len(segments)} clips"
+    if progress_tracker:
+        progress_tracker.finish(message)
+    if progress_callback:
+        progress_callback(len(segments), len(segments), message)
+    return bool(segments)
@@ -0,0 +1,172 @@
+# tail_mode.py
+"""Cut clips from a recording that is still being written
+
+The file is followed while it grows: clips are planned incrementally as new
+media appears and each one is encoded as soon as its source range is on
+disk. When the file stops growing the remaining clips, including the final
+short one, are emitted. Works with containers that can be read while being
+written (MPEG-TS, fragmented MP4, Matroska); a regular MP4 only becomes
+readable once its recorder finalises it.
+"""
+import logging
+import math
+import os
+import subprocess
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from clip_planner import (DEFAULT_MIN_LAST_CLIP, ClipPlan, get_exact_duration,
+                          get_frame_rate, round_fraction)
+from cutting_video import (PENDING_PER_WORKER, clip_task, probe_video,
+                           run_clip_task)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 2.0
+# The file is considered complete after it has not grown for this long
+DEFAULT_IDLE_TIMEOUT = 30.0
+# Media this close to the current end of the file is not cut yet, since the
+# recorder may not have flushed every stream up to that point
+DEFAULT_SAFETY_MARGIN = 2.0
+
+
+def probe_available_duration(input_path):
+    """Return (probe_data, duration) for a growing file, or (None, None)"""
+    try:
+        probe_data = probe_video(input_path)
+        return probe_data, get_exact_duration(probe_data)
+    except (subprocess.CalledProcessError, ValueError, KeyError):
+        # Header not written yet, or no duration known so far
+        return None, None
+
+
+def follow_and_cut(
+    input_path,
+    output_folder,
+    max_workers=4,
+    clip_duration=3,
+    skip_duration=10,
+    encoder="h264_nvenc",
+    min_last_clip=DEFAULT_MIN_LAST_CLIP,
+    poll_interval=DEFAULT_POLL_INTERVAL,
+    idle_timeout=DEFAULT_IDLE_TIMEOUT,
+    safety_margin=DEFAULT_SAFETY_MARGIN,
+    progress_callback=None,
+    progress_tracker=None,
+    stop_event=None,
+):
+    """Follow a growing recording and cut clips as soon as they are available
+
+    Returns True if every planned clip was created. Setting stop_event
+    treats the file as finished right away instead of waiting idle_timeout.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+
+    plan = None
+    margin_frames = 0
+    next_index = 1
+    planned_clips = 0
+    completed_clips = 0
+    successful_clips = 0
+    last_size = -1
+    last_growth = time.monotonic()
+    pending = set()
+    max_pending = max_workers * PENDING_PER_WORKER
+
+    def collect(futures):
+        nonlocal completed_clips, successful_clips
+        for future in futures:
+            completed_clips += 1
+            if future.result():
+                successful_clips += 1
+            if progress_callback:
+                progress_callback(
+                    completed_clips,
+                    planned_clips,
+                    f"Processing clip {completed_clips}/{planned_clips}",
+                )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+        def submit(window):
+            nonlocal planned_clips, pending
+            while len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+            planned_clips += 1
+            if progress_tracker:
+                progress_tracker.set_total(planned_clips)
+            task = clip_task(input_path, output_folder, window, encoder)
+            pending.add(executor.submit(run_clip_task, task, progress_tracker))
+
+        try:
+            while True:
+                now = time.monotonic()
+                try:
+                    size = os.path.getsize(input_path)
+                except OSError:
+                    size = last_size  # Recorder may be renaming/rotating
+                grew = size != last_size
+                if grew:
+                    last_size = size
+                    last_growth = now
+
+                finished = now - last_growth >= idle_timeout or (
+                    stop_event is not None and stop_event.is_set()
+                )
+
+                if grew or finished:
+                    probe_data, duration = probe_available_duration(input_path)
+                    if plan is None and probe_data is not None:
+                        plan = ClipPlan(
+                            get_frame_rate(probe_data),
+                            clip_duration,
+                            skip_duration,
+                            min_last_clip=min_last_clip,
+                        )
+                        margin_frames = plan.seconds_to_frames(safety_margin)
+                        logger.info(f"Following {os.path.basename(input_path)}")
+
+                    if plan is not None and duration is not None:
+                        if finished:
+                            # Plan the tail of the file against its final length
+                            total_frames = round_fraction(duration * plan.frame_rate)
+                            window = plan.window(next_index, total_frames)
+                            while window is not None:
+                                submit(window)
+                                next_index += 1
+                                window = plan.window(next_index, total_frames)
+                        else:
+                            ready_frames = (
+                                math.floor(duration * plan.frame_rate) - margin_frames
+                            )
+                            window = plan.window(next_index)
+                            while window.end_frame <= ready_frames:
+                                submit(window)
+                                next_index += 1
+                                window = plan.window(next_index)
+
+                done = {future for future in pending if future.done()}
+                pending -= done
+                collect(done)
+
+                if finished:
+                    if plan is None:
+                        logger.error(f"Could not read {input_path} before it stopped")
+                    break
+                time.sleep(poll_interval)
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    message = f"Completed processing {successful_clips} clips"
+    if progress_tracker:
+        progress_tracker.finish(message)
+    if progress_callback:
+        progress_callback(planned_clips, planned_clips, message)
+    return plan is not None and successful_clips == planned_clips
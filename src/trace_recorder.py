@@ -0,0 +1,223 @@
+# trace_recorder.py
+"""Timeline of a cutting job in Chrome Trace Event format
+
+    recorder = TraceRecorder("trace.json")
+    try:
+        cut_video(input_path, output_folder, trace=recorder)
+    finally:
+        recorder.close()
+
+Open the file in https://ui.perfetto.dev or chrome://tracing. Every thread
+that does work gets its own track, so the job thread and each worker slot
+show their probe, plan, spawn, encode and finalize spans side by side; the
+time a clip waited for a free worker is an async "queued" span. Counter
+tracks for CPU, memory and disk throughput are sampled with psutil in a
+background thread.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_INTERVAL = 0.25
+
+
+def trace_span(trace, name, category, **args):
+    """trace.span(...) if a recorder is given, else a no-op context"""
+    if trace is None:
+        return nullcontext()
+    return trace.span(name, category, **args)
+
+
+def disk_bytes():
+    """(read, written) bytes of all disks, or None where psutil cannot tell"""
+    try:
+        counters = psutil.disk_io_counters()
+    except (psutil.Error, OSError):
+        return None
+    if counters is None:
+        return None
+    return counters.read_bytes, counters.write_bytes
+
+
+class TraceRecorder:
+    """Collects trace events in memory and writes them on close()
+
+    Timestamps are microseconds since the recorder was created. All methods
+    are thread-safe.
+    """
+
+    def __init__(self, path, sample_interval=DEFAULT_SAMPLE_INTERVAL):
+        self.path = path
+        self.sample_interval = sample_interval
+        self.pid = os.getpid()
+        self.origin = time.perf_counter()
+        self.events = []
+        self.tracks = {}  # Thread ident -> trace tid
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.events.append(
+            {
+                "ph": "M",
+                "pid": self.pid,
+                "tid": 0,
+                "name": "process_name",
+                "args": {"name": "video cutter"},
+            }
+        )
+        self.sampler = None
+        if sample_interval:
+            self.sampler = threading.Thread(
+                target=self.sample_counters, name="trace-sampler", daemon=True
+            )
+            self.sampler.start()
+
+    def now(self):
+        return (time.perf_counter() - self.origin) * 1_000_000
+
+    def track(self):
+        """tid of the calling thread, named after the thread on first use"""
+        thread = threading.current_thread()
+        with self.lock:
+            tid = self.tracks.get(thread.ident)
+            if tid is None:
+                tid = self.tracks[thread.ident] = len(self.tracks) + 1
+                for name, args in (
+                    ("thread_name", {"name": thread.name}),
+                    ("thread_sort_index", {"sort_index": tid}),
+                ):
+                    self.events.append(
+                        {
+                            "ph": "M",
+                            "pid": self.pid,
+                            "tid": tid,
+                            "name": name,
+                            "args": args,
+                        }
+                    )
+        return tid
+
+    def add(self, event):
+        event["pid"] = self.pid
+        with self.lock:
+            self.events.append(event)
+
+    def complete(self, name, start, end=None, category="job", **args):
+        """Span from start to end (now by default) on the calling thread"""
+        if end is None:
+            end = self.now()
+        self.add(
+            {
+                "ph": "X",
+                "name": name,
+                "cat": category,
+                "ts": start,
+                "dur": max(0.0, end - start),
+                "tid": self.track(),
+                "args": args,
+            }
+        )
+
+    @contextmanager
+    def span(self, name, category="job", **args):
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.complete(name, start, category=category, **args)
+
+    def async_begin(self, name, span_id, category="queue", **args):
+        """Start a span that may overlap others, e.g. a clip waiting in line"""
+        self.add(
+            {
+                "ph": "b",
+                "name": name,
+                "cat": category,
+                "id": span_id,
+                "ts": self.now(),
+                "tid": 0,
+                "args": args,
+            }
+        )
+
+    def async_end(self, name, span_id, category="queue"):
+        self.add(
+            {
+                "ph": "e",
+                "name": name,
+                "cat": category,
+                "id": span_id,
+                "ts": self.now(),
+                "tid": 0,
+            }
+        )
+
+    def counter(self, name, **values):
+        self.add({"ph": "C", "name": name, "ts": self.now(), "tid": 0, "args": values})
+
+    def sample_counters(self):
+        """Sampler thread: CPU, memory and disk throughput counters"""
+        process = psutil.Process()
+        process.cpu_percent(None)
+        psutil.cpu_percent(None)
+        last_disk = disk_bytes()
+        last_time = time.perf_counter()
+        while not self.stopped.wait(self.sample_interval):
+            try:
+                ffmpeg_rss = 0
+                for child in process.children(recursive=True):
+                    try:
+                        ffmpeg_rss += child.memory_info().rss
+                    except psutil.Error:
+                        pass  # Exited since children() was called
+                self.counter(
+                    "CPU %",
+                    system=psutil.cpu_percent(None),
+                    cutter=process.cpu_percent(None),
+                )
+                self.counter(
+                    "RSS MB",
+                    cutter=round(process.memory_info().rss / 1024**2, 1),
+                    children=round(ffmpeg_rss / 1024**2, 1),
+                )
+            except psutil.Error as e:
+                logger.debug(f"Trace sampling failed: {e}")
+
+            disk = disk_bytes()
+            now = time.perf_counter()
+            if disk is not None and last_disk is not None and now > last_time:
+                elapsed = now - last_time
+                self.counter(
+                    "Disk MB/s",
+                    read=round((disk[0] - last_disk[0]) / elapsed / 1024**2, 2),
+                    write=round((disk[1] - last_disk[1]) / elapsed / 1024**2, 2),
+                )
+            last_disk, last_time = disk, now
+
+    def close(self):
+        """Stop sampling and write the trace file; returns its path"""
+        self.stopped.set()
+        if self.sampler is not None:
+            self.sampler.join()
+            self.sampler = None
+        with self.lock:
+            events = list(self.events)
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as trace_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+        logger.info(f"Trace with {len(events)} events written to {self.path}")
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,430 @@
+# watch_folder.py
+"""Watch-folder ingest daemon
+
+Watches one or more capture folders and cuts every finished recording that
+lands in them, writing clips to a mirrored folder tree. Run with:
+
+    python watch_folder.py --config watch_config.json
+
+Example config:
+
+    {
+        "state_file": "watch_state.json",
+        "max_concurrent_clips": 8,
+        "max_concurrent_files": 2,
+        "settle_time": 10,
+        "folders": [
+            {
+                "input": "/captures/cam1",
+                "output": "/clips/cam1",
+                "recursive": true,
+                "clip_duration": 3,
+                "skip_duration": 10,
+                "encoder": "libx264",
+                "max_workers": 4
+            }
+        ]
+    }
+"""
+import argparse
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import signal
+import struct
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cpu_allocator import CpuAllocator
+from cutting_video import cut_video, input_fingerprint
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".avi", ".mov", ".wmv", ".ts")
+
+FOLDER_DEFAULTS = {
+    "recursive": True,
+    "clip_duration": 3,
+    "skip_duration": 10,
+    "encoder": "libx264",
+    "max_workers": 4,
+    "extensions": list(VIDEO_EXTENSIONS),
+}
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def load_config(config_path):
+    """Load the daemon config and fill in per-folder defaults"""
+    with open(config_path, "r", encoding="utf-8") as config_file:
+        config = json.load(config_file)
+
+    config.setdefault("state_file", "watch_state.json")
+    config.setdefault("max_concurrent_clips", 4)
+    config.setdefault("max_concurrent_files", 2)
+    config.setdefault("settle_time", 10.0)
+    config.setdefault("poll_interval", 2.0)
+    config.setdefault("use_inotify", True)
+
+    folders = []
+    for folder in config.get("folders", []):
+        if "input" not in folder or "output" not in folder:
+            raise ValueError("Each watched folder needs 'input' and 'output'")
+        settings = dict(FOLDER_DEFAULTS, **folder)
+        settings["input"] = os.path.abspath(settings["input"])
+        settings["output"] = os.path.abspath(settings["output"])
+        settings["extensions"] = tuple(ext.lower() for ext in settings["extensions"])
+        folders.append(settings)
+    if not folders:
+        raise ValueError("No folders configured to watch")
+    config["folders"] = folders
+    return config
+
+
+class ProcessedState:
+    """Persistent record of which input files have already been cut
+
+    Files are identified by path plus size and mtime, so a file that is
+    replaced by a new recording with the same name is processed again. When
+    only the mtime changed (the file was touched or copied back in place),
+    the sampled content fingerprint decides and the new mtime is recorded.
+    Files whose job raised an error are retried once they change, or after
+    a restart.
+    """
+
+    FINAL_STATUSES = ("done", "incomplete")
+
+    def __init__(self, state_path):
+        self.state_path = state_path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(state_path):
+            try:
+                with open(state_path, "r", encoding="utf-8") as state_file:
+                    self.entries = json.load(state_file)
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to load watch state, starting fresh: {e}")
+        # Failures of an earlier run are retried, those of this run are not
+        self.entries = {
+            path: entry
+            for path, entry in self.entries.items()
+            if entry.get("status") != "failed"
+        }
+
+    @staticmethod
+    def identity(path):
+        stat = os.stat(path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def is_processed(self, path):
+        """True if path needs no job: already cut, or failed and unchanged"""
+        with self.lock:
+            entry = self.entries.get(path)
+        if not entry:
+            return False
+        status = entry.get("status")
+        if status not in self.FINAL_STATUSES and status != "failed":
+            return False
+        try:
+            identity = self.identity(path)
+        except OSError:
+            return True  # File is gone, nothing to do
+        if all(entry.get(key) == value for key, value in identity.items()):
+            return True
+        if status == "failed":
+            return False
+        if entry.get("size") != identity["size"] or "fingerprint" not in entry:
+            return False
+        try:
+            if entry["fingerprint"] != input_fingerprint(path):
+                return False
+        except (OSError, subprocess.CalledProcessError):
+            return False
+        # Same content: remember the new mtime so the next poll skips hashing
+        with self.lock:
+            entry["mtime_ns"] = identity["mtime_ns"]
+            self._save()
+        return True
+
+    def mark(self, path, status, output_dir, fingerprint=None):
+        try:
+            entry = self.identity(path)
+        except OSError:
+            entry = {}
+        entry.update({"status": status, "output": output_dir, "time": time.time()})
+        if fingerprint is not None:
+            entry["fingerprint"] = fingerprint
+        with self.lock:
+            self.entries[path] = entry
+            self._save()
+
+    def _save(self):
+        # Write then rename so a crash never leaves a half-written state file
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as state_file:
+            json.dump(self.entries, state_file, indent=1)
+        os.replace(temp_path, self.state_path)
+
+
+class PollingWatcher:
+    """Portable watcher that rescans the folders on every poll"""
+
+    def __init__(self, folders):
+        self.folders = folders
+
+    def poll(self, timeout):
+        time.sleep(timeout)
+        return list(self.scan())
+
+    def scan(self):
+        for folder in self.folders:
+            yield from iter_videos(folder)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(PollingWatcher):
+    """Linux watcher that reports files as soon as they are closed or moved in"""
+
+    def __init__(self, folders):
+        super().__init__(folders)
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}  # wd -> (directory, folder settings)
+        for folder in folders:
+            self.add_tree(folder["input"], folder)
+
+    def add_watch(self, directory, folder):
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+        if wd < 0:
+            error = os.strerror(ctypes.get_errno())
+            logger.error(f"Cannot watch {directory}: {error}")
+            return
+        self.watches[wd] = (directory, folder)
+
+    def add_tree(self, directory, folder):
+        self.add_watch(directory, folder)
+        if folder["recursive"]:
+            for root, dirs, _ in os.walk(directory):
+                for name in dirs:
+                    self.add_watch(os.path.join(root, name), folder)
+
+    def poll(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            wd, mask, _, name_len = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset : offset + name_len].rstrip(b"\0")
+            offset += name_len
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost, fall back to a full rescan
+                paths.extend(self.scan())
+                continue
+            if wd not in self.watches or not name:
+                continue
+
+            directory, folder = self.watches[wd]
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if folder["recursive"] and mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(path, folder)
+                    paths.extend(iter_videos(folder, path))
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                paths.append((path, folder))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+def iter_videos(folder, directory=None):
+    """Yield (path, folder) for every video file under a watched folder"""
+    directory = directory or folder["input"]
+    for root, dirs, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(folder["extensions"]):
+                yield os.path.join(root, name), folder
+        if not folder["recursive"]:
+            dirs[:] = []
+
+
+def mirrored_output_dir(path, folder):
+    """Output folder for path, mirroring its place under the watched folder
+
+    The folder is named after the file including its extension (talk.mp4
+    -> talk_mp4), so talk.mp4 and talk.mkv in one folder do not share it.
+    """
+    relative_dir = os.path.relpath(os.path.dirname(path), folder["input"])
+    stem, extension = os.path.splitext(os.path.basename(path))
+    name = f"{stem}_{extension[1:]}" if extension else stem
+    return os.path.normpath(os.path.join(folder["output"], relative_dir, name))
+
+
+class WatchFolderDaemon:
+    """Feeds finished recordings from watched folders into cut_video"""
+
+    def __init__(self, config):
+        self.config = config
+        self.state = ProcessedState(config["state_file"])
+        self.stop_event = threading.Event()
+        # Shared encoder budget across every file being cut at once
+        self.clip_slots = threading.BoundedSemaphore(config["max_concurrent_clips"])
+        self.cpu_allocator = CpuAllocator(config["max_concurrent_clips"])
+        self.executor = ThreadPoolExecutor(
+            max_workers=config["max_concurrent_files"]
+        )
+        self.candidates = {}  # path -> (folder, last identity, stable since)
+        self.active = set()
+        self.active_lock = threading.Lock()
+        self.watcher = self.create_watcher()
+
+    def create_watcher(self):
+        if self.config["use_inotify"] and sys.platform.startswith("linux"):
+            try:
+                watcher = InotifyWatcher(self.config["folders"])
+                logger.info("Watching folders with inotify")
+                return watcher
+            except (OSError, AttributeError) as e:
+                logger.info(f"inotify unavailable ({e}), falling back to polling")
+        return PollingWatcher(self.config["folders"])
+
+    def add_candidate(self, path, folder):
+        with self.active_lock:
+            if path in self.active:
+                return
+        if path not in self.candidates and not self.state.is_processed(path):
+            self.candidates[path] = (folder, None, time.monotonic())
+
+    def check_candidates(self):
+        """Submit candidates whose size and mtime have stopped changing"""
+        now = time.monotonic()
+        for path, candidate in list(self.candidates.items()):
+            folder, last_identity, stable_since = candidate
+            try:
+                identity = ProcessedState.identity(path)
+            except OSError:
+                del self.candidates[path]
+                continue
+
+            if identity != last_identity:
+                self.candidates[path] = (folder, identity, now)
+                continue
+            if now - stable_since < self.config["settle_time"]:
+                continue
+
+            del self.candidates[path]
+            if self.state.is_processed(path):
+                continue
+            with self.active_lock:
+                self.active.add(path)
+            self.executor.submit(self.process_file, path, folder)
+
+    def process_file(self, path, folder):
+        if self.stop_event.is_set():
+            # Queued when the daemon was stopped; picked up again on restart
+            with self.active_lock:
+                self.active.discard(path)
+            return
+        output_dir = mirrored_output_dir(path, folder)
+        logger.info(f"Cutting {path} -> {output_dir}")
+        fingerprint = None
+        try:
+            fingerprint = input_fingerprint(path)
+            success = cut_video(
+                path,
+                output_dir,
+                max_workers=folder["max_workers"],
+                clip_duration=folder["clip_duration"],
+                skip_duration=folder["skip_duration"],
+                encoder=folder["encoder"],
+                clip_slots=self.clip_slots,
+                cpu_allocator=self.cpu_allocator,
+                cleanup=False,
+                fingerprint=fingerprint,
+                cancel_event=self.stop_event,
+            )
+            if success:
+                status = "done"
+            elif self.stop_event.is_set():
+                # Not a final status, so the file is cut again on restart
+                status = "cancelled"
+            else:
+                status = "incomplete"
+            logger.info(f"Finished {path}: {status}")
+        except Exception as e:
+            status = "failed"
+            logger.error(f"Failed to cut {path}: {e}")
+        finally:
+            with self.active_lock:
+                self.active.discard(path)
+
+        self.state.mark(path, status, output_dir, fingerprint)
+
+    def run(self):
+        # Pick up files that arrived while the daemon was not running
+        for path, folder in self.watcher.scan():
+            self.add_candidate(path, folder)
+
+        poll_interval = self.config["poll_interval"]
+        try:
+            while not self.stop_event.is_set():
+                for path, folder in self.watcher.poll(poll_interval):
+                    self.add_candidate(path, folder)
+                self.check_candidates()
+        finally:
+            self.watcher.close()
+            self.executor.shutdown(wait=True)
+
+    def stop(self):
+        """Stop watching; running jobs skip their clips that have not started"""
+        self.stop_event.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch folders and cut new videos")
+    parser.add_argument("--config", required=True, help="Path to the JSON config")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    daemon = WatchFolderDaemon(load_config(args.config))
+
+    signal.signal(signal.SIGINT, lambda x, y: daemon.stop())
+    signal.signal(signal.SIGTERM, lambda x, y: daemon.stop())
+
+    daemon.run()
+
+
+if __name__ == "__main__":
+    main()
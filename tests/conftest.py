@@ -0,0 +1,7 @@
+# conftest.py
+"""Make the flat modules in src/ importable the way the app imports them"""
+import os
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
@@ -0,0 +1,105 @@
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from clip_archive import SCRATCH_FOLDER, ClipArchive, read_archived_clip
+from clip_layout import ClipIndexWriter
+from clip_planner import ClipWindow
+
+
+def scratch_clip(archive, index, size):
+    os.makedirs(archive.scratch_folder, exist_ok=True)
+    path = os.path.join(archive.scratch_folder, f"clip_{index:03d}.mp4")
+    with open(path, "wb") as clip_file:
+        clip_file.write(bytes([index]) * size)
+    return path
+
+
+def read_at(folder, archive_name, offset, size):
+    with open(os.path.join(folder, archive_name), "rb") as archive_file:
+        archive_file.seek(offset)
+        return archive_file.read(size)
+
+
+@pytest.mark.parametrize("archive_format", ["tar", "zip"])
+def test_offsets_point_at_the_clip_data(tmp_path, archive_format):
+    archive = ClipArchive(str(tmp_path), archive_format)
+    sizes = {1: 700, 2: 512, 3: 1}
+    added = {}
+    for index, size in sizes.items():
+        path = scratch_clip(archive, index, size)
+        added[index] = archive.add(path)
+        assert not os.path.exists(path)
+    assert archive.close() == [f"clips.{archive_format}"]
+    assert not os.path.exists(tmp_path / SCRATCH_FOLDER)
+
+    for index, (archive_name, member_name, offset) in added.items():
+        assert member_name == f"clip_{index:03d}.mp4"
+        data = read_at(str(tmp_path), archive_name, offset, sizes[index])
+        assert data == bytes([index]) * sizes[index]
+
+    path = str(tmp_path / f"clips.{archive_format}")
+    if archive_format == "tar":
+        with tarfile.open(path) as archive_file:
+            names = archive_file.getnames()
+    else:
+        with zipfile.ZipFile(path) as archive_file:
+            names = archive_file.namelist()
+    assert names == ["clip_001.mp4", "clip_002.mp4", "clip_003.mp4"]
+
+
+def test_archives_roll_over_at_max_bytes(tmp_path):
+    archive = ClipArchive(str(tmp_path), "tar", max_bytes=8000)
+    names = [archive.add(scratch_clip(archive, index, 2000))[0] for index in (1, 2, 3)]
+    archive.close()
+    assert names == ["clips-0001.tar", "clips-0001.tar", "clips-0002.tar"]
+
+
+def test_read_archived_clip_via_the_clip_index(tmp_path):
+    archive = ClipArchive(str(tmp_path), "zip")
+    writer = ClipIndexWriter(str(tmp_path), archived=True)
+    for index in (1, 2):
+        writer.submitted(index)
+        path = scratch_clip(archive, index, 100 * index)
+        window = ClipWindow(index, (index - 1) * 120, 90, 30)
+        writer.finished(window, path, True, 100 * index, archive.add(path))
+    writer.close()
+    archive.close()
+
+    assert read_archived_clip(str(tmp_path), 2) == bytes([2]) * 200
+    with pytest.raises(KeyError):
+        read_archived_clip(str(tmp_path), 3)
+
+
+@pytest.mark.parametrize("archive_format", ["tar", "zip"])
+def test_failed_write_keeps_the_earlier_clips(tmp_path, monkeypatch, archive_format):
+    archive = ClipArchive(str(tmp_path), archive_format)
+    first = archive.add(scratch_clip(archive, 1, 300))
+    failing = scratch_clip(archive, 2, 300)
+    write_member = ClipArchive.write_member
+
+    def disk_full(self, clip_path, member_name, size):
+        write_member(self, clip_path, member_name, size)
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(ClipArchive, "write_member", disk_full)
+    with pytest.raises(OSError):
+        archive.add(failing)
+    monkeypatch.undo()
+    third = archive.add(scratch_clip(archive, 3, 300))
+    archive.close()
+
+    # The failed clip stays in the scratch folder
+    assert os.path.exists(failing)
+    path = str(tmp_path / f"clips.{archive_format}")
+    if archive_format == "tar":
+        with tarfile.open(path) as archive_file:
+            names = archive_file.getnames()
+    else:
+        with zipfile.ZipFile(path) as archive_file:
+            names = archive_file.namelist()
+    assert names == ["clip_001.mp4", "clip_003.mp4"]
+    for index, (archive_name, _, offset) in ((1, first), (3, third)):
+        assert read_at(str(tmp_path), archive_name, offset, 300) == bytes([index]) * 300
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from clip_layout import (
+    ClipIndexWriter,
+    ClipLayout,
+    read_clip_encoders,
+    read_clip_index,
+)
+from clip_planner import ClipWindow
+
+
+def test_padding_grows_with_the_plan():
+    assert ClipLayout().for_plan(12).relative_path(7) == "clip_007.mp4"
+    assert ClipLayout().for_plan(999).relative_path(7) == "clip_007.mp4"
+    assert ClipLayout().for_plan(100_000).relative_path(7) == "clip_000007.mp4"
+    assert ClipLayout(digits=2).for_plan(5000).relative_path(7) == "clip_07.mp4"
+
+
+def test_shard_by_count():
+    layout = ClipLayout(shard_size=1000).for_plan(12_000)
+    assert layout.shard(1) == "00001-01000"
+    assert layout.shard(1000) == "00001-01000"
+    assert layout.shard(1001) == "01001-02000"
+    assert layout.relative_path(1001) == os.path.join(
+        "01001-02000", "clip_01001.mp4"
+    )
+
+
+def test_shard_by_hour():
+    layout = ClipLayout(shard_by_hour=True)
+    assert layout.shard(1, 0) == "hour_00"
+    assert layout.shard(900, 3_599_999_999) == "hour_00"
+    assert layout.shard(901, 3_600_000_000) == "hour_01"
+
+
+def test_packaged_clips_get_a_folder():
+    path = ClipLayout().relative_path(3, output_format="hls")
+    assert path.startswith(os.path.join("clip_003", ""))
+    assert path.endswith(".m3u8")
+
+
+def test_invalid_layouts():
+    with pytest.raises(ValueError):
+        ClipLayout(shard_size=10, shard_by_hour=True)
+    with pytest.raises(ValueError):
+        ClipLayout(shard_size=0)
+
+
+def test_clip_index_round_trip_in_clip_order(tmp_path):
+    layout = ClipLayout(shard_size=2).for_plan(4)
+    windows = [ClipWindow(index, (index - 1) * 120, 90, 30) for index in (1, 2, 3, 4)]
+    writer = ClipIndexWriter(str(tmp_path))
+    for window in windows:
+        writer.submitted(window.index)
+    # Clips finish out of order; clip 2 fails
+    for window, success, encoded_with in (
+        (windows[2], True, ("h264_nvenc", "p4")),
+        (windows[0], True, ("libx264", None)),
+        (windows[1], False, None),
+    ):
+        path = layout.clip_path(str(tmp_path), window)
+        writer.finished(window, path, success, 1000 + window.index, None, encoded_with)
+    writer.close()  # Clip 4 never ran
+
+    rows = list(read_clip_index(str(tmp_path)))
+    assert rows == [
+        (1, "001-002/clip_001.mp4", 0, 3_000_000, 1001),
+        (3, "003-004/clip_003.mp4", 8_000_000, 11_000_000, 1003),
+    ]
+    assert read_clip_encoders(str(tmp_path)) == {
+        1: ("libx264", None),
+        3: ("h264_nvenc", "p4"),
+    }
+
+
+def test_archived_rows_and_old_indexes(tmp_path):
+    window = ClipWindow(1, 0, 90, 30)
+    writer = ClipIndexWriter(str(tmp_path), archived=True)
+    writer.submitted(1)
+    writer.finished(window, None, True, 10, ("clips.tar", "clip_001.mp4", 512))
+    writer.close()
+    assert list(read_clip_index(str(tmp_path))) == [
+        (1, "clip_001.mp4", 0, 3_000_000, 10)
+    ]
+    assert read_clip_encoders(str(tmp_path)) == {}
+
+    # Indexes written before the encoder columns existed
+    (tmp_path / "clip_index.tsv").write_text(
+        "index\tpath\tstart_us\tend_us\tbytes\n1\tclip_001.mp4\t0\t3000000\t10\n"
+    )
+    assert read_clip_encoders(str(tmp_path)) == {}
@@ -0,0 +1,90 @@
+from fractions import Fraction
+
+import pytest
+
+from clip_planner import (
+    ClipPlan,
+    format_us,
+    frames_to_us,
+    parse_rational,
+    parse_us,
+    round_fraction,
+)
+
+
+def probe(frame_rate="30000/1001", duration_ts=None, time_base="1/30000"):
+    stream = {"codec_type": "video", "avg_frame_rate": frame_rate}
+    if duration_ts is not None:
+        stream.update(duration_ts=duration_ts, time_base=time_base)
+    return {"streams": [stream], "format": {"duration": "10.0"}}
+
+
+def test_parse_rational():
+    assert parse_rational("30000/1001") == Fraction(30000, 1001)
+    assert parse_rational("0.040") == Fraction(1, 25)
+    assert parse_rational(25) == Fraction(25)
+    for value in (None, "", "N/A", "0/0", "0", "x/1"):
+        assert parse_rational(value) is None
+
+
+def test_round_fraction_rounds_halves_up():
+    assert round_fraction(Fraction(5, 2)) == 3
+    assert round_fraction(Fraction(7, 3)) == 2
+    assert round_fraction(Fraction(8, 3)) == 3
+
+
+def test_format_and_parse_us_round_trip():
+    assert format_us(12_345_678) == "12.345678"
+    assert format_us(5) == "0.000005"
+    assert parse_us("12.345678") == 12_345_678
+    assert parse_us("3") == 3_000_000
+    assert parse_us("1.5") == 1_500_000
+    for value in (0, 1, 999_999, 1_000_000, 3_600_000_001):
+        assert parse_us(format_us(value)) == value
+
+
+def test_frames_to_us_is_exact_for_ntsc_rates():
+    rate = Fraction(30000, 1001)
+    assert frames_to_us(30000, rate) == 1_001_000_000
+    assert frames_to_us(1, rate) == 33367
+
+
+def test_plan_windows_tile_the_source_without_drift():
+    # 1 hour at 29.97 fps, 3 s clips every 13 s
+    plan = ClipPlan.from_probe(probe(duration_ts=3600 * 30000), 3, 10)
+    assert plan.clip_frames == 90
+    assert plan.skip_frames == 300
+    assert plan.total_frames == 107892
+    windows = list(plan)
+    assert len(windows) == len(plan) == 277
+    for window in windows:
+        assert window.start_frame == (window.index - 1) * plan.period_frames
+        assert window.start_us == frames_to_us(window.start_frame, plan.frame_rate)
+        assert window.start_us + window.duration_us == window.end_us
+
+
+def test_plan_trims_or_drops_the_last_clip():
+    # 10 s at 30 fps: windows start at frames 0, 120, 240, and 240 + 90 > 300
+    plan = ClipPlan(30, 3, 1, total_frames=300)
+    assert [window.frame_count for window in plan] == [90, 90, 60]
+    assert len(plan) == 3
+    # A 0.2 s sliver is below min_last_clip and is dropped
+    plan = ClipPlan(30, 3, 1, total_frames=246)
+    assert [window.frame_count for window in plan] == [90, 90]
+    assert len(plan) == 2
+    # ... unless it is the only clip
+    assert [window.frame_count for window in ClipPlan(30, 3, 1, 6)] == [6]
+
+
+def test_plan_without_video_uses_millisecond_ticks():
+    plan = ClipPlan.from_probe({"streams": [], "format": {"duration": "2.5"}}, 1, 0)
+    assert plan.frame_rate == 1000
+    assert plan.total_frames == 2500
+    assert [window.duration_us for window in plan] == [1_000_000] * 2 + [500_000]
+
+
+def test_open_ended_plan_has_no_length():
+    plan = ClipPlan(25, 2, 2)
+    with pytest.raises(TypeError):
+        len(plan)
+    assert plan.window(1000).start_frame == 999 * 100
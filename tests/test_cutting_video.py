@@ -0,0 +1,55 @@
+import os
+import shlex
+import sys
+
+import pytest
+
+from clip_layout import read_clip_encoders, read_clip_index
+from cutting_video import cut_video
+from ffmpeg_binaries import FFMPEG_ENV, FFPROBE_ENV
+from retry_policy import RetryPolicy
+
+FAKE_FFMPEG = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "benchmarks",
+    "fake_ffmpeg.py",
+)
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch, tmp_path):
+    """Run cut_video against benchmarks/fake_ffmpeg.py on a 30 s input"""
+    command = f"{shlex.quote(sys.executable)} -S {shlex.quote(FAKE_FFMPEG)}"
+    monkeypatch.setenv(FFMPEG_ENV, command)
+    monkeypatch.setenv(FFPROBE_ENV, command)
+    monkeypatch.setenv("FAKE_FFPROBE_DURATION", "30")
+    monkeypatch.setenv("FAKE_FFMPEG_OUTPUT_BYTES", "2048")
+    input_path = tmp_path / "talk.mp4"
+    input_path.write_bytes(b"\0" * 1024)
+    return str(input_path)
+
+
+def test_cut_video_writes_every_planned_clip(fake_ffmpeg, tmp_path):
+    output_folder = str(tmp_path / "clips")
+    assert cut_video(fake_ffmpeg, output_folder, 2, 3, 7, "libx264")
+
+    rows = list(read_clip_index(output_folder))
+    assert [row[0] for row in rows] == [1, 2, 3]
+    assert [(row[2], row[3]) for row in rows] == [
+        (0, 3_000_000),
+        (10_000_000, 13_000_000),
+        (20_000_000, 23_000_000),
+    ]
+    for _, path, _, _, size in rows:
+        assert os.path.getsize(os.path.join(output_folder, path)) == size == 2048
+    assert set(read_clip_encoders(output_folder).values()) == {("libx264", None)}
+
+
+def test_failed_clips_are_left_out_of_the_index(fake_ffmpeg, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_FFMPEG_FAILURE_RATE", "1")
+    output_folder = str(tmp_path / "clips")
+    retry_policy = RetryPolicy(max_attempts=1)
+    assert not cut_video(
+        fake_ffmpeg, output_folder, 2, 3, 7, "libx264", retry_policy=retry_policy
+    )
+    assert list(read_clip_index(output_folder)) == []
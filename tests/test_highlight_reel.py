@@ -0,0 +1,137 @@
+import os
+
+import pytest
+
+import highlight_reel
+from clip_layout import ClipIndexWriter
+from clip_planner import ClipWindow
+from highlight_reel import build_reel, parse_selection, stream_signature
+
+
+def probe(extradata="CRC32:aaaa", width=1920, audio=True):
+    streams = [
+        {
+            "codec_type": "video",
+            "codec_name": "h264",
+            "profile": "High",
+            "level": 40,
+            "refs": 1,
+            "extradata_hash": extradata,
+            "width": width,
+            "height": 1080,
+            "pix_fmt": "yuv420p",
+            "r_frame_rate": "30/1",
+        }
+    ]
+    if audio:
+        streams.append(
+            {
+                "codec_type": "audio",
+                "codec_name": "aac",
+                "sample_rate": "48000",
+                "channels": 2,
+                "extradata_hash": "CRC32:cccc",
+            }
+        )
+    return {"streams": streams}
+
+
+def test_parse_selection():
+    assert parse_selection(["3"]) == [3]
+    assert parse_selection(["7,9", "3"]) == [7, 9, 3]
+    assert parse_selection(["12-15"]) == [12, 13, 14, 15]
+    assert parse_selection(["1,,2", "5-5"]) == [1, 2, 5]
+    with pytest.raises(ValueError):
+        parse_selection(["x"])
+
+
+def test_stream_signature_covers_parameter_sets_and_audio():
+    reference = stream_signature(probe())
+    assert reference == stream_signature(probe())
+    assert reference != stream_signature(probe(extradata="CRC32:bbbb"))
+    assert reference != stream_signature(probe(width=1280))
+    assert stream_signature(probe(audio=False))[-1] is None
+    assert reference[-1] == ("aac", "48000", 2, "CRC32:cccc")
+
+
+def write_job(folder, encoders):
+    writer = ClipIndexWriter(str(folder))
+    for index, encoded_with in enumerate(encoders, start=1):
+        path = folder / f"clip_{index:03d}.mp4"
+        path.write_bytes(b"clip")
+        window = ClipWindow(index, (index - 1) * 90, 90, 30)
+        writer.submitted(index)
+        writer.finished(window, str(path), True, 4, encoded_with=encoded_with)
+    writer.close()
+
+
+def run_reel(monkeypatch, folder, probes, encoder=None):
+    commands = []
+
+    def fake_probe(path):
+        name = os.path.basename(path)
+        # Re-encoded clips come out like the reference
+        if name.startswith("clip_") and not name.startswith("clip_0"):
+            return probe()
+        return probes[name]
+
+    monkeypatch.setattr(highlight_reel, "probe_clip", fake_probe)
+    monkeypatch.setattr(highlight_reel, "run_ffmpeg", commands.append)
+    result = build_reel(
+        str(folder), [1, 2, 3], str(folder / "reel.mp4"), encoder=encoder
+    )
+    return result, commands
+
+
+def test_mismatched_clip_is_reencoded_with_the_reference_encoder(
+    tmp_path, monkeypatch
+):
+    nvenc = ("h264_nvenc", "p4")
+    write_job(tmp_path, [nvenc, ("libx264", None), nvenc])
+    probes = {
+        "clip_001.mp4": probe(),
+        "clip_002.mp4": probe(extradata="CRC32:bbbb"),
+        "clip_003.mp4": probe(),
+    }
+    result, commands = run_reel(monkeypatch, tmp_path, probes)
+
+    assert result["reencoded"] == [2]
+    assert not result["encoded_reel"]
+    encode = commands[0]
+    assert encode[encode.index("-c:v") + 1] == "h264_nvenc"
+    assert encode[encode.index("-preset") + 1] == "p4"
+    assert commands[-1][commands[-1].index("-c") + 1] == "copy"
+
+
+def test_unknown_reference_encoder_encodes_the_reel_in_one_pass(
+    tmp_path, monkeypatch
+):
+    write_job(tmp_path, [None, None, None])
+    probes = {
+        "clip_001.mp4": probe(),
+        "clip_002.mp4": probe(extradata="CRC32:bbbb"),
+        "clip_003.mp4": probe(),
+    }
+    result, commands = run_reel(monkeypatch, tmp_path, probes)
+
+    assert result["encoded_reel"]
+    assert result["reencoded"] == []
+    assert len(commands) == 1
+    assert commands[0][commands[0].index("-c:v") + 1] == "libx264"
+
+
+def test_clip_without_audio_gets_silence_before_the_reel_encode(
+    tmp_path, monkeypatch
+):
+    write_job(tmp_path, [("libx264", None)] * 3)
+    probes = {
+        "clip_001.mp4": probe(),
+        "clip_002.mp4": probe(audio=False),
+        "clip_003.mp4": probe(),
+    }
+    result, commands = run_reel(monkeypatch, tmp_path, probes, encoder="libx265")
+
+    assert result["encoded_reel"]
+    assert result["reencoded"] == [2]
+    assert any("anullsrc" in arg for arg in commands[0])
+    assert commands[-1][commands[-1].index("-c:v") + 1] == "libx265"
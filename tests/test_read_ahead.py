@@ -0,0 +1,32 @@
+from read_ahead import LEAD_US, TRAIL_US, ByteMap
+
+MB = 1024**2
+
+
+def test_byte_range_covers_lead_and_trail():
+    # 100 MB over 100 s: 1 MB per second
+    byte_map = ByteMap(100 * MB, 100_000_000)
+    offset, length = byte_map.byte_range(10_000_000, 13_000_000)
+    assert offset == (10_000_000 - LEAD_US) * MB // 1_000_000
+    assert offset + length == (13_000_000 + TRAIL_US) * MB // 1_000_000
+
+
+def test_byte_range_is_clamped_to_the_file():
+    byte_map = ByteMap(100 * MB, 100_000_000)
+    assert byte_map.byte_range(0, 1_000_000)[0] == 0
+    offset, length = byte_map.byte_range(99_000_000, 100_000_000)
+    assert offset + length == 100 * MB
+    assert byte_map.byte_range(200_000_000, 210_000_000) == (100 * MB, 0)
+
+
+def test_unknown_duration_does_not_divide_by_zero():
+    byte_map = ByteMap(10 * MB, 0)
+    assert byte_map.duration_us == 1
+    assert byte_map.byte_range(0, 5_000_000) == (0, 10 * MB)
+
+
+def test_from_probe_uses_file_size_and_container_duration(tmp_path):
+    path = tmp_path / "in.mp4"
+    path.write_bytes(b"\0" * 4000)
+    byte_map = ByteMap.from_probe(str(path), {"format": {"duration": "4.0"}})
+    assert (byte_map.file_size, byte_map.duration_us) == (4000, 4_000_000)
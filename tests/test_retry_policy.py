@@ -0,0 +1,59 @@
+from retry_policy import (
+    FALLBACK_ENCODER,
+    EncoderCircuitBreaker,
+    RetryPolicy,
+    is_session_limit_error,
+)
+
+
+def test_delay_backs_off_exponentially_with_jitter():
+    policy = RetryPolicy(backoff_base=1.0, backoff_factor=2.0, max_backoff=5.0)
+    for attempt, expected in ((1, 1.0), (2, 2.0), (3, 4.0), (4, 5.0), (10, 5.0)):
+        for _ in range(20):
+            assert expected * 0.8 <= policy.delay(attempt) <= expected * 1.2
+
+
+def test_encoder_falls_back_after_the_configured_attempts():
+    policy = RetryPolicy(max_attempts=4, fallback_after=2)
+    encoders = [policy.encoder_for("h264_nvenc", attempt) for attempt in (1, 2, 3)]
+    assert encoders == ["h264_nvenc", "h264_nvenc", FALLBACK_ENCODER]
+    assert policy.encoder_for(FALLBACK_ENCODER, 1) == FALLBACK_ENCODER
+    assert RetryPolicy(max_attempts=0).max_attempts == 1
+
+
+def test_open_circuit_sends_first_attempts_to_the_fallback():
+    policy = RetryPolicy()
+    breaker = EncoderCircuitBreaker(failure_threshold=2)
+    breaker.record_failure("h264_nvenc")
+    assert policy.encoder_for("h264_nvenc", 1, breaker) == "h264_nvenc"
+    breaker.record_failure("h264_nvenc")
+    assert not breaker.allow("h264_nvenc")
+    assert policy.encoder_for("h264_nvenc", 1, breaker) == FALLBACK_ENCODER
+
+
+def test_circuit_counts_consecutive_failures_only():
+    breaker = EncoderCircuitBreaker(failure_threshold=3)
+    for _ in range(2):
+        breaker.record_failure("h264_qsv")
+    breaker.record_success("h264_qsv")
+    for _ in range(2):
+        breaker.record_failure("h264_qsv")
+    assert breaker.allow("h264_qsv")
+    breaker.record_failure("h264_qsv")
+    assert not breaker.allow("h264_qsv")
+    # A success does not close an open circuit
+    breaker.record_success("h264_qsv")
+    assert not breaker.allow("h264_qsv")
+
+
+def test_protected_encoders_are_never_disabled():
+    breaker = EncoderCircuitBreaker(failure_threshold=1)
+    for _ in range(5):
+        breaker.record_failure(FALLBACK_ENCODER)
+    assert breaker.allow(FALLBACK_ENCODER)
+
+
+def test_session_limit_errors():
+    assert is_session_limit_error("[h264_nvenc] OpenEncodeSessionEx failed: 10")
+    assert is_session_limit_error("too many sessions")
+    assert not is_session_limit_error("Invalid data found when processing input")
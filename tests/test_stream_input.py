@@ -0,0 +1,110 @@
+import os
+import stat
+
+import stream_input
+from stream_input import cut_stream, prune_playlist, window_overlaps
+
+SEGMENT = 6
+
+
+def write_playlist(folder, segments):
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:7",
+        f"#EXT-X-TARGETDURATION:{SEGMENT}",
+        '#EXT-X-MAP:URI="init.mp4"',
+    ]
+    for index in range(segments):
+        lines.extend([f"#EXTINF:{SEGMENT}.0,", f"seg_{index:03d}.m4s"])
+    lines.append("#EXT-X-ENDLIST")
+    path = os.path.join(folder, "talk.m3u8")
+    with open(path, "w", encoding="utf-8") as playlist_file:
+        playlist_file.write("\n".join(lines) + "\n")
+    return path
+
+
+def segment_uris(path):
+    with open(path, "r", encoding="utf-8") as playlist_file:
+        return [line for line in playlist_file.read().splitlines() if "seg_" in line]
+
+
+def test_window_overlaps():
+    # clip 3s, skip 30s: windows [0, 3), [33, 36), [66, 69) ...
+    assert window_overlaps(0, 6, 3, 30)
+    assert not window_overlaps(6, 12, 3, 30)
+    assert window_overlaps(30, 36, 3, 30)
+    assert not window_overlaps(36, 42, 3, 30)
+    assert window_overlaps(66, 72, 3, 30)
+
+
+def test_prune_playlist_keeps_only_segments_in_clip_windows(tmp_path):
+    input_folder = tmp_path / "input"
+    output_folder = tmp_path / "output"
+    input_folder.mkdir()
+    output_folder.mkdir()
+    playlist = write_playlist(str(input_folder), 12)
+
+    pruned = prune_playlist(playlist, 3, 30, str(output_folder))
+
+    assert os.path.dirname(pruned) == str(output_folder)
+    uris = segment_uris(pruned)
+    kept = [int(uri[-7:-4]) for uri in uris]
+    assert kept == [0, 5, 11]
+    for index in kept:
+        start = index * SEGMENT
+        assert window_overlaps(start, start + SEGMENT, 3, 30)
+    # Relative URIs are resolved against the original playlist's folder
+    assert uris[0] == os.path.join(str(input_folder), "seg_000.m4s")
+    with open(pruned, "r", encoding="utf-8") as pruned_file:
+        text = pruned_file.read()
+    assert f'URI="{os.path.join(str(input_folder), "init.mp4")}"' in text
+    assert text.rstrip().endswith("#EXT-X-ENDLIST")
+
+
+def test_prune_playlist_copies_are_unique(tmp_path):
+    playlist = write_playlist(str(tmp_path), 12)
+    first = prune_playlist(playlist, 3, 30, str(tmp_path))
+    second = prune_playlist(playlist, 3, 20, str(tmp_path))
+    assert first != second
+    assert segment_uris(first) != segment_uris(second)
+
+
+def test_prune_playlist_leaves_live_and_unpruned_playlists(tmp_path):
+    playlist = write_playlist(str(tmp_path), 4)
+    assert prune_playlist(playlist, 3, 0, str(tmp_path)) is None
+    with open(playlist, "r", encoding="utf-8") as playlist_file:
+        live = playlist_file.read().replace("#EXT-X-ENDLIST\n", "")
+    with open(playlist, "w", encoding="utf-8") as playlist_file:
+        playlist_file.write(live)
+    assert prune_playlist(playlist, 3, 30, str(tmp_path)) is None
+
+
+def test_cut_stream_reads_pruned_playlist_with_source_timestamps(
+    tmp_path, monkeypatch
+):
+    input_folder = tmp_path / "input"
+    output_folder = tmp_path / "output"
+    input_folder.mkdir()
+    playlist = write_playlist(str(input_folder), 12)
+    os.chmod(input_folder, stat.S_IRUSR | stat.S_IXUSR)
+    commands = []
+
+    def fake_run_ffmpeg(cmd, stdin=None, poll=None):
+        source = cmd[cmd.index("-i") + 1]
+        commands.append((cmd, source, segment_uris(source)))
+
+    monkeypatch.setattr(stream_input, "run_ffmpeg", fake_run_ffmpeg)
+    try:
+        cut_stream(playlist, str(output_folder), 3, 30, clip_index=False)
+    finally:
+        os.chmod(input_folder, stat.S_IRWXU)
+
+    cmd, source, uris = commands[0]
+    # Gaps left by pruned segments must survive ffmpeg's discontinuity
+    # correction, or mod(t, period) selects the wrong frames after them
+    assert cmd.index("-copyts") < cmd.index("-i")
+    assert "setpts=PTS-STARTPTS" in cmd[cmd.index("-vf") + 1]
+    assert "lt(mod(t,33),3)" in cmd[cmd.index("-vf") + 1]
+    assert os.path.dirname(source) == str(output_folder)
+    assert len(uris) == 3
+    assert not os.path.exists(source)
@@ -0,0 +1,61 @@
+import json
+import os
+
+import watch_folder
+from watch_folder import WatchFolderDaemon, load_config, mirrored_output_dir
+
+
+def make_daemon(tmp_path):
+    config_path = tmp_path / "watch_config.json"
+    config_path.write_text(
+        json.dumps(
+            {
+                "state_file": str(tmp_path / "watch_state.json"),
+                "use_inotify": False,
+                "folders": [
+                    {"input": str(tmp_path / "in"), "output": str(tmp_path / "out")}
+                ],
+            }
+        )
+    )
+    (tmp_path / "in").mkdir()
+    return WatchFolderDaemon(load_config(str(config_path)))
+
+
+def test_mirrored_folders_keep_the_extension(tmp_path):
+    folder = {"input": str(tmp_path / "in"), "output": str(tmp_path / "out")}
+    mp4 = mirrored_output_dir(str(tmp_path / "in" / "cam1" / "talk.mp4"), folder)
+    mkv = mirrored_output_dir(str(tmp_path / "in" / "cam1" / "talk.mkv"), folder)
+    assert mp4 == str(tmp_path / "out" / "cam1" / "talk_mp4")
+    assert mkv == str(tmp_path / "out" / "cam1" / "talk_mkv")
+
+
+def test_stop_cancels_running_jobs_and_retries_them(tmp_path, monkeypatch):
+    daemon = make_daemon(tmp_path)
+    path = str(tmp_path / "in" / "talk.mp4")
+    with open(path, "wb") as video_file:
+        video_file.write(b"\0" * 1024)
+    calls = []
+
+    def fake_cut_video(input_path, output_dir, *args, cancel_event=None, **kwargs):
+        calls.append(cancel_event)
+        daemon.stop()  # SIGINT arrives while the job runs
+        return not cancel_event.is_set()
+
+    monkeypatch.setattr(watch_folder, "cut_video", fake_cut_video)
+    monkeypatch.setattr(watch_folder, "input_fingerprint", lambda path: "abc")
+    folder = daemon.config["folders"][0]
+    daemon.process_file(path, folder)
+
+    assert calls == [daemon.stop_event]
+    assert daemon.state.entries[path]["status"] == "cancelled"
+    assert not daemon.state.is_processed(path)
+
+    # Files still queued when the daemon stops are left for the next start
+    other = str(tmp_path / "in" / "other.mp4")
+    daemon.process_file(other, folder)
+    assert len(calls) == 1
+    assert other not in daemon.state.entries
+    daemon.executor.shutdown()
+    daemon.watcher.close()
+    assert os.path.exists(tmp_path / "watch_state.json")